@@ -1,15 +1,29 @@
 from .document_type_handlers import document_type_router
 from .base_recipe_handlers import base_recipe_router
+from .document_handlers import document_router
 from .login_handler import login_router
+from .metrics_handlers import metrics_router
 from .recipe_handlers import recipe_router
 from .dashboard_handlers import dashboard_router
+from .events_handlers import events_router
+from .export_handlers import export_router
+from .job_handlers import job_router
 from .nomenclature_handlers import router as nomenclature_router
+from .nomenclature_group_handlers import router as nomenclature_group_router
+from .stock_handlers import stock_router
 
 __all__ = (
     'base_recipe_router',
+    'document_router',
     'document_type_router',
     'login_router',
+    'metrics_router',
     'recipe_router',
     'dashboard_router',
+    'events_router',
+    'export_router',
+    'job_router',
     'nomenclature_router',
+    'nomenclature_group_router',
+    'stock_router',
 )
@@ -1,7 +1,15 @@
 from .base_recipe_actions import BaseRecipeActions
+from .document_actions import DocumentActions
 from .document_type_actions import DocumentTypeActions
+from .job_actions import JobActions
+from .recipe_actions import RecipeActions
+from .stock_actions import StockActions
 
 __all__ = (
     'BaseRecipeActions',
+    'DocumentActions',
     'DocumentTypeActions',
+    'JobActions',
+    'RecipeActions',
+    'StockActions',
 )
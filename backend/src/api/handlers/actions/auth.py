@@ -11,6 +11,7 @@ from starlette import status
 from db.dals import UserDAL
 from db.models import User
 from db.engine import get_session
+from db.user_cache import AuthenticatedUser, user_cache
 from hashing import Hasher
 from settings import get_settings
 
@@ -29,16 +30,16 @@ async def authenticate_user(
     email: str, password: str, db: AsyncSession
 ) -> Union[User, None]:
     user = await _get_user_by_email_for_auth(email=email, session=db)
-    if user is None:
+    if user is None or not user.is_active:
         return
-    if not Hasher.verify_password(password, user.hashed_password):
+    if not await Hasher.verify_password_async(password, user.hashed_password):
         return
     return user
 
 
 async def get_current_user_from_token(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_session)
-):
+) -> AuthenticatedUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,7 +53,13 @@ async def get_current_user_from_token(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    user = user_cache.get(email)
+    if user is not None:
+        return user
     user = await _get_user_by_email_for_auth(email=email, session=db)
-    if user is None:
+    if user is None or not user.is_active:
         raise credentials_exception
-    return user
+    # кешируется неизменяемый снимок: ORM-объект нельзя делить между запросами и их сессиями
+    authenticated = AuthenticatedUser.from_user(user)
+    user_cache.set(email, authenticated)
+    return authenticated
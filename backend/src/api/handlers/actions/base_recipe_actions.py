@@ -3,13 +3,16 @@ from fastapi.encoders import jsonable_encoder
 from api.schemas import BaseRecipeCreateRequest
 from api.schemas.rules_schemas import Rules
 from db.dals import BaseRecipeDAL
+from db.dals.nomenclature import NomenclatureDAL
 from db.models import BaseRecipe
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 import uuid
-from db.models import Nomenclature, NomenclatureGroup
+from db.reference_cache import reference_cache
+from api.services.compiled_rules import compiled_rules_cache
+
+REQUIRED_PIGMENT_GROUPS = ('Пигменты', 'Наполнители')
 
 class BaseRecipeActions:
     """
@@ -29,78 +32,49 @@ class BaseRecipeActions:
             except ValueError as exc:
                 raise HTTPException(status_code=422, detail=str(exc))
 
-            nom_ids = set()
-            grp_ids = set()
+            nom_ids: set[uuid.UUID] = set()
+            grp_ids: set[uuid.UUID] = set()
+            color_groups: list[set[uuid.UUID]] = []
 
             for mat in validated.film_former_part.materials.root:
                 nom_ids.update(mat.uuids)
-            color_groups = []
             for colored in validated.pigment_part:
-                color_group = set()
+                color_group = {cat.nomenclature_group_id for cat in colored.materials}
+                grp_ids.update(color_group)
+                color_groups.append(color_group)
                 for cat in colored.materials:
-                    color_group.add(cat.nomenclature_group_id)
-                    grp_ids.add(cat.nomenclature_group_id)
                     for mat in cat.items.root:
                         nom_ids.update(mat.uuids)
-                color_groups.append(color_group)
-
             for cat in validated.additives_part.materials:
                 grp_ids.add(cat.nomenclature_group_id)
                 for mat in cat.items.root:
                     nom_ids.update(mat.uuids)
-
             for mat in validated.solvent_part.materials.root:
                 nom_ids.update(mat.uuids)
 
+            # одна выборка номенклатуры по массиву id и дерево групп из кеша справочников
             async with session.begin():
-                if nom_ids:
-                    rows = await session.execute(
-                        select(Nomenclature.id).where(Nomenclature.id.in_(nom_ids))
-                    )
-                    found = {r[0] for r in rows.fetchall()}
-                    missing = nom_ids - found
-                    if missing:
-                        raise HTTPException(
-                            status_code=422,
-                            detail=f"Nomenclature id(s) not found: {', '.join(str(m) for m in missing)}"
-                        )
-
-                for group in color_groups:
-                    row = await session.execute(
-                        select(NomenclatureGroup.name)
-                        .where(NomenclatureGroup.id.in_(group))
-                        .where(NomenclatureGroup.name == 'Пигменты'))
-                    found = row.fetchone()
-
-                    if not found:
-                        raise HTTPException(
-                            status_code=422,
-                            detail='There is no group "Пигменты" in pigment part.'
-                        )
-
-                    row = await session.execute(
-                        select(NomenclatureGroup.name)
-                        .where(NomenclatureGroup.id.in_(group))
-                        .where(NomenclatureGroup.name == 'Наполнители'))
-                    found = row.fetchone()
-
-                    if not found:
-                        raise HTTPException(
-                            status_code=422,
-                            detail='There is no group "Наполнители" in pigment part.'
-                        )
-
-                if grp_ids:
-                    rows = await session.execute(
-                        select(NomenclatureGroup.id).where(NomenclatureGroup.id.in_(grp_ids))
-                    )
-                    found = {r[0] for r in rows.fetchall()}
-                    missing = grp_ids - found
-                    if missing:
-                        raise HTTPException(
-                            status_code=422,
-                            detail=f"NomenclatureGroup id(s) not found: {', '.join(str(m) for m in missing)}"
-                        )
+                missing_noms = await NomenclatureDAL(session).get_missing_ids(nom_ids)
+                groups = await reference_cache.nomenclature_groups(session)
+                if not grp_ids <= groups.keys():
+                    # группы могли создать в другом процессе после загрузки кеша: перед отказом перечитываем дерево
+                    groups = await reference_cache.nomenclature_groups(session, refresh=True)
+
+            errors = []
+            if missing_noms:
+                errors.append(f"Nomenclature id(s) not found: {', '.join(str(m) for m in sorted(missing_noms))}")
+            missing_groups = grp_ids - groups.keys()
+            if missing_groups:
+                errors.append(f"NomenclatureGroup id(s) not found: {', '.join(str(m) for m in sorted(missing_groups))}")
+
+            for required_name in REQUIRED_PIGMENT_GROUPS:
+                # нужна сама группа, не подгруппа: генерация берёт блоки пигментов и наполнителей по точному id группы
+                for i, color_group in enumerate(color_groups, start=1):
+                    if not any(groups[g].name == required_name for g in color_group & groups.keys()):
+                        errors.append(f'There is no group "{required_name}" in pigment part (color {i}).')
+
+            if errors:
+                raise HTTPException(status_code=422, detail="\n".join(errors))
 
     @classmethod
     async def create_base_recipe(cls, body: BaseRecipeCreateRequest, session: AsyncSession) -> BaseRecipe:
@@ -117,10 +91,12 @@ class BaseRecipeActions:
             return await base_recipe_dal.get_base_recipe_by_id(id=base_recipe_id)
 
     @classmethod
-    async def get_all_base_recipes(cls, session: AsyncSession) -> list[BaseRecipe] | None:
+    async def get_base_recipes_page(
+            cls, session: AsyncSession, limit: int, after: tuple | None = None, **filters
+    ) -> list[BaseRecipe]:
         async with session.begin():
             base_recipe_dal = cls.DAL(db_session=session)
-            return await base_recipe_dal.get_all_base_recipes()
+            return await base_recipe_dal.get_base_recipes_page(limit, after, **filters)
 
     @classmethod
     async def update_base_recipe(cls, base_recipe_id: uuid.UUID, updates: dict, session: AsyncSession ) -> BaseRecipe:
@@ -128,10 +104,15 @@ class BaseRecipeActions:
             base_recipe_dal = cls.DAL(db_session=session)
             if updates.get('rules'):
                 updates["rules"] = jsonable_encoder(updates["rules"])
-            return await base_recipe_dal.update_base_recipe(base_recipe_id, **updates)
+            base_recipe = await base_recipe_dal.update_base_recipe(base_recipe_id, **updates)
+        # новая версия и так не совпадёт с ключом кеша, старые версии просто освобождают место
+        compiled_rules_cache.invalidate(base_recipe_id)
+        return base_recipe
 
     @classmethod
     async def delete_base_recipe(cls, base_recipe_id: uuid.UUID, session: AsyncSession):
         async with session.begin():
             base_recipe_dal = cls.DAL(db_session=session)
-            return await base_recipe_dal.delete_base_recipe(id=base_recipe_id)
+            deleted = await base_recipe_dal.delete_base_recipe(id=base_recipe_id)
+        compiled_rules_cache.invalidate(base_recipe_id)
+        return deleted
@@ -0,0 +1,66 @@
+import uuid
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas.document_schemas import StockDocumentCreateRequest
+from constants import DocumentStatuses
+from db.dals import DocumentDAL, RecipeDAL
+from db.dals.nomenclature import NomenclatureDAL
+from db.models import Document, Recipe
+from db.reference_cache import reference_cache
+
+
+class DocumentActions:
+    """Class containing actions for stock documents, i.e. logic of session context managers and DAL calls."""
+    DAL = DocumentDAL
+
+    @classmethod
+    async def create_stock_document(cls, body: StockDocumentCreateRequest, session: AsyncSession) -> Document:
+        """
+        Validates the whole document at once and writes it; every problem found is reported in one 422.
+        Lines of the same nomenclature are merged into one line with the total qty.
+
+        A posted document for a recipe settles the recipe's stock reservations in the same transaction, so
+        consumed stock is not subtracted from the available stock twice: an outgoing document (materials issued
+        to production) settles the reservations of its nomenclatures, an incoming one (the production report)
+        closes the batch and releases all of them.
+        """
+        # порядок строк — по первому появлению номенклатуры
+        lines: dict[uuid.UUID, Decimal] = {}
+        for line in body.lines:
+            lines[line.nomenclature_id] = lines.get(line.nomenclature_id, Decimal(0)) + line.qty
+
+        async with session.begin():
+            errors = []
+            doc_type = await reference_cache.document_type_by_name(session, body.document_type)
+            if doc_type is None:
+                errors.append(f"Document type {body.document_type.value} does not exist.")
+            elif doc_type.direction == 0:
+                errors.append(f"Document type {body.document_type.value} does not move stock.")
+
+            missing = await NomenclatureDAL(session).get_missing_ids(lines)
+            if missing:
+                errors.append(f"Nomenclature id(s) not found: {', '.join(str(m) for m in sorted(missing))}")
+            if body.recipe_id is not None:
+                if await session.scalar(select(Recipe.id).where(Recipe.id == body.recipe_id)) is None:
+                    errors.append(f"Recipe {body.recipe_id} not found.")
+            if errors:
+                raise HTTPException(status_code=422, detail="\n".join(errors))
+
+            if body.recipe_id is not None and body.status == DocumentStatuses.Posted:
+                await RecipeDAL(session).release_reservations(
+                    body.recipe_id, list(lines) if doc_type.direction < 0 else None
+                )
+
+            return await cls.DAL(db_session=session).create_stock_document(
+                document_type_id=doc_type.id,
+                direction=doc_type.direction,
+                status=body.status,
+                document_datetime=body.document_datetime,
+                commentary=body.commentary,
+                name=body.name,
+                lines=list(lines.items()),
+            )
@@ -1,28 +1,48 @@
 import uuid
-from db.models import DocumentType
 from db.dals import DocumentTypeDAL
+from db.reference_cache import DocumentTypeRecord, reference_cache
 
-from constants import DocumentTypesEnum
+from constants import DocumentNumberingModes, DocumentTypesEnum
 from sqlalchemy.ext.asyncio import AsyncSession
 
 class DocumentTypeActions:
-    """Class containing actions for document types, i.e. logic of session context managers and DAL calls."""
-    DAL = DocumentTypeDAL
+    """
+    Class containing actions for document types, i.e. logic of session context managers and cache calls.
+    Document types are read through the reference data cache, so most calls do not reach the database.
+    """
 
     @classmethod
-    async def get_document_type_by_id(cls, document_type_id: uuid.UUID, session: AsyncSession) -> DocumentType | None:
+    async def get_document_type_by_id(
+            cls, document_type_id: uuid.UUID, session: AsyncSession
+    ) -> DocumentTypeRecord | None:
         async with session.begin():
-            doc_type_dal = cls.DAL(db_session=session)
-            return await doc_type_dal.get_document_type_by_id(type_id=document_type_id)
+            document_type = (await reference_cache.document_types(session)).get(document_type_id)
+            if document_type is None:
+                # тип мог появиться в другом процессе после загрузки кеша
+                document_type = (await reference_cache.document_types(session, refresh=True)).get(document_type_id)
+            return document_type
 
     @classmethod
-    async def get_document_type_by_name(cls, name: DocumentTypesEnum, session: AsyncSession) -> DocumentType | None:
+    async def get_document_type_by_name(
+            cls, name: DocumentTypesEnum, session: AsyncSession
+    ) -> DocumentTypeRecord | None:
         async with session.begin():
-            doc_type_dal = cls.DAL(db_session=session)
-            return await doc_type_dal.get_document_type_by_name(name=name)
+            return await reference_cache.document_type_by_name(session, name)
 
     @classmethod
-    async def get_all_document_types(cls, session: AsyncSession) -> list[DocumentType]:
+    async def get_all_document_types(cls, session: AsyncSession) -> list[DocumentTypeRecord]:
         async with session.begin():
-            doc_type_dal = cls.DAL(db_session=session)
-            return await doc_type_dal.get_all_document_types()
+            return list((await reference_cache.document_types(session)).values())
+
+    @classmethod
+    async def set_numbering_mode(
+            cls, document_type_id: uuid.UUID, mode: DocumentNumberingModes, session: AsyncSession
+    ) -> DocumentTypeRecord | None:
+        """Switches numbering mode of the document type; returns None if the type does not exist."""
+        async with session.begin():
+            dal = DocumentTypeDAL(session)
+            if await dal.get_document_type_by_id(document_type_id) is None:
+                return None
+            await dal.set_numbering_mode(document_type_id, mode)
+        # кеш справочника сброшен коммитом, тип читается уже с новым режимом
+        return await cls.get_document_type_by_id(document_type_id, session)
@@ -0,0 +1,99 @@
+import uuid
+from typing import Any
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.handlers.actions.recipe_actions import RecipeActions, RecipeRequest
+from api.schemas import GenerateRecipesJobParams, RebuildStockBalancesJobParams
+from api.services.jobs import JOB_KINDS, JobContext, job_kind, job_runner
+from constants import JobStatuses
+from db.dals import JobDAL, StockDAL
+from db.dals.job import FINISHED_JOB_STATUSES
+from db.models import Job
+
+# рецептов в одной транзакции задания: резервы пачки держат блокировки её материалов до коммита
+RECIPE_JOB_CHUNK = 50
+
+
+class JobActions:
+    """Class containing actions for background jobs, i.e. logic of session context managers and DAL calls."""
+    DAL = JobDAL
+
+    @classmethod
+    async def create_job(cls, kind: str, params: dict[str, Any], session: AsyncSession) -> Job:
+        """Validates params against the model of the job kind and enqueues the job."""
+        registered = JOB_KINDS.get(kind)
+        if registered is None:
+            raise HTTPException(
+                status_code=422, detail=f"Unknown job kind {kind}, expected one of: {', '.join(sorted(JOB_KINDS))}"
+            )
+        try:
+            validated = registered.params.model_validate(params)
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail=jsonable_encoder(exc.errors(include_url=False)))
+
+        async with session.begin():
+            job = await cls.DAL(session).create_job(kind, validated.model_dump(mode='json'))
+        job_runner.wake()
+        return job
+
+    @classmethod
+    async def get_job(cls, job_id: uuid.UUID, session: AsyncSession) -> Job:
+        async with session.begin():
+            job = await cls.DAL(session).get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail='job not found')
+        return job
+
+    @classmethod
+    async def cancel_job(cls, job_id: uuid.UUID, session: AsyncSession) -> Job:
+        """Cancels a queued job, asks a running one to stop at its next progress report."""
+        async with session.begin():
+            job = await cls.DAL(session).cancel_job(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail='job not found')
+            # повторная отмена не ошибка, а отменять уже завершившееся задание поздно
+            if job.status in FINISHED_JOB_STATUSES - {JobStatuses.Cancelled}:
+                raise HTTPException(status_code=409, detail=f'job is already {job.status}')
+        return job
+
+
+@job_kind('rebuild_stock_balances', RebuildStockBalancesJobParams)
+async def rebuild_stock_balances(context: JobContext, params: RebuildStockBalancesJobParams) -> list[dict[str, Any]]:
+    """Same as reconcile_stock_balances.py: finds (and unless dry_run fixes) balances that drifted from moves."""
+    async with context.session() as session:
+        async with session.begin():
+            # пакетная операция по всей истории движений: statement_timeout API-процесса к ней не относится
+            await session.execute(text("SET LOCAL statement_timeout = 0"))
+            stock_dal = StockDAL(session)
+            drift = await (stock_dal.get_balance_drift() if params.dry_run else stock_dal.rebuild_balances())
+    return [row._asdict() for row in drift]
+
+
+@job_kind('generate_recipes', GenerateRecipesJobParams)
+async def generate_recipes(context: JobContext, params: GenerateRecipesJobParams) -> list[dict[str, Any]]:
+    """
+    Generates recipes in chunks of RECIPE_JOB_CHUNK, each chunk saved by its own transaction.
+    Results come in item order, like the ones of POST /recipe/batch; the results of the saved chunks are kept
+    in the job while it runs, so they survive a cancellation.
+    """
+    results: list[dict[str, Any]] = []
+    await context.progress(0, len(params.items))
+    for start in range(0, len(params.items), RECIPE_JOB_CHUNK):
+        chunk = params.items[start:start + RECIPE_JOB_CHUNK]
+        async with context.session() as session:
+            generated = await RecipeActions.generate_recipes([
+                RecipeRequest(item.base_recipe_id, item.nomenclature_id, item.batch_size, item.policy)
+                for item in chunk
+            ], session)
+        results.extend(
+            {'status_code': result.status_code, 'detail': result.detail}
+            if isinstance(result, HTTPException) else {'status_code': 200, 'recipe_id': result.recipe.id}
+            for result in generated
+        )
+        await context.progress(len(results), result=results)
+    return results
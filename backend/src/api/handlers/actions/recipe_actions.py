@@ -0,0 +1,192 @@
+import datetime
+import uuid
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, NamedTuple, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.services.compiled_rules import compiled_rules_cache, CompiledRules, RulesCompilationError
+from api.services.recipe_calculator import RecipeCalculator, RecipeGenerationError, RecipeLine
+from api.services.stock_availability import StockAvailabilityResolver, stock_availability_index
+from constants import DocumentStatuses, DocumentTypesEnum, MaterialSelectionPolicy
+from db.dals import RecipeDAL
+from db.dals.nomenclature import NomenclatureDAL
+from db.dals.recipe import NewRecipe
+from db.models import BaseRecipe, Recipe
+from db.reference_cache import reference_cache
+
+
+class RecipeRequest(NamedTuple):
+    base_recipe_id: uuid.UUID
+    nomenclature_id: uuid.UUID
+    batch_size: Decimal
+    policy: MaterialSelectionPolicy = MaterialSelectionPolicy.first_available
+
+
+class GeneratedRecipe(NamedTuple):
+    recipe: Recipe
+    lines: list[RecipeLine]
+
+
+class RecipeActions:
+    """Class containing actions for recipes, i.e. logic of session context managers and DAL calls."""
+    DAL = RecipeDAL
+
+    @classmethod
+    async def generate_recipe(
+            cls, base_recipe_id: uuid.UUID, nomenclature_id: uuid.UUID, batch_size: Decimal, session: AsyncSession,
+            policy: MaterialSelectionPolicy = MaterialSelectionPolicy.first_available,
+    ) -> GeneratedRecipe:
+        """Calculates a recipe of the nomenclature's color from the posted base recipe and saves it."""
+        [result] = await cls.generate_recipes(
+            [RecipeRequest(base_recipe_id, nomenclature_id, batch_size, policy)], session
+        )
+        if isinstance(result, HTTPException):
+            raise result
+        return result
+
+    @classmethod
+    async def generate_recipes(
+            cls, requests: Sequence[RecipeRequest], session: AsyncSession
+    ) -> list[GeneratedRecipe | HTTPException]:
+        """
+        Calculates recipes for all requests and saves the successful ones in one transaction,
+        reserving stock for their ingredients.
+
+        Nomenclatures, base recipes, their rules, material properties and stock balances are loaded once for
+        the whole batch with array queries; the calculation itself makes no queries. Only materials that
+        the stock availability index reports in stock are locked and loaded. Results come in request
+        order, a request that cannot be fulfilled gets the HTTPException describing why (409 when stock left
+        after open reservations and earlier requests of the batch does not cover it).
+        Problems shared by all requests (no generation settings, no Recipe document type) fail the whole batch.
+        """
+        async with session.begin():
+            settings = await reference_cache.recipe_generation_settings(session)
+            if settings is None:
+                raise HTTPException(status_code=422, detail='set recipe generation settings on SETTINGS page')
+            doc_type = await reference_cache.document_type_by_name(session, DocumentTypesEnum.RecipeType)
+            if doc_type is None:
+                raise HTTPException(
+                    status_code=422, detail=f'Document type {DocumentTypesEnum.RecipeType.value} does not exist.'
+                )
+
+            nomenclature_dal = NomenclatureDAL(session)
+            products = await nomenclature_dal.get_properties({request.nomenclature_id for request in requests})
+            base_recipe_ids = list({request.base_recipe_id for request in requests})
+            base_recipes = {
+                row.id: row
+                for row in await session.execute(
+                    select(BaseRecipe.id, BaseRecipe.status, BaseRecipe.version).where(
+                        BaseRecipe.id == any_(bindparam("ids", base_recipe_ids, type_=ARRAY(PG_UUID(as_uuid=True))))
+                    )
+                )
+            }
+            compiled = await compiled_rules_cache.get_many(session, {
+                row.id: row.version for row in base_recipes.values() if row.status == DocumentStatuses.Posted
+            })
+
+            # первый проход: всё, что проверяется без остатков; собираем материалы всей пачки
+            results: list[GeneratedRecipe | HTTPException | tuple[CompiledRules, str]] = []
+            materials: set[uuid.UUID] = set()
+            for request in requests:
+                try:
+                    rules, color = cls._resolve_rules(request, products, base_recipes, compiled)
+                except HTTPException as exc:
+                    results.append(exc)
+                    continue
+                materials |= rules.color(color).uuids
+                results.append((rules, color))
+
+            # материалы, которых по индексу доступности нет на складе, не блокируем и не загружаем:
+            # рецепт их всё равно не выберет
+            await stock_availability_index.refresh(session)
+            # блокируем материалы пачки до конца транзакции: параллельная генерация с теми же материалами
+            # дождётся нашего коммита и увидит наши резервы, с другими материалами — идёт без ожидания
+            resolver = StockAvailabilityResolver(session)
+            resolver.add_ids(stock_availability_index.in_stock(materials))
+            await resolver.load(lock=True)
+            properties = await nomenclature_dal.get_properties(materials)
+            groups = await reference_cache.nomenclature_groups(session)
+            expiration_dates = {}
+            if any(request.policy == MaterialSelectionPolicy.fifo for request in requests):
+                expiration_dates = await nomenclature_dal.get_expiration_dates(materials)
+
+            calculators: dict[tuple[uuid.UUID, MaterialSelectionPolicy], RecipeCalculator] = {}
+            new_recipes: list[tuple[int, NewRecipe, list[RecipeLine]]] = []
+            for i, (request, prepared) in enumerate(zip(requests, results)):
+                if isinstance(prepared, HTTPException):
+                    continue
+                rules, color = prepared
+                key = (request.base_recipe_id, request.policy)
+                calculator = calculators.get(key)
+                if calculator is None:
+                    calculator = calculators[key] = RecipeCalculator(
+                        rules=rules, settings=settings, properties=properties, balance=resolver.balance,
+                        groups=groups, policy=request.policy, expiration_dates=expiration_dates,
+                    )
+                try:
+                    lines = calculator.calculate(color, request.batch_size)
+                except RecipeGenerationError as exc:
+                    results[i] = HTTPException(status_code=422, detail=str(exc))
+                    continue
+                shortages = [
+                    f'{line.nomenclature_id}: required {line.amount}, available {available}'
+                    for line in lines if line.amount > (available := resolver.balance(line.nomenclature_id))
+                ]
+                if shortages:
+                    results[i] = HTTPException(status_code=409, detail=f'not enough stock of {"; ".join(shortages)}')
+                    continue
+                resolver.consume((line.nomenclature_id, line.amount) for line in lines)
+                new_recipe = NewRecipe(
+                    base_recipe_id=request.base_recipe_id,
+                    nomenclature_id=request.nomenclature_id,
+                    batch_amount=request.batch_size,
+                    ingredients=[(line.nomenclature_id, line.amount) for line in lines],
+                )
+                new_recipes.append((i, new_recipe, lines))
+
+            recipes = await cls.DAL(session).create_recipes(
+                document_type_id=doc_type.id,
+                document_datetime=datetime.datetime.now(datetime.timezone.utc),
+                recipes=[new_recipe for _, new_recipe, _ in new_recipes],
+            )
+            for (i, _, lines), recipe in zip(new_recipes, recipes):
+                results[i] = GeneratedRecipe(recipe, lines)
+            return results
+
+    @classmethod
+    async def release_reservations(cls, recipe_id: uuid.UUID, session: AsyncSession) -> int:
+        async with session.begin():
+            return await cls.DAL(session).release_reservations(recipe_id)
+
+    @staticmethod
+    def _resolve_rules(
+            request: RecipeRequest,
+            products: Mapping[uuid.UUID, Mapping[str, Any]],
+            base_recipes: Mapping[uuid.UUID, Any],
+            compiled: Mapping[uuid.UUID, CompiledRules | RulesCompilationError],
+    ) -> tuple[CompiledRules, str]:
+        if request.nomenclature_id not in products:
+            raise HTTPException(status_code=404, detail='nomenclature not found')
+        color = products[request.nomenclature_id].get('color')
+        if not isinstance(color, str) or not color:
+            raise HTTPException(status_code=422, detail='nomenclature must have color property')
+
+        base_recipe = base_recipes.get(request.base_recipe_id)
+        if base_recipe is None:
+            raise HTTPException(status_code=404, detail='base recipe not found')
+        if base_recipe.status != DocumentStatuses.Posted:
+            raise HTTPException(status_code=422, detail='base recipe must be posted')
+        rules = compiled.get(request.base_recipe_id)
+        if rules is None:
+            # удалён между чтением заголовка и правил
+            raise HTTPException(status_code=404, detail='base recipe not found')
+        if isinstance(rules, RulesCompilationError):
+            raise HTTPException(status_code=422, detail=str(rules))
+        if rules.color(color) is None:
+            raise HTTPException(status_code=422, detail=f'there is no rules for color {color} in base recipe')
+        return rules, color
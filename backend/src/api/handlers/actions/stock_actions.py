@@ -0,0 +1,40 @@
+import datetime
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.services.stock_availability import stock_availability_index
+from db.dals import StockDAL
+from db.dals.stock import BalancesAt
+from db.reference_cache import reference_cache
+
+
+class StockActions:
+    """Class containing actions for stock balances, i.e. logic of session context managers and DAL calls."""
+    DAL = StockDAL
+
+    @classmethod
+    async def get_balances_at(
+            cls, at: datetime.datetime, nomenclature_ids: list[uuid.UUID] | None, session: AsyncSession
+    ) -> BalancesAt:
+        async with session.begin():
+            stock_dal = cls.DAL(db_session=session)
+            return await stock_dal.get_balances_at(at=at, nomenclature_ids=nomenclature_ids)
+
+    @classmethod
+    async def get_available_ids(
+            cls, group_id: uuid.UUID | None, include_subgroups: bool, session: AsyncSession
+    ) -> set[uuid.UUID] | None:
+        """Returns in-stock nomenclatures of the group (all of them without group_id), None if there is no such group."""
+        async with session.begin():
+            await stock_availability_index.refresh(session)
+            if group_id is None:
+                return stock_availability_index.all()
+            tree = await reference_cache.nomenclature_groups(session)
+            if group_id not in tree:
+                # группу могли создать в другом процессе после загрузки кеша
+                tree = await reference_cache.nomenclature_groups(session, refresh=True)
+        if group_id not in tree:
+            return None
+        group_ids = tree.descendants(group_id, include_self=True) if include_subgroups else {group_id}
+        return stock_availability_index.in_groups(group_ids)
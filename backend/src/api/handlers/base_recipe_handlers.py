@@ -1,3 +1,4 @@
+import datetime
 import uuid
 
 from asyncpg.exceptions import UniqueViolationError
@@ -8,11 +9,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.schemas import (
     BaseRecipeCreateResponse, BaseRecipeCreateRequest,
-    BaseRecipeReadResponse,
+    BaseRecipeReadResponse, BaseRecipeListResponse,
     BaseRecipeUpdateResponse, BaseRecipeUpdateRequest,
     BaseRecipeDeleteResponse,
 )
 from api.handlers.actions import BaseRecipeActions
+from api.pagination import PAGE_SIZE_DEFAULT, Cursor, PageSize, decode_cursor, split_page
 from db import get_session
 
 from constants import DocumentStatuses
@@ -41,9 +43,24 @@ async def get_base_recipe(base_recipe_id: uuid.UUID, session: AsyncSession = Dep
     return base_recipe
 
 
-@base_recipe_router.get('s/', response_model=list[BaseRecipeReadResponse])
-async def get_all_base_recipes(session: AsyncSession = Depends(get_session)):
-    return await BaseRecipeActions.get_all_base_recipes(session)
+@base_recipe_router.get('s/', response_model=BaseRecipeListResponse)
+async def get_all_base_recipes(
+        limit: PageSize = PAGE_SIZE_DEFAULT,
+        cursor: Cursor = None,
+        status: DocumentStatuses | None = None,
+        date_from: datetime.datetime | None = None,
+        date_to: datetime.datetime | None = None,
+        session: AsyncSession = Depends(get_session),
+):
+    """Страница базовых рецептов по (document_datetime, document_number); next_cursor пуст на последней странице."""
+    after = decode_cursor(cursor, datetime.datetime.fromisoformat, int, uuid.UUID) if cursor else None
+    base_recipes = await BaseRecipeActions.get_base_recipes_page(
+        session, limit + 1, after, status=status, date_from=date_from, date_to=date_to
+    )
+    page, next_cursor = split_page(
+        base_recipes, limit, key=lambda br: (br.document_datetime, br.document_number, br.id)
+    )
+    return BaseRecipeListResponse(base_recipes=page, next_cursor=next_cursor)
 
 
 @base_recipe_router.patch('/', response_model=BaseRecipeUpdateResponse)
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas import StockDocumentCreateRequest, StockDocumentCreateResponse
+from api.handlers.actions import DocumentActions
+from db import get_session
+
+
+document_router = APIRouter(prefix="/document/stock", tags=["Хэндлеры для складских документов"])
+
+
+@document_router.post('/', response_model=StockDocumentCreateResponse)
+async def create_stock_document(body: StockDocumentCreateRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Проводит складской документ (приход, отгрузку и т.п.) со всеми строками за один запрос.
+    Строки одной номенклатуры объединяются в одну с суммарным количеством; ошибки документа
+    возвращаются все сразу, по одной на строку detail.
+    """
+    document = await DocumentActions.create_stock_document(body, session)
+    return StockDocumentCreateResponse(
+        id=document.id,
+        document_number=document.document_number,
+        status=document.status,
+        document_datetime=document.document_datetime,
+        name=document.name,
+        commentary=document.commentary,
+        lines_count=len({line.nomenclature_id for line in body.lines}),
+    )
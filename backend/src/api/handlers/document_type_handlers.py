@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.schemas import DocumentTypeReadResponse
+from api.schemas import DocumentTypeReadResponse, DocumentTypeUpdateRequest
 from api.handlers.actions import DocumentTypeActions
 from db import get_session
 
@@ -13,3 +15,18 @@ document_type_router = APIRouter(prefix="/document-types", tags=["Хэндлер
 async def get_all_doc_types(session: AsyncSession = Depends(get_session)):
     doc_types = await DocumentTypeActions.get_all_document_types(session=session)
     return doc_types
+
+
+@document_type_router.patch('/{document_type_id}', response_model=DocumentTypeReadResponse)
+async def update_doc_type(document_type_id: uuid.UUID, body: DocumentTypeUpdateRequest,
+                          session: AsyncSession = Depends(get_session)):
+    """
+    Переключение режима нумерации документов типа: gapless — номера без пропусков через счётчик,
+    sequence — через последовательность, быстрее при частом создании документов, но с пропусками
+    после откатов. Нумерация продолжается с последнего выданного номера; на время переключения
+    создание документов приостанавливается.
+    """
+    doc_type = await DocumentTypeActions.set_numbering_mode(document_type_id, body.numbering_mode, session=session)
+    if doc_type is None:
+        raise HTTPException(status_code=404, detail="Document type does not exist.")
+    return doc_type
@@ -0,0 +1,48 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.services.dashboard import get_dashboard
+from api.services.live_updates import LiveEvent, live_updates
+from db import get_session
+from settings import get_settings
+
+events_router = APIRouter(prefix="/events", tags=["Живые обновления"])
+
+
+@events_router.get('')
+async def stream_live_updates(request: Request, session: AsyncSession = Depends(get_session)):
+    """
+    Поток server-sent events для экранов цеха вместо опроса /dashboard и остатков.
+
+    Первым приходит событие `dashboard` с текущей сводкой, затем при проведении документов — `dashboard`
+    с новой сводкой и `stock` со списком изменившихся остатков (nomenclature_id, balance, available).
+    """
+    # сводка хаба — за сегодня (UTC) либо None, если её нет или день уже сменился
+    initial = live_updates.dashboard
+    if initial is None:
+        initial = LiveEvent('dashboard', (await get_dashboard(session)).model_dump_json())
+    queue = live_updates.subscribe()
+    keepalive = get_settings().live_updates_keepalive_seconds
+
+    async def stream():
+        try:
+            yield initial.encode()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # комментарий SSE не даёт прокси закрыть простаивающее соединение
+                    yield b': keepalive\n\n'
+                    continue
+                yield event.encode()
+        finally:
+            live_updates.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,83 @@
+import datetime
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from api.handlers.actions.auth import get_current_user_from_token
+from api.services.export import EXPORT_WRITERS, stream_export
+from constants import DocumentStatuses, DocumentTypesEnum, ExportFormat
+from db import DatabaseSessionManager, get_sessionmanager
+from db.dals.document import document_lines_export_query
+from db.dals.nomenclature import nomenclature_export_query
+from db.dals.stock import stock_export_query
+
+export_router = APIRouter(
+    prefix="/export", tags=["Выгрузки"], dependencies=[Depends(get_current_user_from_token)]
+)
+
+Format = Annotated[ExportFormat, Query(alias='format', description="csv или xlsx")]
+
+
+def _export_response(
+        name: str, query: Select, export_format: ExportFormat, sessionmanager: DatabaseSessionManager
+) -> StreamingResponse:
+    writer = EXPORT_WRITERS[export_format]([column.key for column in query.selected_columns], name)
+    filename = f'{name}-{datetime.date.today():%Y%m%d}.{writer.extension}'
+    return StreamingResponse(
+        stream_export(sessionmanager, query, writer),
+        media_type=writer.media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+@export_router.get('/nomenclatures')
+async def export_nomenclatures(
+    sessionmanager: Annotated[DatabaseSessionManager, Depends(get_sessionmanager)],
+    export_format: Format = ExportFormat.csv,
+    group_id: uuid.UUID | None = None,
+    type_id: uuid.UUID | None = None,
+    include_subgroups: bool = True,
+):
+    """Справочник номенклатуры потоком строк, по (name, id); по умолчанию группа берётся вместе с подгруппами."""
+    query = nomenclature_export_query(group_id=group_id, type_id=type_id, include_subgroups=include_subgroups)
+    return _export_response('nomenclatures', query, export_format, sessionmanager)
+
+
+@export_router.get('/stock')
+async def export_stock(
+    sessionmanager: Annotated[DatabaseSessionManager, Depends(get_sessionmanager)],
+    export_format: Format = ExportFormat.csv,
+    group_id: uuid.UUID | None = None,
+    include_subgroups: bool = True,
+):
+    """Остатки: остаток, резерв и доступное количество по каждой номенклатуре со строкой в stock_balances."""
+    query = stock_export_query(group_id=group_id, include_subgroups=include_subgroups)
+    return _export_response('stock', query, export_format, sessionmanager)
+
+
+@export_router.get('/documents')
+async def export_document_lines(
+    sessionmanager: Annotated[DatabaseSessionManager, Depends(get_sessionmanager)],
+    export_format: Format = ExportFormat.csv,
+    date_from: datetime.date | None = None,
+    date_to: datetime.date | None = None,
+    document_type: DocumentTypesEnum | None = None,
+    status: DocumentStatuses | None = None,
+):
+    """
+    Строки документов с заголовками за период [date_from, date_to] включительно (границы суток в UTC),
+    по дате документа.
+    """
+    def day_start(day: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+    query = document_lines_export_query(
+        since=day_start(date_from) if date_from is not None else None,
+        until=day_start(date_to + datetime.timedelta(days=1)) if date_to is not None else None,
+        document_type=document_type,
+        status=status,
+    )
+    return _export_response('documents', query, export_format, sessionmanager)
@@ -0,0 +1,35 @@
+import uuid
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas import JobCreateRequest, JobResponse
+from api.handlers.actions import JobActions
+from db import get_session
+
+
+job_router = APIRouter(prefix="/jobs", tags=["Хэндлеры для фоновых заданий"])
+
+
+@job_router.post('', response_model=JobResponse, status_code=202)
+async def create_job(body: JobCreateRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Ставит задание в очередь и сразу возвращает его; ход выполнения — в GET /jobs/{job_id}.
+    Виды заданий: rebuild_stock_balances (params: dry_run), generate_recipes (params: items, как в /recipe/batch).
+    """
+    return await JobActions.create_job(body.kind, body.params, session)
+
+
+@job_router.get('/{job_id}', response_model=JobResponse)
+async def get_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
+    """Статус, прогресс (processed из total), результат или ошибка задания."""
+    return await JobActions.get_job(job_id, session)
+
+
+@job_router.post('/{job_id}/cancel', response_model=JobResponse)
+async def cancel_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
+    """
+    Отменяет задание из очереди сразу, а выполняющееся — при следующем отчёте о прогрессе;
+    уже сохранённая заданием часть работы остаётся.
+    """
+    return await JobActions.cancel_job(job_id, session)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+
+from api.schemas import DbPoolMetrics, PasswordHashingMetrics
+from db.engine import sessionmanager
+from hashing import hashing_pool
+
+
+metrics_router = APIRouter(prefix="/metrics", tags=["Метрики"])
+
+
+@metrics_router.get('/password-hashing', response_model=PasswordHashingMetrics)
+async def get_password_hashing_metrics():
+    """Состояние пула хеширования паролей: сколько вызовов ждут и сколько в среднем длится ожидание."""
+    stats = hashing_pool.stats
+    return PasswordHashingMetrics(
+        concurrency=hashing_pool.concurrency,
+        completed=stats.completed,
+        waiting=stats.waiting,
+        running=stats.running,
+        avg_wait_ms=stats.total_wait_seconds / stats.completed * 1000 if stats.completed else 0.0,
+        max_wait_ms=stats.max_wait_seconds * 1000,
+    )
+
+
+@metrics_router.get('/db-pool', response_model=DbPoolMetrics)
+async def get_db_pool_metrics():
+    """
+    Пул соединений с БД этого процесса: занятые соединения, overflow и ожидание свободного соединения.
+    checked_out, упирающийся в size + max_overflow, и растущие timeouts означают исчерпание пула.
+    """
+    return DbPoolMetrics(**sessionmanager.pool_stats())
@@ -0,0 +1,63 @@
+from typing import Annotated, List
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas.nomenclature import NomenclatureGroupResponse, NomenclatureGroupTreeNode
+from api.services.nomenclature_group import NomenclatureGroupService
+from db.user_cache import AuthenticatedUser
+from db.reference_cache import NomenclatureGroupTree
+from api.handlers.actions.auth import get_current_user_from_token
+from db import get_session
+
+router = APIRouter(prefix="/nomenclature-groups", tags=["nomenclature groups"])
+
+
+def _tree_nodes(tree: NomenclatureGroupTree, group_ids: tuple[UUID, ...]) -> List[NomenclatureGroupTreeNode]:
+    return [
+        NomenclatureGroupTreeNode(
+            id=group_id, name=tree[group_id].name, children=_tree_nodes(tree, tree.children(group_id))
+        )
+        for group_id in group_ids
+    ]
+
+
+@router.get("/tree", response_model=List[NomenclatureGroupTreeNode])
+async def get_nomenclature_group_tree(
+    db: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
+):
+    """
+    Всё дерево групп номенклатуры; подгруппы упорядочены по названию.
+    Дерево читается из кеша справочников процесса: группы, созданные в другом процессе или сырым SQL,
+    появляются в нём не позже чем через reference_cache_ttl_seconds.
+    """
+    tree = await NomenclatureGroupService(db).get_tree()
+    return _tree_nodes(tree, tree.roots)
+
+
+@router.get("/{group_id}/ancestors", response_model=List[NomenclatureGroupResponse])
+async def get_nomenclature_group_ancestors(
+    group_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
+):
+    """Цепочка родительских групп от корня до непосредственного родителя."""
+    ancestors = await NomenclatureGroupService(db).get_ancestors(group_id)
+    if ancestors is None:
+        raise HTTPException(status_code=404, detail="Nomenclature group not found")
+    return ancestors
+
+
+@router.get("/{group_id}/descendants", response_model=List[NomenclatureGroupResponse])
+async def get_nomenclature_group_descendants(
+    group_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
+):
+    """Все подгруппы на любой глубине. Номенклатура поддерева: GET /nomenclatures/?group_id=...&include_subgroups=true."""
+    descendants = await NomenclatureGroupService(db).get_descendants(group_id)
+    if descendants is None:
+        raise HTTPException(status_code=404, detail="Nomenclature group not found")
+    return descendants
@@ -1,32 +1,53 @@
-from typing import Annotated
+import io
+from pathlib import PurePath
+from typing import Annotated, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.schemas.nomenclature import NomenclatureListResponse, NomenclatureResponse, NomenclatureCreate, NomenclatureUpdate
+from api.schemas.nomenclature import (
+    NomenclatureListResponse, NomenclatureResponse, NomenclatureCreate, NomenclatureUpdate,
+    NomenclatureSearchResponse, NomenclatureSearchResult, NomenclatureSuggestion, NomenclatureImportResponse,
+)
 from api.services.nomenclature import NomenclatureService
-from db.models import User
+from api.services.nomenclature_import import IMPORT_READERS, ImportFileError, NomenclatureImporter
+from api.pagination import PAGE_SIZE_DEFAULT, Cursor, PageSize, decode_cursor, split_page
+from db.user_cache import AuthenticatedUser
 from api.handlers.actions.auth import get_current_user_from_token
-from db import get_session
+from constants import ImportFormat
+from db import DatabaseSessionManager, get_session, get_sessionmanager
 
 router = APIRouter(prefix="/nomenclatures", tags=["nomenclatures"])
 
+# триграммный индекс не помогает строкам короче трёх символов: такой поиск стал бы полным просмотром таблицы
+SEARCH_MIN_LENGTH = 3
+
 
 @router.get("/", response_model=NomenclatureListResponse)
 async def get_all_nomenclatures(
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)]
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)],
+    limit: PageSize = PAGE_SIZE_DEFAULT,
+    cursor: Cursor = None,
+    group_id: Optional[UUID] = None,
+    type_id: Optional[UUID] = None,
+    include_subgroups: bool = Query(False, description="Включить номенклатуру всех подгрупп group_id")
 ):
+    """Страница номенклатуры по (name, id); next_cursor пуст на последней странице."""
+    after = decode_cursor(cursor, str, UUID) if cursor else None
     service = NomenclatureService(db)
-    nomenclatures = await service.get_all()
-    return NomenclatureListResponse(nomenclatures=nomenclatures)
+    nomenclatures = await service.get_page(
+        limit=limit + 1, after=after, group_id=group_id, type_id=type_id, include_subgroups=include_subgroups
+    )
+    page, next_cursor = split_page(nomenclatures, limit, key=lambda n: (n.name, n.id))
+    return NomenclatureListResponse(nomenclatures=page, next_cursor=next_cursor)
 
 
 @router.get("/{nomenclature_id}", response_model=NomenclatureResponse)
 async def get_nomenclature_by_id(
     nomenclature_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)]
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
 ):
     service = NomenclatureService(db)
     nomenclature = await service.get_by_id(nomenclature_id)
@@ -38,19 +59,53 @@ async def get_nomenclature_by_id(
 @router.get("/search/by-name", response_model=NomenclatureListResponse)
 async def get_nomenclature_by_name(
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)],
-    name: str = Query(..., description="Название номенклатуры для поиска")
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)],
+    name: str = Query(..., min_length=SEARCH_MIN_LENGTH, description="Название номенклатуры для поиска")
 ):
     service = NomenclatureService(db)
     nomenclatures = await service.get_by_name(name)
     return NomenclatureListResponse(nomenclatures=nomenclatures)
 
 
+@router.get("/search/fuzzy", response_model=NomenclatureSearchResponse)
+async def search_nomenclatures(
+    db: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)],
+    q: str = Query(
+        ..., min_length=SEARCH_MIN_LENGTH, max_length=100, description="Строка поиска по названию, артикулу и штрихкоду"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    group_id: Optional[UUID] = None,
+    type_id: Optional[UUID] = None
+):
+    """Нечёткий поиск номенклатуры с ранжированием по сходству, устойчивый к опечаткам."""
+    service = NomenclatureService(db)
+    found = await service.search(q, limit=limit, offset=offset, group_id=group_id, type_id=type_id)
+    return NomenclatureSearchResponse(results=[
+        NomenclatureSearchResult(nomenclature=nomenclature, score=score) for nomenclature, score in found
+    ])
+
+
+@router.get("/search/typeahead", response_model=list[NomenclatureSuggestion])
+async def suggest_nomenclatures(
+    db: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)],
+    q: str = Query(..., min_length=SEARCH_MIN_LENGTH, max_length=100),
+    limit: int = Query(10, ge=1, le=20)
+):
+    """Подсказки при вводе: только id, название и артикул, без связанных справочников, лучшие совпадения первыми."""
+    service = NomenclatureService(db)
+    return [
+        NomenclatureSuggestion.model_validate(row, from_attributes=True) for row in await service.typeahead(q, limit)
+    ]
+
+
 @router.post("/", response_model=NomenclatureResponse)
 async def create_nomenclature(
     nomenclature_data: NomenclatureCreate,
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)]
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
 ):
     service = NomenclatureService(db)
     try:
@@ -70,12 +125,48 @@ async def create_nomenclature(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/import", response_model=NomenclatureImportResponse)
+async def import_nomenclatures(
+    file: UploadFile,
+    sessionmanager: Annotated[DatabaseSessionManager, Depends(get_sessionmanager)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)],
+    import_format: Optional[ImportFormat] = Query(
+        None, alias="format", description="csv или jsonl; по умолчанию — по расширению файла"
+    ),
+    dry_run: bool = Query(False, description="Только проверить строки, ничего не записывая")
+):
+    """
+    Массовая загрузка номенклатуры из CSV (UTF-8, первая строка — заголовок) или JSONL.
+    Существующая номенклатура обновляется по sku, без sku — по штрихкоду, без обоих — по группе и названию.
+    Тип, группа и единица измерения задаются id или названием. Ошибочные строки пропускаются
+    и перечисляются в errors с номерами строк файла.
+    """
+    if import_format is None:
+        try:
+            import_format = ImportFormat(PurePath(file.filename or "").suffix.lstrip(".").lower())
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Unknown file extension, pass format=csv or format=jsonl")
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = await NomenclatureImporter(sessionmanager).run(IMPORT_READERS[import_format](lines), dry_run=dry_run)
+    except ImportFileError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return NomenclatureImportResponse(
+        dry_run=dry_run,
+        total=report.total,
+        inserted=report.inserted,
+        updated=report.updated,
+        failed=len(report.errors),
+        errors=[error._asdict() for error in report.errors],
+    )
+
+
 @router.put("/{nomenclature_id}", response_model=NomenclatureResponse)
 async def update_nomenclature(
     nomenclature_id: UUID,
     nomenclature_data: NomenclatureUpdate,
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)]
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
 ):
     service = NomenclatureService(db)
     
@@ -105,7 +196,7 @@ async def update_nomenclature(
 async def delete_nomenclature(
     nomenclature_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user_from_token)]
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user_from_token)]
 ):
     service = NomenclatureService(db)
     
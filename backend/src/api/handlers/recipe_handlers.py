@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import select, func
+from sqlalchemy import select
 from typing import Annotated
 from asyncpg.exceptions import UniqueViolationError
 from fastapi import APIRouter, Depends, HTTPException
@@ -14,8 +14,10 @@ from api.schemas import (
     BaseRecipeReadResponse,
     BaseRecipeUpdateResponse, BaseRecipeUpdateRequest,
     BaseRecipeDeleteResponse,
+    GenerateRecipeRequest,
 )
-from api.handlers.actions import BaseRecipeActions
+from api.handlers.actions import BaseRecipeActions, RecipeActions
+from api.handlers.actions.recipe_actions import GeneratedRecipe, RecipeRequest
 from db import get_session
 from api.schemas.base_models import BaseModel
 
@@ -26,11 +28,8 @@ from uuid import UUID as PydanticUUID
 import datetime
 from typing import Any
 from copy import deepcopy
-from api.schemas.rules_schemas import Rules
 
-from db.models import Nomenclature, BaseRecipe, StockMove, NomenclatureGroup
-from db.models.recipe_generation_settings import RecipeGenerationSettings
-from constants import DosageTypeEnum
+from db.models import Nomenclature, BaseRecipe
 
 import logging
 
@@ -56,20 +55,16 @@ class RecipeModel(BaseModel):
 PositiveDecimal = Annotated[Decimal, Field(gt=0)]
 
 
-class GenerateRecipeRequest(BaseModel):
-    base_recipe_id: PydanticUUID
-    nomenclature_id: PydanticUUID
-    batch_size: PositiveDecimal
-
+RECIPE_BATCH_MAX = 500
 
-class Dosage(BaseModel):
-    type: DosageTypeEnum
-    value: PositiveDecimal
+class GenerateRecipeBatchRequest(BaseModel):
+    items: conlist(GenerateRecipeRequest, min_length=1, max_length=RECIPE_BATCH_MAX)
 
 
-class Properties(BaseModel):
-    color: str | None = None
-    dosage: Dosage | None = None
+class RecipeBatchItem(BaseModel):
+    status_code: int = 200
+    detail: str | None = None
+    recipe: RecipeModel | None = None
 
 
 recipe_router = APIRouter(prefix="/recipe", tags=["Хэндлеры для Recipe"])
@@ -77,151 +72,46 @@ recipe_router = APIRouter(prefix="/recipe", tags=["Хэндлеры для Recip
 import logging
 logger = logging.getLogger()
 
+def _recipe_model(generated: GeneratedRecipe) -> RecipeModel:
+    recipe, lines = generated
+    return RecipeModel(
+        id=recipe.id,
+        nomenclature_id=recipe.nomenclature_id,
+        base_recipe_id=recipe.base_recipe_id,
+        ingredients=[IngredientModel(material_uuid=line.nomenclature_id, amount=line.amount) for line in lines],
+        document_datetime=recipe.document_datetime,
+    )
+
+
 @recipe_router.post('/', response_model=RecipeModel)
 async def create_recipe(body: GenerateRecipeRequest, session: AsyncSession = Depends(get_session)) -> RecipeModel:
-    res = await session.execute(select(Nomenclature).where(Nomenclature.id == body.nomenclature_id))
-    nomenclature = res.scalars().first()
-    if nomenclature is None:
-        raise HTTPException(status_code=404, detail='nomenclature not found')
-    properties = Properties(**nomenclature.properties)
-    color = properties.color
-    if color is None:
-        raise HTTPException(status_code=422, detail='nomenclature must have color property')
-
-    res = await session.execute(select(BaseRecipe).where(BaseRecipe.id == body.base_recipe_id))
-    base_recipe = res.scalars().first()
-    if base_recipe is None:
-        raise HTTPException(status_code=404, detail='base recipe not found')
-    if base_recipe.status != 'Posted':
-        raise HTTPException(status_code=422, detail='base recipe must be posted')
-
-    rules = Rules(**base_recipe.rules)
-
-    color_data = None
-    for c_d in rules.pigment_part:
-        if c_d.color.lower() == color.lower():
-            color_data = c_d
-            break
-    if color_data is None:
-        raise HTTPException(status_code=422, detail=f'there is no rules for color {color} in base recipe')
-
-    res = await session.execute(select(RecipeGenerationSettings).where(RecipeGenerationSettings.id == 1))
-    settings = res.scalars().first()
-    if settings is None:
-        raise HTTPException(status_code=422, detail=f'set recipe generation settings on SETTINGS page')
-
-    film_formers_common = rules.film_former_part.materials.root
-    film_formers = []
-
-    for m_d in color_data.materials:
-        if m_d.nomenclature_group_id == settings.film_formers_group_id:
-            film_formers.extend(m_d.items.root)
-    film_formers.extend(film_formers_common)
-
-    film_formers_available = []
-    for item in film_formers:
-        q = await session.execute(
-            select(
-                StockMove.nomenclature_id,
-                func.coalesce(func.sum(StockMove.qty), 0).label("balance")
-            )
-            .where(StockMove.nomenclature_id.in_(item.uuids))
-            .group_by(StockMove.nomenclature_id)
-        )
-        rows = q.all()
-        balances: dict[uuid.UUID, Decimal] = {nom_id: balance for nom_id, balance in rows}
-        film_formers_available.extend([u for u in item.uuids if balances.get(u, Decimal(0)) > 0])
-
-    if not film_formers_available:
-        raise HTTPException(
-            status_code=422,
-            detail="there are no film formers available in stock"
-        )
-
-    pigments = []
-    for block in color_data.materials:
-        if block.nomenclature_group_id == settings.pigments_group_id:
-            pigments.extend(block.items.root)
-
-    pigments_available = []
-    for item in pigments:
-        q = await session.execute(
-            select(
-                StockMove.nomenclature_id,
-                func.coalesce(func.sum(StockMove.qty), 0).label("balance")
-            )
-            .where(StockMove.nomenclature_id.in_(item.uuids))
-            .group_by(StockMove.nomenclature_id)
-        )
-        rows = q.all()
-        balances: dict[uuid.UUID, Decimal] = {nom_id: balance for nom_id, balance in rows}
-        pigments_available.extend([u for u in item.uuids if balances.get(u, Decimal(0)) > 0])
-
-    if not pigments_available:
-        raise HTTPException(
-            status_code=422,
-            detail="there are no pigments available in stock"
-        )
-
-    fillers = []
-    for block in color_data.materials:
-        if block.nomenclature_group_id == settings.fillers_group_id:
-            fillers.extend(block.items.root)
-
-    fillers_available = []
-    for item in fillers:
-        q = await session.execute(
-            select(
-                StockMove.nomenclature_id,
-                func.coalesce(func.sum(StockMove.qty), 0).label("balance")
-            )
-            .where(StockMove.nomenclature_id.in_(item.uuids))
-            .group_by(StockMove.nomenclature_id)
-        )
-        rows = q.all()
-        balances: dict[uuid.UUID, Decimal] = {nom_id: balance for nom_id, balance in rows}
-        fillers_available.extend([u for u in item.uuids if balances.get(u, Decimal(0)) > 0])
-
-    if not fillers_available:
-        raise HTTPException(
-            status_code=422,
-            detail="there are no fillers available in stock"
-        )
-
-    additives_part = rules.additives_part.materials
-    additives = []
-    for group in additives_part:
-        group_items = []
-        for m_d in color_data.materials:
-            if m_d.nomenclature_group_id == group.nomenclature_group_id:
-                group_items.extend(m_d.items.root)
-        group_items.extend(group.items.root)
-
-        group_available = []
-        for item in group_items:
-            q = await session.execute(
-                select(
-                    StockMove.nomenclature_id,
-                    func.coalesce(func.sum(StockMove.qty), 0).label("balance")
-                )
-                .where(StockMove.nomenclature_id.in_(item.uuids))
-                .group_by(StockMove.nomenclature_id)
-            )
-            rows = q.all()
-            balances: dict[uuid.UUID, Decimal] = {nom_id: balance for nom_id, balance in rows}
-            group_available.extend([u for u in item.uuids if balances.get(u, Decimal(0)) > 0])
-        res = await session.execute(
-            select(NomenclatureGroup.name).where(NomenclatureGroup.id == group.nomenclature_group_id)
-        )
-        group_name = res.scalars().first()
-        if not group_available:
-            raise HTTPException(
-                status_code=422,
-                detail=f"there are no {group_name} available in stock"
-            )
-        additives.append(group_available)
-
-    print(additives)
-
-
-    return RecipeModel(nomenclature_id=body.nomenclature_id, base_recipe_id=body.base_recipe_id)
+    generated = await RecipeActions.generate_recipe(
+        body.base_recipe_id, body.nomenclature_id, body.batch_size, session, policy=body.policy
+    )
+    return _recipe_model(generated)
+
+
+@recipe_router.post('/batch', response_model=list[RecipeBatchItem])
+async def create_recipes(body: GenerateRecipeBatchRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Генерирует рецепты для всех позиций сразу и сохраняет их одной транзакцией.
+    Результаты идут в порядке позиций; позиция с ошибкой получает её код и текст, остальные сохраняются.
+    """
+    results = await RecipeActions.generate_recipes(
+        [
+            RecipeRequest(item.base_recipe_id, item.nomenclature_id, item.batch_size, item.policy)
+            for item in body.items
+        ], session
+    )
+    return [
+        RecipeBatchItem(status_code=result.status_code, detail=result.detail)
+        if isinstance(result, HTTPException) else RecipeBatchItem(recipe=_recipe_model(result))
+        for result in results
+    ]
+
+
+@recipe_router.delete('/{recipe_id}/reservations')
+async def release_recipe_reservations(recipe_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
+    """Снимает резерв материалов рецепта, например после выпуска продукции или отказа от замеса."""
+    released = await RecipeActions.release_reservations(recipe_id, session)
+    return {'recipe_id': recipe_id, 'released': released}
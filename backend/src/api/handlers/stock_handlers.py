@@ -0,0 +1,58 @@
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas import NomenclatureBalance, StockAvailableResponse, StockBalanceAtResponse
+from api.handlers.actions import StockActions
+from db import get_session
+
+
+stock_router = APIRouter(prefix="/stock", tags=["Хэндлеры для остатков"])
+
+
+@stock_router.get('/balance', response_model=StockBalanceAtResponse)
+async def get_stock_balance_at(
+    at: datetime.datetime | None = None,
+    nomenclature_id: Annotated[list[uuid.UUID] | None, Query()] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Остатки на момент `at` (по умолчанию — сейчас): ближайший месячный снимок плюс движения после него.
+    Без nomenclature_id возвращаются все номенклатуры с ненулевым остатком.
+    """
+    if at is None:
+        at = datetime.datetime.now(datetime.timezone.utc)
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=datetime.timezone.utc)
+
+    result = await StockActions.get_balances_at(at=at, nomenclature_ids=nomenclature_id, session=session)
+    balances = result.balances
+    if nomenclature_id is not None:
+        balances = {nom_id: balances.get(nom_id, Decimal(0)) for nom_id in nomenclature_id}
+    return StockBalanceAtResponse(
+        at=at,
+        snapshot_month=result.snapshot_month,
+        balances=[NomenclatureBalance(nomenclature_id=k, balance=v) for k, v in balances.items()],
+    )
+
+
+@stock_router.get('/available', response_model=StockAvailableResponse)
+async def get_available_nomenclatures(
+    group_id: uuid.UUID | None = None,
+    include_subgroups: bool = True,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Номенклатуры группы с положительным доступным остатком (остаток за вычетом резервов), по умолчанию
+    вместе с подгруппами. Без group_id возвращаются все такие номенклатуры.
+    """
+    nomenclature_ids = await StockActions.get_available_ids(
+        group_id=group_id, include_subgroups=include_subgroups, session=session
+    )
+    if nomenclature_ids is None:
+        raise HTTPException(status_code=404, detail='nomenclature group not found')
+    return StockAvailableResponse(group_id=group_id, nomenclature_ids=sorted(nomenclature_ids))
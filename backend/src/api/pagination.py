@@ -0,0 +1,43 @@
+"""
+Keyset (cursor) pagination shared by list endpoints.
+
+A cursor is the sort key of the last row of the previous page, JSON-encoded and base64url-wrapped,
+so the next page is a `WHERE (key) > (cursor)` range scan over the sort index instead of an OFFSET.
+"""
+import base64
+import binascii
+import json
+from typing import Annotated, Any, Callable
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 500
+
+PageSize = Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX, description="Number of rows per page")]
+Cursor = Annotated[str | None, Query(description="Cursor returned with the previous page")]
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(jsonable_encoder(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> tuple:
+    """Parses cursor values with the given parsers, one per sort key column."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=422, detail="Invalid cursor.")
+
+
+def split_page(rows: list, limit: int, key: Callable[[Any], tuple]) -> tuple[list, str | None]:
+    """Takes rows fetched with `limit + 1` and returns the page and the cursor of the next one, if any."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
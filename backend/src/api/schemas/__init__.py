@@ -2,30 +2,52 @@ from .base_recipe_schemas import (
     BaseRecipeCreateResponse,
     BaseRecipeCreateRequest,
     BaseRecipeReadResponse,
+    BaseRecipeListResponse,
     BaseRecipeUpdateResponse,
     BaseRecipeUpdateRequest,
     BaseRecipeDeleteResponse,
 )
 
-from .document_type_schemas import DocumentTypeReadResponse
+from .document_type_schemas import DocumentTypeReadResponse, DocumentTypeUpdateRequest
+from .document_schemas import DocumentLineCreate, StockDocumentCreateRequest, StockDocumentCreateResponse
 
 from .token import Token
-from .dashboard_schemas import DashboardResponse, DocumentForDashboard
+from .dashboard_schemas import DashboardResponse, DocumentForDashboard, DocumentTypeDayStats
 from .counterparty_schemas import CounterpartyCreate, CounterpartyRead, CounterpartyUpdate
+from .stock_schemas import NomenclatureBalance, StockAvailableResponse, StockBalanceAtResponse
+from .metrics_schemas import DbPoolMetrics, PasswordHashingMetrics
+from .recipe_schemas import GenerateRecipeRequest
+from .job_schemas import GenerateRecipesJobParams, JobCreateRequest, JobResponse, RebuildStockBalancesJobParams
 
 
 __all__ = (
     'DocumentTypeReadResponse',
+    'DocumentTypeUpdateRequest',
+    'DocumentLineCreate',
+    'StockDocumentCreateRequest',
+    'StockDocumentCreateResponse',
     'BaseRecipeCreateResponse',
     'BaseRecipeCreateRequest',
     'BaseRecipeReadResponse',
+    'BaseRecipeListResponse',
     'BaseRecipeUpdateResponse',
     'BaseRecipeUpdateRequest',
     'BaseRecipeDeleteResponse',
     'Token',
     'DashboardResponse',
     'DocumentForDashboard',
+    'DocumentTypeDayStats',
     'CounterpartyCreate',
     'CounterpartyRead',
     'CounterpartyUpdate',
+    'NomenclatureBalance',
+    'StockBalanceAtResponse',
+    'StockAvailableResponse',
+    'PasswordHashingMetrics',
+    'DbPoolMetrics',
+    'GenerateRecipeRequest',
+    'GenerateRecipesJobParams',
+    'JobCreateRequest',
+    'JobResponse',
+    'RebuildStockBalancesJobParams',
 )
@@ -72,6 +72,12 @@ class BaseRecipeReadResponse(ResponseModel):
     rules: Rules | dict
 
 
+class BaseRecipeListResponse(ResponseModel):
+    """Page of base recipes; next_cursor is None on the last page."""
+    base_recipes: list[BaseRecipeReadResponse]
+    next_cursor: str | None = None
+
+
 class BaseRecipeUpdateRequest(BaseModel):
     """Scheme for validating BaseRecipe update request."""
     status: DocumentStatuses | None = None
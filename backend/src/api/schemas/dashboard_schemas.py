@@ -1,4 +1,6 @@
-from pydantic import BaseModel, PositiveInt
+from decimal import Decimal
+
+from pydantic import BaseModel, NonNegativeInt
 
 import datetime
 import uuid
@@ -6,12 +8,25 @@ import uuid
 
 class DocumentForDashboard(BaseModel):
     id: uuid.UUID
+    document_number: int
+    name: str | None
     document_datetime: datetime.datetime
-    counterparty_name: str
-    number_of_nomenclatures: PositiveInt
+    number_of_nomenclatures: NonNegativeInt
+
+
+class DocumentTypeDayStats(BaseModel):
+    document_type: str
+    documents: int
+    lines: int
+    qty: Decimal
 
 
 class DashboardResponse(BaseModel):
-    operations_today: PositiveInt
+    day: datetime.date
+    total_nomenclatures: NonNegativeInt
+    total_counterparties: NonNegativeInt
+    operations_today: NonNegativeInt
+    production_today: Decimal
+    by_document_type: list[DocumentTypeDayStats]
     latest_receipts: list[DocumentForDashboard]
     latest_shipments: list[DocumentForDashboard]
@@ -1,12 +1,43 @@
-# import datetime
-# import uuid
-#
-# from pydantic import PositiveInt
-#
-# from .base_models import ResponseModel
-#
-# class DocumentForDashboard(ResponseModel):
-#     id: uuid.UUID
-#     document_datetime: datetime.datetime
-#     counterparty_name: str
-#     number_of_nomenclatures: PositiveInt
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Annotated
+
+from pydantic import Field
+
+from constants import DocumentStatuses, DocumentTypesEnum
+from .base_models import BaseModel, ResponseModel
+from .base_recipe_schemas import DocumentDatetime
+
+LineQty = Annotated[
+    Decimal, Field(gt=0, max_digits=18, decimal_places=4, description="Positive, the sign comes from the document type")
+]
+
+
+class DocumentLineCreate(BaseModel):
+    nomenclature_id: uuid.UUID
+    qty: LineQty
+
+
+class StockDocumentCreateRequest(BaseModel):
+    """Scheme for validating stock document (receipt, shipment, ...) creation request."""
+    document_type: DocumentTypesEnum
+    status: DocumentStatuses = DocumentStatuses.Posted
+    document_datetime: DocumentDatetime
+    name: str | None = None
+    commentary: str = ''
+    recipe_id: uuid.UUID | None = Field(
+        None, description="Recipe the document is posted for; its stock reservations are settled with the document"
+    )
+    lines: list[DocumentLineCreate] = Field(min_length=1)
+
+
+class StockDocumentCreateResponse(ResponseModel):
+    """Scheme describing how to respond to stock document creation request."""
+    id: uuid.UUID
+    document_number: int
+    status: DocumentStatuses
+    document_datetime: datetime.datetime
+    name: str | None
+    commentary: str
+    lines_count: int
@@ -1,5 +1,5 @@
 import uuid
-from constants import DocumentTypesEnum
+from constants import DocumentTypesEnum, DocumentNumberingModes
 
 from .base_models import BaseModel, ResponseModel
 
@@ -8,8 +8,14 @@ class DocumentTypeReadResponse(ResponseModel):
     """Scheme describing how to respond to DocumentType reading request."""
     id: uuid.UUID
     name: DocumentTypesEnum
+    numbering_mode: DocumentNumberingModes
 
 
 class DocumentTypeReadRequest(BaseModel):
     """Scheme for validating DocumentType reading request."""
     id_or_name: uuid.UUID | DocumentTypesEnum
+
+
+class DocumentTypeUpdateRequest(BaseModel):
+    """Scheme for validating DocumentType update request."""
+    numbering_mode: DocumentNumberingModes
@@ -0,0 +1,40 @@
+import datetime
+import uuid
+from typing import Any
+
+from pydantic import BaseModel, conlist
+
+from constants import JobStatuses
+from .base_models import ResponseModel
+from .recipe_schemas import GenerateRecipeRequest
+
+RECIPE_JOB_MAX = 10000
+
+
+class JobCreateRequest(BaseModel):
+    kind: str
+    # проверяются моделью параметров своего вида задания
+    params: dict[str, Any] = {}
+
+
+class JobResponse(ResponseModel):
+    id: uuid.UUID
+    kind: str
+    status: JobStatuses
+    processed: int
+    total: int | None
+    result: Any | None
+    error: str | None
+    cancel_requested: bool
+    created_at: datetime.datetime
+    started_at: datetime.datetime | None
+    finished_at: datetime.datetime | None
+
+
+class RebuildStockBalancesJobParams(BaseModel):
+    # только показать расхождения, не исправляя их
+    dry_run: bool = False
+
+
+class GenerateRecipesJobParams(BaseModel):
+    items: conlist(GenerateRecipeRequest, min_length=1, max_length=RECIPE_JOB_MAX)
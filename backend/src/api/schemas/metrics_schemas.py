@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class PasswordHashingMetrics(BaseModel):
+    concurrency: int
+    completed: int
+    waiting: int
+    running: int
+    avg_wait_ms: float
+    max_wait_ms: float
+
+
+class DbPoolMetrics(BaseModel):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
@@ -7,18 +7,33 @@ class NomenclatureTypeResponse(BaseModel):
     id: UUID
     name: str
 
+    class Config:
+        from_attributes = True
+
 
 class MeasureUnitResponse(BaseModel):
     id: UUID
     name: str
     short_name: str
 
+    class Config:
+        from_attributes = True
+
 
 class NomenclatureGroupResponse(BaseModel):
     id: UUID
     name: str
     parent_id: Optional[UUID] = None
 
+    class Config:
+        from_attributes = True
+
+
+class NomenclatureGroupTreeNode(BaseModel):
+    id: UUID
+    name: str
+    children: List["NomenclatureGroupTreeNode"] = Field(default_factory=list)
+
 
 class NomenclatureResponse(BaseModel):
     id: UUID
@@ -40,6 +55,22 @@ class NomenclatureResponse(BaseModel):
 
 class NomenclatureListResponse(BaseModel):
     nomenclatures: List[NomenclatureResponse]
+    next_cursor: Optional[str] = None
+
+
+class NomenclatureSearchResult(BaseModel):
+    nomenclature: NomenclatureResponse
+    score: float
+
+
+class NomenclatureSearchResponse(BaseModel):
+    results: List[NomenclatureSearchResult]
+
+
+class NomenclatureSuggestion(BaseModel):
+    id: UUID
+    name: str
+    sku: Optional[str] = None
 
 
 class NomenclatureCreate(BaseModel):
@@ -59,4 +90,18 @@ class NomenclatureUpdate(BaseModel):
     type_id: UUID
     group_id: UUID
     measure_unit_id: UUID
-    properties: Dict[str, Any] = Field(default_factory=dict) 
\ No newline at end of file
+    properties: Dict[str, Any] = Field(default_factory=dict) 
+
+
+class NomenclatureImportError(BaseModel):
+    line: int
+    message: str
+
+
+class NomenclatureImportResponse(BaseModel):
+    dry_run: bool
+    total: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[NomenclatureImportError]
@@ -1,10 +1,11 @@
 import datetime
 import uuid
+from decimal import Decimal
 from typing import Annotated
 
 from pydantic import Field, PositiveInt, PositiveFloat
 
-from constants import DocumentStatuses
+from constants import DocumentStatuses, MaterialSelectionPolicy
 from .base_models import BaseModel, ResponseModel
 
 DocumentDatetime = Annotated[datetime.datetime | None, Field(default_factory=datetime.datetime.now)]
@@ -53,3 +54,15 @@ class RecipeResponse(ResponseModel):
     nomenclature_id: uuid.UUID
     base_recipe_id: uuid.UUID
     ingredients: list[Ingredients]
+
+
+# размер замеса укладывается в recipes.batch_amount Numeric(7, 2)
+BatchSize = Annotated[Decimal, Field(gt=0, max_digits=7, decimal_places=2)]
+
+
+class GenerateRecipeRequest(BaseModel):
+    base_recipe_id: uuid.UUID
+    nomenclature_id: uuid.UUID
+    batch_size: BatchSize
+    # как выбирать среди взаимозаменяемых материалов блока правил
+    policy: MaterialSelectionPolicy = MaterialSelectionPolicy.first_available
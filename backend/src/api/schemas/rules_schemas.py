@@ -146,9 +146,10 @@ class Rules(BaseModel):
     def check_has_color_names(colored_materials_dict: ColoredMaterials, dict_number: int, seen_colors: set) -> None:
         if not colored_materials_dict.color:
             raise ValueError(f"Set value of color name in rules.pigment_part[{dict_number}].color.")
-        if colored_materials_dict.color in seen_colors:
+        # рецепт ищет цвет без учёта регистра, поэтому "White" и "white" — один и тот же цвет
+        if colored_materials_dict.color.lower() in seen_colors:
             raise ValueError(f"Color '{colored_materials_dict.color}' is duplicated")
-        seen_colors.add(colored_materials_dict.color)
+        seen_colors.add(colored_materials_dict.color.lower())
 
     @staticmethod
     def check_pigment_part_has_necessary_parameters(colored_materials_dict: ColoredMaterials, dict_number: int) -> None:
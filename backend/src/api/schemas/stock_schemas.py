@@ -0,0 +1,21 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class NomenclatureBalance(BaseModel):
+    nomenclature_id: uuid.UUID
+    balance: Decimal
+
+
+class StockBalanceAtResponse(BaseModel):
+    at: datetime.datetime
+    snapshot_month: datetime.date | None
+    balances: list[NomenclatureBalance]
+
+
+class StockAvailableResponse(BaseModel):
+    group_id: uuid.UUID | None
+    nomenclature_ids: list[uuid.UUID]
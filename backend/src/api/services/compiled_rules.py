@@ -0,0 +1,184 @@
+"""
+Rules of posted base recipes compiled once into immutable lookup structures.
+
+Recipe generation used to parse `base_recipe.rules` into the pydantic `Rules` model on every call and scan
+`pigment_part` for the requested color. Posted rules are validated when the base recipe is posted, so here the
+JSON is compiled without pydantic: colors are indexed by lowercased name, material blocks by nomenclature group,
+and the ids a color can use are flattened into one set.
+
+Compiled rules are cached per (base_recipe_id, version). Every update of a base recipe bumps its version,
+so a stale entry is never hit; `BaseRecipeActions` also drops the entries of updated and deleted recipes.
+"""
+import dataclasses
+import uuid
+from collections.abc import Mapping
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Any
+
+from sqlalchemy import any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from constants import DosageTypeEnum
+from db.models import BaseRecipe
+from settings import get_settings
+
+
+class RulesCompilationError(ValueError):
+    """Raised when stored rules do not have the structure of posted rules."""
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CompiledMaterial:
+    uuids: tuple[uuid.UUID, ...]
+    ratios: tuple[int, ...]
+    dosage: tuple[DosageTypeEnum, Decimal] | None
+
+
+MaterialBlock = tuple[CompiledMaterial, ...]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CompiledColor:
+    color: str
+    blocks: Mapping[uuid.UUID, MaterialBlock]
+    # группы добавок: блок цвета и общий блок additives_part уже объединены, порядок как в additives_part
+    additive_groups: tuple[tuple[uuid.UUID, MaterialBlock], ...]
+    # все материалы, которые может использовать рецепт этого цвета
+    uuids: frozenset[uuid.UUID]
+    dry_residue: Decimal
+    pigmentation_degree: Decimal
+    filler_ratio: Decimal
+
+    def materials(self, group_id: uuid.UUID | None) -> MaterialBlock:
+        return self.blocks.get(group_id, ())
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CompiledRules:
+    film_formers: MaterialBlock
+    colors: Mapping[str, CompiledColor]
+    solvents: MaterialBlock
+
+    def color(self, name: str) -> CompiledColor | None:
+        return self.colors.get(name.lower())
+
+
+def _decimal(value: Any) -> Decimal:
+    # через str, чтобы 0.65 из JSON стало Decimal('0.65'), а не двоичным приближением
+    return Decimal(str(value))
+
+
+def _compile_block(items: list[dict]) -> MaterialBlock:
+    block = []
+    for item in items:
+        dosage = next(iter((item.get('dosage') or {}).items()), None)
+        block.append(CompiledMaterial(
+            uuids=tuple(uuid.UUID(str(u)) for u in item['uuids']),
+            ratios=tuple(int(r) for r in item['ratios']),
+            dosage=(DosageTypeEnum(dosage[0]), _decimal(dosage[1])) if dosage else None,
+        ))
+    return tuple(block)
+
+
+def _compile_blocks(categories: list[dict]) -> dict[uuid.UUID, MaterialBlock]:
+    return {uuid.UUID(str(cat['nomenclature_group_id'])): _compile_block(cat['items']) for cat in categories}
+
+
+def _block_uuids(*blocks: MaterialBlock) -> set[uuid.UUID]:
+    return {u for block in blocks for material in block for u in material.uuids}
+
+
+def compile_rules(rules: dict[str, Any]) -> CompiledRules:
+    """Compiles rules JSON of a posted base recipe."""
+    try:
+        film_formers = _compile_block(rules['film_former_part']['materials'])
+        additives = _compile_blocks(rules['additives_part']['materials'])
+        solvents = _compile_block(rules['solvent_part']['materials'])
+
+        colors = {}
+        for colored in rules['pigment_part']:
+            blocks = _compile_blocks(colored['materials'])
+            additive_groups = tuple(
+                (group_id, blocks.get(group_id, ()) + common) for group_id, common in additives.items()
+            )
+            # цвета сравниваются без учёта регистра; из совпадающих, сохранённых до проверки дублей, берётся первый
+            colors.setdefault(colored['color'].lower(), CompiledColor(
+                color=colored['color'],
+                blocks=MappingProxyType(blocks),
+                additive_groups=additive_groups,
+                uuids=frozenset(_block_uuids(film_formers, solvents, *blocks.values(), *additives.values())),
+                dry_residue=_decimal(colored['dry_residue']),
+                pigmentation_degree=_decimal(colored['pigmentation_degree']),
+                filler_ratio=_decimal(colored['filler_ratio']),
+            ))
+    except (KeyError, TypeError, ValueError, AttributeError, ArithmeticError) as exc:
+        raise RulesCompilationError(f'base recipe rules are invalid: {exc!r}') from exc
+
+    return CompiledRules(film_formers=film_formers, colors=MappingProxyType(colors), solvents=solvents)
+
+
+class CompiledRulesCache:
+    """Compiled rules keyed by (base_recipe_id, version)."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._rules: TTLCache[tuple[uuid.UUID, int], CompiledRules] = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    async def get(self, session: AsyncSession, base_recipe_id: uuid.UUID, version: int) -> CompiledRules | None:
+        """Returns compiled rules of the base recipe version, loading and compiling them on a miss."""
+        compiled = (await self.get_many(session, {base_recipe_id: version})).get(base_recipe_id)
+        if isinstance(compiled, RulesCompilationError):
+            raise compiled
+        return compiled
+
+    async def get_many(
+            self, session: AsyncSession, versions: Mapping[uuid.UUID, int]
+    ) -> dict[uuid.UUID, CompiledRules | RulesCompilationError]:
+        """
+        Returns compiled rules of the given base recipe versions, loading all misses with one query.
+        Rules that fail to compile are returned as their error, base recipes that do not exist are left out.
+        """
+        result: dict[uuid.UUID, CompiledRules | RulesCompilationError] = {}
+        for base_recipe_id, version in versions.items():
+            compiled = self._rules.get((base_recipe_id, version))
+            if compiled is not None:
+                result[base_recipe_id] = compiled
+        missing = [base_recipe_id for base_recipe_id in versions if base_recipe_id not in result]
+        if not missing:
+            return result
+
+        rows = await session.execute(
+            select(BaseRecipe.id, BaseRecipe.rules, BaseRecipe.version).where(
+                BaseRecipe.id == any_(bindparam("ids", missing, type_=ARRAY(PG_UUID(as_uuid=True))))
+            )
+        )
+        for row in rows:
+            try:
+                compiled = compile_rules(row.rules)
+            except RulesCompilationError as exc:
+                result[row.id] = exc
+                continue
+            # кешируем под прочитанной версией: если рецепт успели изменить, ключ всё равно верный
+            self._rules.set((row.id, row.version), compiled)
+            result[row.id] = compiled
+        return result
+
+    def invalidate(self, *base_recipe_ids: uuid.UUID) -> None:
+        """Drops all cached versions of the given base recipes."""
+        ids = set(base_recipe_ids)
+        for key, _ in self._rules.items():
+            if key[0] in ids:
+                self._rules.pop(key)
+
+    def clear(self) -> None:
+        self._rules.clear()
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+
+compiled_rules_cache = CompiledRulesCache(
+    ttl=get_settings().compiled_rules_cache_ttl_seconds, maxsize=get_settings().compiled_rules_cache_maxsize
+)
@@ -0,0 +1,67 @@
+import datetime
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas import DashboardResponse, DocumentForDashboard, DocumentTypeDayStats
+from constants import DocumentTypes, DocumentTypesEnum
+from db.dals import DashboardDAL
+from db.dals.dashboard import LatestDocument
+from db.reference_cache import reference_cache
+
+# операции — документы, двигающие остатки; базовые рецепты и рецепты к ним не относятся
+OPERATION_TYPES = frozenset(dt['name'] for dt in DocumentTypes[2:])
+
+DASHBOARD_LATEST = 3
+
+
+def _dashboard_document(document: LatestDocument) -> DocumentForDashboard:
+    return DocumentForDashboard(
+        id=document.id,
+        document_number=document.document_number,
+        name=document.name,
+        document_datetime=document.document_datetime,
+        number_of_nomenclatures=document.lines,
+    )
+
+
+async def get_dashboard(
+        session: AsyncSession, day: datetime.date | None = None, latest: int = DASHBOARD_LATEST
+) -> DashboardResponse:
+    """Dashboard of the day (today in UTC by default) from the daily rollup plus the latest receipts and shipments."""
+    if day is None:
+        day = datetime.datetime.now(datetime.timezone.utc).date()
+
+    async with session.begin():
+        dashboard_dal = DashboardDAL(session)
+        document_types = await reference_cache.document_types(session)
+        type_ids = {document_type.name: document_type.id for document_type in document_types.values()}
+        day_stats = {
+            document_types[type_id].name: stats
+            for type_id, stats in (await dashboard_dal.get_day_stats(day)).items() if type_id in document_types
+        }
+        total_nomenclatures, total_counterparties = await dashboard_dal.get_totals()
+
+        async def latest_documents(document_type: DocumentTypesEnum) -> list[DocumentForDashboard]:
+            type_id = type_ids.get(document_type.value)
+            if type_id is None:
+                return []
+            return [_dashboard_document(d) for d in await dashboard_dal.get_latest_documents(type_id, latest)]
+
+        latest_receipts = await latest_documents(DocumentTypesEnum.Receipt)
+        latest_shipments = await latest_documents(DocumentTypesEnum.Shipment)
+
+    production = day_stats.get(DocumentTypesEnum.ProductionReport.value)
+    return DashboardResponse(
+        day=day,
+        total_nomenclatures=total_nomenclatures,
+        total_counterparties=total_counterparties,
+        operations_today=sum(stats.documents for name, stats in day_stats.items() if name in OPERATION_TYPES),
+        production_today=production.qty if production is not None else Decimal(0),
+        by_document_type=[
+            DocumentTypeDayStats(document_type=name, documents=stats.documents, lines=stats.lines, qty=stats.qty)
+            for name, stats in sorted(day_stats.items())
+        ],
+        latest_receipts=latest_receipts,
+        latest_shipments=latest_shipments,
+    )
@@ -0,0 +1,225 @@
+"""
+Streaming exports of query results as CSV or XLSX.
+
+Rows are fetched from a server-side cursor `export_batch_size` at a time (yield_per) and every batch is encoded
+and sent as soon as it is fetched, so memory stays the same for a hundred rows and for millions of them. The header
+goes out before the query runs, so the first byte reaches the client at once.
+
+The stream opens its own session: StreamingResponse consumes the generator after the handler has returned,
+when request-scoped sessions are already closed.
+
+XLSX is written with the standard library: a workbook is a zip of XML parts, and zipfile can write entries to
+a non-seekable stream. Cells are inline strings, numbers, dates and datetimes (UTC), without shared strings,
+so nothing has to be kept until the end. Sheets roll over at the Excel row limit, each with the header row.
+"""
+import codecs
+import csv
+import datetime
+import io
+import re
+import zipfile
+from collections.abc import AsyncIterator, Iterable, Sequence
+from decimal import Decimal
+from typing import Any
+from xml.sax.saxutils import escape
+
+from sqlalchemy import Select
+
+from constants import ExportFormat
+from db.engine import DatabaseSessionManager
+from settings import get_settings
+
+XLSX_MAX_ROWS = 1_048_576
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+# символы, недопустимые в XML 1.0
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+class CsvExportWriter:
+    """UTF-8 CSV with a BOM, so that Excel opens Cyrillic names correctly."""
+    media_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self, columns: Sequence[str], title: str):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        self._writer.writerow(self.columns)
+        return codecs.BOM_UTF8 + self._drain()
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        self._writer.writerows(rows)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b''
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream that hands out what was written since the previous drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# стили ячеек: 0 — обычная, 1 — дата, 2 — дата и время (встроенные форматы Excel 14 и 22)
+_STYLES = (
+    f'{_XML_HEADER}<styleSheet xmlns="{_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+def _xlsx_cell(value: Any) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return f'<c s="2"><v>{(value - _EXCEL_EPOCH) / datetime.timedelta(days=1)}</v></c>'
+    if isinstance(value, datetime.date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH.date()).days}</v></c>'
+    text = escape(_XML_INVALID.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxExportWriter:
+    """Single-pass XLSX writer; the sheet XML is compressed and sent row batch by row batch."""
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    extension = 'xlsx'
+
+    def __init__(self, columns: Sequence[str], title: str):
+        self.columns = columns
+        # имя листа Excel — не длиннее 31 символа, без []:*?/\
+        self.title = re.sub(r'[\[\]:*?/\\]', '_', title)[:25] or 'Sheet'
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._sheets = 0
+        self._rows = 0
+
+    def _open_sheet(self) -> None:
+        self._sheets += 1
+        self._sheet = self._zip.open(f'xl/worksheets/sheet{self._sheets}.xml', 'w', force_zip64=True)
+        self._sheet.write(f'{_XML_HEADER}<worksheet xmlns="{_NS}"><sheetData>'.encode())
+        self._rows = 0
+        self._write_row(self.columns)
+
+    def _close_sheet(self) -> None:
+        self._sheet.write(b'</sheetData></worksheet>')
+        self._sheet.close()
+
+    def _write_row(self, row: Sequence[Any]) -> None:
+        self._sheet.write(f'<row>{"".join(_xlsx_cell(value) for value in row)}</row>'.encode())
+        self._rows += 1
+
+    def start(self) -> bytes:
+        self._open_sheet()
+        return self._sink.drain()
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        for row in rows:
+            if self._rows == XLSX_MAX_ROWS:
+                self._close_sheet()
+                self._open_sheet()
+            self._write_row(row)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._close_sheet()
+        sheets = range(1, self._sheets + 1)
+        self._zip.writestr('[Content_Types].xml', (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in sheets
+            )
+            + '</Types>'
+        ))
+        self._zip.writestr('_rels/.rels', (
+            f'{_XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        self._zip.writestr('xl/workbook.xml', (
+            f'{_XML_HEADER}<workbook xmlns="{_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            + ''.join(
+                f'<sheet name="{escape(self.title)}{f" {i}" if i > 1 else ""}" sheetId="{i}" r:id="rId{i}"/>'
+                for i in sheets
+            )
+            + '</sheets></workbook>'
+        ))
+        self._zip.writestr('xl/_rels/workbook.xml.rels', (
+            f'{_XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(
+                f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                for i in sheets
+            )
+            + f'<Relationship Id="rId{self._sheets + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        self._zip.writestr('xl/styles.xml', _STYLES)
+        self._zip.close()
+        return self._sink.drain()
+
+
+EXPORT_WRITERS: dict[ExportFormat, type[CsvExportWriter] | type[XlsxExportWriter]] = {
+    ExportFormat.csv: CsvExportWriter,
+    ExportFormat.xlsx: XlsxExportWriter,
+}
+
+
+async def stream_export(
+        sessionmanager: DatabaseSessionManager, query: Select, writer: CsvExportWriter | XlsxExportWriter
+) -> AsyncIterator[bytes]:
+    """Yields the encoded export of the query rows, one chunk per batch fetched from a server-side cursor."""
+    yield writer.start()
+    async with sessionmanager.session() as session:
+        async with session.begin():
+            result = await session.stream(query.execution_options(yield_per=get_settings().export_batch_size))
+            async for rows in result.partitions():
+                chunk = writer.write(rows)
+                if chunk:
+                    yield chunk
+    yield writer.finish()
@@ -0,0 +1,201 @@
+"""
+Background jobs: long operations (balance rebuilds, mass recipe generation, imports, reports) run off the request path.
+
+A request only inserts a row into the jobs table and returns its id; the table is the queue. Every process runs
+`workers` coroutines that claim queued jobs with FOR UPDATE SKIP LOCKED (see JobDAL.claim_job), so any number of
+workers in any number of processes share the queue through Postgres alone. A job enqueued by this process wakes
+its workers at once, jobs of other processes are picked up by polling every `poll_interval_seconds`.
+
+A job kind is a coroutine registered with `job_kind` together with the pydantic model of its params. It runs with
+a JobContext: its own sessions (one transaction per chunk of work, never one transaction for the whole job),
+`progress()` to store progress and partial results, and cooperative cancellation: progress reports and the runner's
+heartbeat read `cancel_requested`, and the next `progress()` or `check_cancelled()` raises JobCancelled.
+Work committed before cancellation stays committed. Running jobs whose heartbeat stops (the process died)
+are failed after `stale_seconds`; jobs interrupted by a graceful shutdown are failed at once.
+"""
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import uuid
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from constants import JobStatuses
+from db.dals import JobDAL
+from db.engine import DatabaseSessionManager
+from db.models import Job
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def to_json(result: Any) -> Any:
+    """Encodes a job result for the JSONB column; Decimals become strings, as in API responses, not lossy floats."""
+    return jsonable_encoder(result, custom_encoder={Decimal: str})
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation was requested."""
+
+
+class JobContext:
+    """What a running job gets from the runner: sessions, progress reporting and the cancellation flag."""
+
+    def __init__(self, job_id: uuid.UUID, sessionmanager: DatabaseSessionManager):
+        self.job_id = job_id
+        self.cancelled = False
+        self._sessionmanager = sessionmanager
+
+    def session(self) -> contextlib.AbstractAsyncContextManager:
+        return self._sessionmanager.session()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled
+
+    async def progress(self, processed: int, total: int | None = None, result: Any = None) -> None:
+        """Stores progress and, if given, the partial result; raises JobCancelled if the job was cancelled."""
+        async with self.session() as session:
+            async with session.begin():
+                if await JobDAL(session).report_progress(self.job_id, processed, total, to_json(result)):
+                    self.cancelled = True
+        self.check_cancelled()
+
+
+JobHandler = Callable[[JobContext, Any], Awaitable[Any]]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class JobKind:
+    handler: JobHandler
+    params: type[BaseModel]
+
+
+JOB_KINDS: dict[str, JobKind] = {}
+
+
+def job_kind(name: str, params: type[BaseModel]) -> Callable[[JobHandler], JobHandler]:
+    """Registers the decorated coroutine as the handler of jobs of this kind; its result must be JSON-encodable."""
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_KINDS[name] = JobKind(handler, params)
+        return handler
+    return register
+
+
+class JobRunner:
+    """Worker pool of one process executing jobs from the jobs table."""
+
+    def __init__(self, workers: int, poll_interval_seconds: float, heartbeat_seconds: float, stale_seconds: float):
+        self.workers = workers
+        self.poll_interval_seconds = poll_interval_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._sessionmanager: DatabaseSessionManager | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[uuid.UUID, JobContext] = {}
+
+    async def start(self, sessionmanager: DatabaseSessionManager) -> None:
+        self._sessionmanager = sessionmanager
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._watch()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def wake(self) -> None:
+        """Tells idle workers that a job was enqueued, so they do not wait for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception('claiming a job failed')
+                job = None
+            if job is None:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                continue
+            await self._run(job)
+
+    async def _claim(self) -> Job | None:
+        if not JOB_KINDS:
+            return None
+        async with self._sessionmanager.session() as session:
+            async with session.begin():
+                # берём только задания, обработчики которых есть в этом процессе
+                return await JobDAL(session).claim_job(JOB_KINDS)
+
+    async def _run(self, job: Job) -> None:
+        context = JobContext(job.id, self._sessionmanager)
+        self._running[job.id] = context
+        result = error = None
+        try:
+            kind = JOB_KINDS[job.kind]
+            result = to_json(await kind.handler(context, kind.params.model_validate(job.params)))
+            status = JobStatuses.Succeeded
+        except JobCancelled:
+            status, error = JobStatuses.Cancelled, 'cancelled'
+        except asyncio.CancelledError:
+            await self._finish(job.id, JobStatuses.Failed, error='interrupted by shutdown')
+            raise
+        except Exception as exc:
+            logger.exception('job %s (%s) failed', job.id, job.kind)
+            status, error = JobStatuses.Failed, str(exc) or repr(exc)
+        finally:
+            self._running.pop(job.id, None)
+        await self._finish(job.id, status, result, error)
+
+    async def _finish(self, job_id: uuid.UUID, status: JobStatuses, result: Any = None, error: str | None = None):
+        try:
+            async with self._sessionmanager.session() as session:
+                async with session.begin():
+                    finished = await JobDAL(session).finish_job(job_id, status, result, error)
+        except Exception:
+            # задание останется running и будет помечено упавшим по отсутствию heartbeat
+            logger.exception('finishing job %s failed', job_id)
+            return
+        if not finished:
+            # задание уже завершено, например помечено упавшим по отсутствию heartbeat: его статус не меняем
+            logger.warning('job %s is no longer running, its outcome %s is dropped', job_id, status.value)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                async with self._sessionmanager.session() as session:
+                    async with session.begin():
+                        job_dal = JobDAL(session)
+                        cancelled = await job_dal.heartbeat(list(self._running))
+                        stale = await job_dal.fail_stale_jobs(self.stale_seconds)
+            except Exception:
+                logger.exception('jobs heartbeat failed')
+                continue
+            for job_id in cancelled:
+                if (context := self._running.get(job_id)) is not None:
+                    context.cancelled = True
+            if stale:
+                logger.warning('failed stale jobs %s', ', '.join(map(str, stale)))
+
+
+job_runner = JobRunner(
+    workers=get_settings().jobs_workers,
+    poll_interval_seconds=get_settings().jobs_poll_interval_seconds,
+    heartbeat_seconds=get_settings().jobs_heartbeat_seconds,
+    stale_seconds=get_settings().jobs_stale_seconds,
+)
@@ -0,0 +1,207 @@
+"""
+Live updates for shop-floor screens: dashboard counters and stock balance changes pushed to subscribers.
+
+Triggers on stock_balances and document_daily_stats send NOTIFY live_updates when a transaction commits.
+Every process keeps one LISTEN connection. Notifications that arrive within `debounce_seconds` are handled by one
+recomputation: the dashboard is aggregated once and balances are read only for the stock_balances rows changed
+since the previous read (see StockDAL.get_availability_changes). The events are then fanned out to all subscriber
+queues, so N screens cost one aggregation per change instead of N polls per interval.
+
+If the LISTEN connection is lost, it is reopened with exponential backoff. Notifications sent meanwhile are lost,
+so after reconnecting balances are re-read from the watermark and a fresh dashboard is pushed.
+"""
+import asyncio
+import contextlib
+import dataclasses
+import datetime
+import json
+import logging
+from collections.abc import Iterable
+
+import asyncpg
+
+from api.services.dashboard import get_dashboard
+from db.dals import StockDAL
+from db.engine import DatabaseSessionManager
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'live_updates'
+# всё, о чём могут сообщить уведомления: пересчитывается после восстановления соединения
+ALL_CHANGES = frozenset({'stock_balances', 'document_daily_stats'})
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class LiveEvent:
+    event: str
+    # JSON в одну строку
+    data: str
+
+    def encode(self) -> bytes:
+        """The event in server-sent events wire format."""
+        return f'event: {self.event}\ndata: {self.data}\n\n'.encode()
+
+
+class LiveUpdatesHub:
+    """Listens for change notifications of one process and fans recomputed events out to subscribers."""
+
+    def __init__(
+            self, debounce_seconds: float, queue_size: int,
+            reconnect_seconds: float = 1, reconnect_max_seconds: float = 30,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.queue_size = queue_size
+        self.reconnect_seconds = reconnect_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self._subscribers: set[asyncio.Queue[LiveEvent]] = set()
+        self._changed: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._sessionmanager: DatabaseSessionManager | None = None
+        self._connection: asyncpg.Connection | None = None
+        self._watermark: int | None = None
+        self._dashboard: LiveEvent | None = None
+        self._dashboard_day: datetime.date | None = None
+
+    @property
+    def dashboard(self) -> LiveEvent | None:
+        """
+        The latest dashboard event, None until there are changes with subscribers listening
+        and after midnight (UTC) until the first change of the new day.
+        """
+        if self._dashboard_day != datetime.datetime.now(datetime.timezone.utc).date():
+            return None
+        return self._dashboard
+
+    async def start(self, sessionmanager: DatabaseSessionManager) -> None:
+        self._sessionmanager = sessionmanager
+        async with sessionmanager.session() as session:
+            async with session.begin():
+                self._watermark = await StockDAL(session).get_change_watermark()
+        await self._listen()
+
+    async def _listen(self) -> None:
+        connection = await self._sessionmanager.dedicated_connection()
+        try:
+            await connection.add_listener(CHANNEL, self._on_notification)
+        except BaseException:
+            await connection.close()
+            raise
+        self._connection = connection
+        connection.add_termination_listener(self._on_termination)
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        # закрытие в stop() сначала забирает соединение у хаба, его не восстанавливаем
+        if connection is not self._connection:
+            return
+        logger.warning('live updates connection lost, reconnecting')
+        self._connection = None
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_seconds
+        while True:
+            try:
+                await self._listen()
+            except Exception:
+                logger.warning('live updates reconnect failed, retrying in %s s', delay, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max_seconds)
+            else:
+                break
+        # уведомления, пришедшие без соединения, потеряны: остатки перечитываются от отметки, сводка — целиком
+        self._schedule(ALL_CHANGES)
+
+    async def stop(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reconnect_task
+            self._reconnect_task = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+        self._changed.clear()
+        self._dashboard = None
+        self._dashboard_day = None
+
+    def subscribe(self) -> asyncio.Queue[LiveEvent]:
+        queue: asyncio.Queue[LiveEvent] = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[LiveEvent]) -> None:
+        self._subscribers.discard(queue)
+
+    def _on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        self._schedule({payload})
+
+    def _schedule(self, changed: Iterable[str]) -> None:
+        self._changed.update(changed)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        # уведомления, пришедшие во время пересчёта, обрабатывает следующий проход того же цикла
+        while self._changed:
+            await asyncio.sleep(self.debounce_seconds)
+            changed, self._changed = self._changed, set()
+            try:
+                events = await self._collect(changed)
+            except Exception:
+                logger.exception('live updates refresh failed')
+                continue
+            for event in events:
+                self._publish(event)
+
+    async def _collect(self, changed: set[str]) -> list[LiveEvent]:
+        events = []
+        async with self._sessionmanager.session() as session:
+            if 'stock_balances' in changed:
+                async with session.begin():
+                    stock_dal = StockDAL(session)
+                    if not self._subscribers:
+                        # слушать некому: только сдвигаем отметку, чтобы не читать эти изменения потом
+                        self._watermark = await stock_dal.get_change_watermark()
+                    else:
+                        result = await stock_dal.get_availability_changes(self._watermark)
+                        self._watermark = result.watermark
+                        if result.changes:
+                            events.append(LiveEvent('stock', json.dumps([
+                                {
+                                    'nomenclature_id': str(change.nomenclature_id),
+                                    'balance': str(change.balance),
+                                    'available': str(change.available),
+                                }
+                                for change in result.changes
+                            ])))
+            if 'document_daily_stats' in changed:
+                if not self._subscribers:
+                    self._dashboard = None
+                else:
+                    dashboard = await get_dashboard(session)
+                    self._dashboard = LiveEvent('dashboard', dashboard.model_dump_json())
+                    self._dashboard_day = dashboard.day
+                    events.append(self._dashboard)
+        return events
+
+    def _publish(self, event: LiveEvent) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                # медленный экран теряет самое старое событие, а не задерживает остальных
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+live_updates = LiveUpdatesHub(
+    debounce_seconds=get_settings().live_updates_debounce_seconds,
+    queue_size=get_settings().live_updates_queue_size,
+    reconnect_seconds=get_settings().live_updates_reconnect_seconds,
+    reconnect_max_seconds=get_settings().live_updates_reconnect_max_seconds,
+)
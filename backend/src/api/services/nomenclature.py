@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.dals.nomenclature import NomenclatureDAL
 from db.models import Nomenclature
+from db.reference_cache import reference_cache
 
 
 class NomenclatureService:
@@ -12,14 +13,53 @@ class NomenclatureService:
         self.db_session = db_session
         self.dal = NomenclatureDAL(db_session)
 
-    async def get_all(self) -> List[Nomenclature]:
-        return await self.dal.get_all()
+    async def get_page(
+        self,
+        limit: int,
+        after: Optional[tuple[str, UUID]] = None,
+        group_id: Optional[UUID] = None,
+        type_id: Optional[UUID] = None,
+        include_subgroups: bool = False
+    ) -> List[Nomenclature]:
+        return await self.dal.get_page(
+            limit=limit, after=after, group_id=group_id, type_id=type_id, include_subgroups=include_subgroups
+        )
 
     async def get_by_id(self, nomenclature_id: UUID) -> Optional[Nomenclature]:
         return await self.dal.get_by_id(nomenclature_id)
         
     async def get_by_name(self, name: str) -> List[Nomenclature]:
         return await self.dal.get_by_name(name)
+
+    async def search(
+        self,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        group_id: Optional[UUID] = None,
+        type_id: Optional[UUID] = None
+    ) -> List[tuple[Nomenclature, float]]:
+        return await self.dal.search(text, limit=limit, offset=offset, group_id=group_id, type_id=type_id)
+
+    async def typeahead(self, text: str, limit: int) -> List[Any]:
+        return await self.dal.typeahead(text, limit=limit)
+
+    async def _check_references(self, type_id: UUID, group_id: UUID, measure_unit_id: UUID) -> None:
+        """
+        Checks referenced dictionaries against the reference cache instead of waiting for a foreign key error.
+        An id missing from the cache is looked up again in a freshly loaded table before it is rejected:
+        the row may have been committed by another process after the cache was loaded.
+        """
+        checks = (
+            (reference_cache.nomenclature_types, type_id, "Nomenclature type"),
+            (reference_cache.nomenclature_groups, group_id, "Nomenclature group"),
+            (reference_cache.measure_units, measure_unit_id, "Measure unit"),
+        )
+        for records, record_id, what in checks:
+            if record_id in await records(self.db_session):
+                continue
+            if record_id not in await records(self.db_session, refresh=True):
+                raise ValueError(f"{what} {record_id} does not exist")
         
     async def create(
         self,
@@ -31,6 +71,7 @@ class NomenclatureService:
         sku: Optional[str] = None,
         properties: Optional[Dict[str, Any]] = None
     ) -> Nomenclature:
+        await self._check_references(type_id, group_id, measure_unit_id)
         return await self.dal.create(
             name=name,
             description=description,
@@ -52,6 +93,7 @@ class NomenclatureService:
         sku: Optional[str] = None,
         properties: Optional[Dict[str, Any]] = None
     ) -> Nomenclature:
+        await self._check_references(type_id, group_id, measure_unit_id)
         return await self.dal.update(
             nomenclature_id=nomenclature_id,
             name=name,
@@ -0,0 +1,41 @@
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.reference_cache import NomenclatureGroupRecord, NomenclatureGroupTree, reference_cache
+
+
+class NomenclatureGroupService:
+    """
+    Answers group hierarchy questions from the cached group tree, without per-level queries.
+
+    Groups written through this process's sessions reach the tree after commit. Groups written by other
+    processes or by raw SQL reach the whole tree only when the cache TTL expires, but a group asked for
+    by id is never reported missing from a stale tree: a miss reloads the tree once.
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def get_tree(self) -> NomenclatureGroupTree:
+        return await reference_cache.nomenclature_groups(self.db_session)
+
+    async def _get_tree_with(self, group_id: UUID) -> Optional[NomenclatureGroupTree]:
+        """The tree, reloaded if it lacks the group; None if the group does not exist."""
+        tree = await self.get_tree()
+        if group_id not in tree:
+            tree = await reference_cache.nomenclature_groups(self.db_session, refresh=True)
+        return tree if group_id in tree else None
+
+    async def get_ancestors(self, group_id: UUID) -> Optional[List[NomenclatureGroupRecord]]:
+        tree = await self._get_tree_with(group_id)
+        if tree is None:
+            return None
+        return [tree[ancestor_id] for ancestor_id in tree.ancestors(group_id)]
+
+    async def get_descendants(self, group_id: UUID) -> Optional[List[NomenclatureGroupRecord]]:
+        tree = await self._get_tree_with(group_id)
+        if tree is None:
+            return None
+        return sorted((tree[descendant_id] for descendant_id in tree.descendants(group_id)), key=lambda g: g.name)
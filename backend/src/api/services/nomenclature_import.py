@@ -0,0 +1,276 @@
+"""
+Bulk import of nomenclatures from CSV or JSONL: a supplier catalogue in batches of thousands of rows per transaction
+instead of one request, flush, refresh and commit per item.
+
+Columns (CSV header or JSONL keys): name, type, group and measure_unit are required; sku, barcode, description,
+expiration_date (YYYY-MM-DD) and properties (a JSON object) are optional. Any other column goes to properties as is,
+so supplier attributes such as color are kept. Type, group and measure unit are given by id or by name (measure units
+also by short name, groups also by a "Parent/Child" path when the name alone is ambiguous).
+
+All rows are validated in one pass before anything is written: references are resolved with dictionaries built
+once per import from freshly reloaded reference tables, fields are checked and keys repeated within the file are
+reported. Valid rows are upserted (see NomenclatureDAL.upsert_many) `batch_size` rows per transaction, each batch
+in a session of its own.
+A batch that fails on a constraint, e.g. a name already taken in its group by another nomenclature, is rolled back
+to a savepoint and retried row by row, each row in its own savepoint, so a bad row is reported instead of failing
+the import.
+"""
+import asyncio
+import csv
+import dataclasses
+import datetime
+import json
+import uuid
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any, NamedTuple
+
+from sqlalchemy.exc import DBAPIError
+
+from constants import ImportFormat, MAX_NAME_LENGTH
+from db.engine import DatabaseSessionManager
+from db.dals.nomenclature import NomenclatureDAL, NomenclatureImportRow, UpsertCounts
+from db.reference_cache import NomenclatureGroupTree, reference_cache
+from settings import get_settings
+
+REQUIRED_FIELDS = ('name', 'type', 'group', 'measure_unit')
+FIELDS = frozenset({*REQUIRED_FIELDS, 'sku', 'barcode', 'description', 'expiration_date', 'properties'})
+SKU_MAX_LENGTH = 50
+
+# номер строки файла и её поля либо ошибка разбора строки
+Record = tuple[int, dict[str, Any] | ValueError]
+
+
+class ImportFileError(ValueError):
+    """Raised when the file as a whole cannot be imported, e.g. a CSV header without required columns."""
+
+
+class ImportRowError(NamedTuple):
+    line: int
+    message: str
+
+
+@dataclasses.dataclass
+class ImportReport:
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    errors: list[ImportRowError] = dataclasses.field(default_factory=list)
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Record]:
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    missing = [field for field in REQUIRED_FIELDS if field not in reader.fieldnames]
+    if missing:
+        raise ImportFileError(f'CSV header lacks columns: {", ".join(missing)}')
+    for record in reader:
+        # лишние ячейки без заголовка (ключ None) отбрасываются, пустые ячейки — то же, что отсутствующие
+        yield reader.line_num, {
+            name: value.strip() for name, value in record.items() if name is not None and value and value.strip()
+        }
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Record]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f'invalid JSON: {exc}')
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError('line must be a JSON object')
+            continue
+        yield line_number, record
+
+
+IMPORT_READERS = {
+    ImportFormat.csv: read_csv,
+    ImportFormat.jsonl: read_jsonl,
+}
+
+
+def _text(value: Any) -> str | None:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class _References:
+    """Lookups of nomenclature types, groups and measure units by id and by casefolded name."""
+
+    def __init__(self, types: Mapping[uuid.UUID, Any], units: Mapping[uuid.UUID, Any], groups: NomenclatureGroupTree):
+        self.types = (types, self._names((record.id, record.name) for record in types.values()))
+        self.units = (units, self._names(
+            (record.id, name) for record in units.values() for name in {record.name, record.short_name}
+        ))
+        paths = []
+        for group_id, group in groups.items():
+            paths.append((group_id, group.name))
+            if group.parent_id is not None:
+                path = [groups[ancestor_id].name for ancestor_id in groups.ancestors(group_id)]
+                paths.append((group_id, '/'.join([*path, group.name])))
+        self.groups = (groups, self._names(paths))
+
+    @staticmethod
+    def _names(pairs: Iterable[tuple[uuid.UUID, str]]) -> dict[str, list[uuid.UUID]]:
+        names: dict[str, list[uuid.UUID]] = {}
+        for record_id, name in pairs:
+            ids = names.setdefault(name.strip().casefold(), [])
+            if record_id not in ids:
+                ids.append(record_id)
+        return names
+
+    @staticmethod
+    def resolve(value: str, lookup: tuple[Mapping[uuid.UUID, Any], dict[str, list[uuid.UUID]]], what: str) -> uuid.UUID:
+        records, names = lookup
+        try:
+            record_id = uuid.UUID(value)
+        except ValueError:
+            pass
+        else:
+            if record_id not in records:
+                raise ValueError(f'{what} {value} does not exist')
+            return record_id
+        found = names.get(value.casefold(), [])
+        if not found:
+            raise ValueError(f'{what} {value!r} does not exist')
+        if len(found) > 1:
+            raise ValueError(f'{what} {value!r} is ambiguous, give its id' + (' or path' if what == 'group' else ''))
+        return found[0]
+
+
+class NomenclatureImporter:
+    """Validates and upserts nomenclature records, reporting the rows that could not be imported."""
+
+    def __init__(self, sessionmanager: DatabaseSessionManager, batch_size: int | None = None):
+        self.sessionmanager = sessionmanager
+        self.batch_size = batch_size or get_settings().nomenclature_import_batch_size
+
+    async def run(self, records: Iterable[Record], dry_run: bool = False) -> ImportReport:
+        """Imports the records; with dry_run only validates them. Raises ImportFileError if the file is unreadable."""
+        async with self.sessionmanager.session() as session:
+            async with session.begin():
+                # справочники перечитываются: три запроса на весь импорт, зато группы и типы, только что
+                # созданные в другом процессе, не станут ошибками "does not exist" во всех строках
+                references = _References(
+                    await reference_cache.nomenclature_types(session, refresh=True),
+                    await reference_cache.measure_units(session, refresh=True),
+                    await reference_cache.nomenclature_groups(session, refresh=True),
+                )
+        report = ImportReport()
+        try:
+            # чтение файла и проверка — работа процессора без запросов, она не должна держать цикл событий
+            rows = await asyncio.to_thread(self._validate, records, references, report)
+        except UnicodeDecodeError as exc:
+            raise ImportFileError('file must be UTF-8 encoded') from exc
+
+        if not dry_run:
+            for start in range(0, len(rows), self.batch_size):
+                await self._write(rows[start:start + self.batch_size], report)
+        report.errors.sort()
+        return report
+
+    def _validate(
+            self, records: Iterable[Record], references: _References, report: ImportReport
+    ) -> list[tuple[int, NomenclatureImportRow]]:
+        rows = []
+        # ключи уникальности, уже встреченные в файле, и строки, где они встретились
+        seen: dict[tuple, int] = {}
+        for line, record in records:
+            report.total += 1
+            try:
+                row = self._row(record, references)
+                keys = [('name', row.group_id, row.name)]
+                if row.sku:
+                    keys.append(('sku', row.sku))
+                if row.barcode:
+                    keys.append(('barcode', row.barcode))
+                for key in keys:
+                    if key in seen:
+                        raise ValueError(f'{key[0]} {key[-1]!r} repeats line {seen[key]}')
+            except ValueError as exc:
+                report.errors.append(ImportRowError(line, str(exc)))
+                continue
+            for key in keys:
+                seen[key] = line
+            rows.append((line, row))
+        return rows
+
+    @staticmethod
+    def _row(record: dict[str, Any] | ValueError, references: _References) -> NomenclatureImportRow:
+        if isinstance(record, ValueError):
+            raise record
+        missing = [field for field in REQUIRED_FIELDS if _text(record.get(field)) is None]
+        if missing:
+            raise ValueError(f'missing {", ".join(missing)}')
+
+        name = _text(record['name'])
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f'name is longer than {MAX_NAME_LENGTH} characters')
+        sku = _text(record.get('sku'))
+        if sku is not None and len(sku) > SKU_MAX_LENGTH:
+            raise ValueError(f'sku is longer than {SKU_MAX_LENGTH} characters')
+
+        expiration_date = _text(record.get('expiration_date'))
+        if expiration_date is not None:
+            try:
+                expiration_date = datetime.date.fromisoformat(expiration_date)
+            except ValueError:
+                raise ValueError(f'expiration_date {expiration_date!r} is not a YYYY-MM-DD date') from None
+
+        properties = record.get('properties') or {}
+        if isinstance(properties, str):
+            try:
+                properties = json.loads(properties)
+            except ValueError:
+                raise ValueError('properties is not valid JSON') from None
+        if not isinstance(properties, dict):
+            raise ValueError('properties must be a JSON object')
+
+        return NomenclatureImportRow(
+            name=name,
+            sku=sku,
+            barcode=_text(record.get('barcode')),
+            type_id=references.resolve(_text(record['type']), references.types, 'type'),
+            group_id=references.resolve(_text(record['group']), references.groups, 'group'),
+            measure_unit_id=references.resolve(_text(record['measure_unit']), references.units, 'measure unit'),
+            description=_text(record.get('description')),
+            expiration_date=expiration_date,
+            properties={**{key: value for key, value in record.items() if key not in FIELDS}, **properties},
+        )
+
+    async def _write(self, batch: list[tuple[int, NomenclatureImportRow]], report: ImportReport) -> None:
+        async with self.sessionmanager.session() as session:
+            async with session.begin():
+                dal = NomenclatureDAL(session)
+                try:
+                    async with session.begin_nested():
+                        counts = await dal.upsert_many([row for _, row in batch])
+                except DBAPIError:
+                    # пачка упала на ограничении: ищем виноватые строки по одной, остальные сохраняем
+                    counts = UpsertCounts(0, 0)
+                    for line, row in batch:
+                        try:
+                            async with session.begin_nested():
+                                row_counts = await dal.upsert_many([row])
+                        except DBAPIError as exc:
+                            report.errors.append(ImportRowError(line, _database_error(exc)))
+                        else:
+                            counts = UpsertCounts(*(a + b for a, b in zip(counts, row_counts)))
+        report.inserted += counts.inserted
+        report.updated += counts.updated
+
+
+def _database_error(exc: DBAPIError) -> str:
+    # у asyncpg текст и подробности ошибки лежат в исходном исключении драйвера
+    cause = exc.orig.__cause__ if exc.orig is not None else None
+    message = getattr(cause, 'message', None)
+    if message is None:
+        return str(exc.orig or exc)
+    detail = getattr(cause, 'detail', None)
+    return f'{message}: {detail}' if detail else message
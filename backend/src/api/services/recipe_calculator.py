@@ -0,0 +1,234 @@
+"""
+Calculation of recipe amounts from compiled base recipe rules.
+
+The calculator is pure: everything it needs (compiled rules, generation settings, nomenclature properties
+and stock availability) is passed in, and the result is a list of exact Decimal amounts. The same inputs
+always give the same recipe, so it can be benchmarked and run for many batches without touching the database.
+
+For a batch of `batch_size` units and a color of the base recipe:
+
+* solids = batch_size * dry_residue;
+* binder solids : (pigments + fillers) = 1 : pigmentation_degree;
+* pigments : fillers = 1 : filler_ratio;
+* film formers are weighed as solutions, binder solids / (solids_content / 100) of the material;
+* additives are dosed as a fraction of the batch (percent_amount), of binder solids (percent_binder)
+  or as a fixed amount per batch (absolute); the dosage of the rules item wins over the material's own one;
+* solvents make up the rest of the batch.
+
+Within every block one item is used and its amount is split by ratios. By default it is the first item whose
+materials are all in stock; other MaterialSelectionPolicy values choose among the items whose stock covers their
+amounts (see RecipeCalculator._choose). Amounts are rounded to AMOUNT_QUANT and the solvent absorbs rounding,
+so ingredients sum exactly to batch_size.
+"""
+import dataclasses
+import datetime
+import uuid
+from collections.abc import Callable, Mapping, Sequence
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any
+
+from api.services.compiled_rules import CompiledMaterial, CompiledRules, MaterialBlock
+from constants import DosageTypeEnum, MaterialSelectionPolicy
+from db.reference_cache import NomenclatureGroupRecord, RecipeGenerationSettingsRecord
+
+# точность колонок recipes.batch_amount и ingredients.amount
+AMOUNT_QUANT = Decimal('0.01')
+_HUNDRED = Decimal(100)
+
+
+class RecipeGenerationError(ValueError):
+    """Raised when a recipe cannot be calculated from the rules and stock."""
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RecipeLine:
+    nomenclature_id: uuid.UUID
+    amount: Decimal
+
+
+Parts = list[tuple[uuid.UUID, Decimal]]
+
+
+def _round(amount: Decimal) -> Decimal:
+    return amount.quantize(AMOUNT_QUANT, rounding=ROUND_HALF_UP)
+
+
+class RecipeCalculator:
+    """Calculates recipes of one base recipe against a fixed snapshot of settings, properties and stock."""
+
+    def __init__(
+            self,
+            rules: CompiledRules,
+            settings: RecipeGenerationSettingsRecord,
+            properties: Mapping[uuid.UUID, Mapping[str, Any]],
+            balance: Callable[[uuid.UUID], Decimal],
+            groups: Mapping[uuid.UUID, NomenclatureGroupRecord] | None = None,
+            policy: MaterialSelectionPolicy = MaterialSelectionPolicy.first_available,
+            expiration_dates: Mapping[uuid.UUID, datetime.date] | None = None,
+    ):
+        self.rules = rules
+        self.settings = settings
+        self.properties = properties
+        self.balance = balance
+        self.groups = groups or {}
+        self.policy = policy
+        self.expiration_dates = expiration_dates or {}
+
+    def _rank(self, material: CompiledMaterial, coverage: Decimal, taken: Mapping[uuid.UUID, Decimal]) -> Any:
+        """Sort key of a candidate that covers its amounts, the smallest wins."""
+        if self.policy == MaterialSelectionPolicy.most_stocked:
+            return -coverage
+        if self.policy == MaterialSelectionPolicy.fewest_materials:
+            return len(set(material.uuids) - taken.keys())
+        # fifo: партия с самым ранним сроком годности; без срока — в последнюю очередь
+        return min(self.expiration_dates.get(u, datetime.date.max) for u in material.uuids)
+
+    def _choose(
+            self,
+            block: MaterialBlock,
+            what: str,
+            parts_of: Callable[[CompiledMaterial], Parts],
+            taken: Mapping[uuid.UUID, Decimal],
+    ) -> Parts:
+        """
+        Chooses one item of the block and returns its amounts.
+
+        Only items whose materials all have stock are considered. Under first_available the first of them wins.
+        The other policies rank the items whose stock, less what the recipe already takes, covers their amounts;
+        ties go to the item listed first. When no item covers its amounts the first one in stock is returned,
+        so the caller reports the shortage. Every item is evaluated once, a block of dozens of alternatives
+        costs a few dozen Decimal operations.
+        """
+        fallback: Parts | None = None
+        best: Parts | None = None
+        best_rank = None
+        error: RecipeGenerationError | None = None
+        for material in block:
+            if not all(self.balance(u) > 0 for u in material.uuids):
+                continue
+            if self.policy == MaterialSelectionPolicy.first_available:
+                return parts_of(material)
+            try:
+                parts = parts_of(material)
+            except RecipeGenerationError as exc:
+                # альтернативе без дозировки или свойств есть замена; ошибка важна, только если замен нет
+                error = error or exc
+                continue
+            if fallback is None:
+                fallback = parts
+            coverage = min(
+                ((self.balance(u) - taken.get(u, 0)) / _round(amount) for u, amount in parts if _round(amount) > 0),
+                default=None,
+            )
+            if coverage is not None and coverage < 1:
+                continue
+            rank = self._rank(material, coverage if coverage is not None else Decimal(0), taken)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = parts, rank
+                if self.policy == MaterialSelectionPolicy.fewest_materials and rank == 0:
+                    # все материалы уже в рецепте, лучше не будет
+                    break
+        if best is not None:
+            return best
+        if fallback is not None:
+            return fallback
+        if error is not None:
+            raise error
+        raise RecipeGenerationError(f'there are no {what} available in stock')
+
+    def _property(self, nomenclature_id: uuid.UUID, name: str) -> Decimal | None:
+        value = self.properties.get(nomenclature_id, {}).get(name)
+        return None if value is None else Decimal(str(value))
+
+    @staticmethod
+    def _split(material: CompiledMaterial, amount: Decimal) -> list[tuple[uuid.UUID, Decimal]]:
+        total = sum(material.ratios)
+        return [(u, amount * ratio / total) for u, ratio in zip(material.uuids, material.ratios)]
+
+    def _film_former_amount(self, nomenclature_id: uuid.UUID, binder_solids: Decimal) -> Decimal:
+        solids_content = self._property(nomenclature_id, 'solids_content')
+        if solids_content is None:
+            # сухой плёнкообразователь без растворителя
+            return binder_solids
+        if solids_content <= 0:
+            raise RecipeGenerationError(f'solids_content of nomenclature {nomenclature_id} must be positive')
+        return binder_solids * _HUNDRED / solids_content
+
+    def _dosage(self, material: CompiledMaterial, nomenclature_id: uuid.UUID) -> tuple[DosageTypeEnum, Decimal]:
+        if material.dosage is not None:
+            return material.dosage
+        for dosage_type in DosageTypeEnum:
+            value = self._property(nomenclature_id, dosage_type.value)
+            if value is not None:
+                return dosage_type, value
+        raise RecipeGenerationError(f'set dosage of nomenclature {nomenclature_id} in base recipe or its properties')
+
+    def calculate(self, color: str, batch_size: Decimal) -> list[RecipeLine]:
+        """Returns ingredients of a batch of the color, in rules order, one line per nomenclature."""
+        color_data = self.rules.color(color)
+        if color_data is None:
+            raise RecipeGenerationError(f'there is no rules for color {color} in base recipe')
+
+        solids = batch_size * color_data.dry_residue
+        binder_solids = solids / (1 + color_data.pigmentation_degree)
+        pigments_total = solids - binder_solids
+        pigments_amount = pigments_total / (1 + color_data.filler_ratio)
+        fillers_amount = pigments_total - pigments_amount
+
+        amounts: dict[uuid.UUID, Decimal] = {}
+
+        def add(parts: Parts) -> None:
+            for nomenclature_id, amount in parts:
+                amounts[nomenclature_id] = amounts.get(nomenclature_id, Decimal(0)) + _round(amount)
+
+        add(self._choose(
+            color_data.materials(self.settings.film_formers_group_id) + self.rules.film_formers, 'film formers',
+            lambda material: [
+                (u, self._film_former_amount(u, part)) for u, part in self._split(material, binder_solids)
+            ],
+            amounts,
+        ))
+        add(self._choose(
+            color_data.materials(self.settings.pigments_group_id), 'pigments',
+            lambda material: self._split(material, pigments_amount), amounts,
+        ))
+        add(self._choose(
+            color_data.materials(self.settings.fillers_group_id), 'fillers',
+            lambda material: self._split(material, fillers_amount), amounts,
+        ))
+
+        def additive_parts(additive: CompiledMaterial) -> Parts:
+            parts = []
+            for nomenclature_id, ratio in zip(additive.uuids, additive.ratios):
+                dosage_type, value = self._dosage(additive, nomenclature_id)
+                if dosage_type == DosageTypeEnum.percent_amount:
+                    amount = batch_size * value
+                elif dosage_type == DosageTypeEnum.percent_binder:
+                    amount = binder_solids * value
+                else:
+                    amount = value
+                parts.append((nomenclature_id, amount * ratio / sum(additive.ratios)))
+            return parts
+
+        for group_id, block in color_data.additive_groups:
+            group = self.groups.get(group_id)
+            add(self._choose(block, group.name if group else str(group_id), additive_parts, amounts))
+
+        solvent_amount = batch_size - sum(amounts.values())
+        if solvent_amount < 0:
+            raise RecipeGenerationError(
+                f'materials exceed batch size by {-solvent_amount}: check dry residue and solids content'
+            )
+        solvent_parts = [
+            (u, _round(amount))
+            for u, amount in self._choose(
+                self.rules.solvents, 'solvents', lambda material: self._split(material, solvent_amount), amounts
+            )
+        ]
+        # остаток от округления долей растворителя уходит в последнюю долю, чтобы сумма была ровно batch_size
+        last_id, last_amount = solvent_parts[-1]
+        solvent_parts[-1] = (last_id, last_amount + solvent_amount - sum(amount for _, amount in solvent_parts))
+        for nomenclature_id, amount in solvent_parts:
+            amounts[nomenclature_id] = amounts.get(nomenclature_id, Decimal(0)) + amount
+
+        return [RecipeLine(nomenclature_id, amount) for nomenclature_id, amount in amounts.items() if amount > 0]
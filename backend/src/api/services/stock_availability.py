@@ -0,0 +1,123 @@
+import asyncio
+import time
+from decimal import Decimal
+from typing import Iterable
+
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.schemas.rules_schemas import MaterialDict
+from api.services.compiled_rules import CompiledMaterial
+from db.dals import StockDAL
+from settings import get_settings
+
+
+class StockAvailabilityResolver:
+    """
+    Answers "available / not available" for recipe materials from memory.
+
+    All candidate nomenclatures are registered first, then balances minus open reservations are fetched
+    with a single query instead of one query per MaterialDict. `consume` takes amounts of a recipe
+    calculated within the same batch, so the following recipes see what is left.
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        self.dal = StockDAL(db_session)
+        self._candidates: set[uuid.UUID] = set()
+        self._balances: dict[uuid.UUID, Decimal] = {}
+
+    def add(self, items: Iterable[MaterialDict | CompiledMaterial]) -> None:
+        for item in items:
+            self._candidates.update(item.uuids)
+
+    def add_ids(self, nomenclature_ids: Iterable[uuid.UUID]) -> None:
+        self._candidates.update(nomenclature_ids)
+
+    async def load(self, lock: bool = False) -> None:
+        """
+        Fetches available quantities of all candidates. With `lock` the candidates are locked first
+        (until the end of the transaction), so no one else can reserve them before this transaction commits.
+        """
+        if lock:
+            await self.dal.lock_nomenclatures(self._candidates)
+        self._balances = await self.dal.get_available(self._candidates)
+
+    def balance(self, nomenclature_id: uuid.UUID) -> Decimal:
+        return self._balances.get(nomenclature_id, Decimal(0))
+
+    def is_available(self, nomenclature_id: uuid.UUID) -> bool:
+        return self.balance(nomenclature_id) > 0
+
+    def consume(self, amounts: Iterable[tuple[uuid.UUID, Decimal]]) -> None:
+        for nomenclature_id, amount in amounts:
+            self._balances[nomenclature_id] = self.balance(nomenclature_id) - amount
+
+    def available(self, items: Iterable[MaterialDict | CompiledMaterial]) -> list[uuid.UUID]:
+        """Returns ids of all materials from items that have positive balance, keeping the rules order."""
+        return [u for item in items for u in item.uuids if self.is_available(u)]
+
+
+class StockAvailabilityIndex:
+    """
+    Process-wide sets of nomenclatures with positive available stock, per nomenclature group.
+
+    The first refresh loads every stock balance; the following ones read only the balances whose moves or
+    reservations changed since the previous refresh (see StockDAL.get_availability_changes), so questions like
+    "which of these materials are in stock" become set intersections. Moving a nomenclature to another group
+    does not touch its balance, so the index is rebuilt from scratch every `full_rebuild_seconds`.
+
+    A refresh sees the uncommitted changes of its own transaction, so refresh before writing stock.
+    """
+
+    def __init__(self, full_rebuild_seconds: float):
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self._by_group: dict[uuid.UUID, set[uuid.UUID]] = {}
+        self._group_of: dict[uuid.UUID, uuid.UUID] = {}
+        self._watermark: int | None = None
+        self._rebuilt_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, session: AsyncSession) -> None:
+        # одно обновление за раз: параллельные запросы дождутся его и получат свежий индекс
+        async with self._lock:
+            since = self._watermark
+            if time.monotonic() - self._rebuilt_at >= self.full_rebuild_seconds:
+                since = None
+            result = await StockDAL(session).get_availability_changes(since)
+            if since is None:
+                self._by_group.clear()
+                self._group_of.clear()
+                self._rebuilt_at = time.monotonic()
+            for change in result.changes:
+                self._discard(change.nomenclature_id)
+                if change.in_stock:
+                    self._by_group.setdefault(change.group_id, set()).add(change.nomenclature_id)
+                    self._group_of[change.nomenclature_id] = change.group_id
+            self._watermark = result.watermark
+
+    def _discard(self, nomenclature_id: uuid.UUID) -> None:
+        group_id = self._group_of.pop(nomenclature_id, None)
+        if group_id is not None:
+            self._by_group[group_id].discard(nomenclature_id)
+
+    def in_stock(self, nomenclature_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        """Returns the given nomenclatures that are in stock."""
+        return self._group_of.keys() & set(nomenclature_ids)
+
+    def in_groups(self, group_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        """Returns in-stock nomenclatures of the given groups."""
+        return set().union(*(self._by_group.get(group_id, ()) for group_id in group_ids))
+
+    def all(self) -> set[uuid.UUID]:
+        return set(self._group_of)
+
+    def clear(self) -> None:
+        self._by_group.clear()
+        self._group_of.clear()
+        self._watermark = None
+
+
+stock_availability_index = StockAvailabilityIndex(
+    full_rebuild_seconds=get_settings().stock_availability_full_rebuild_seconds
+)
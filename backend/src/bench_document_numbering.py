@@ -0,0 +1,105 @@
+"""
+Concurrency benchmark of document numbering modes.
+
+Usage:
+    python bench_document_numbering.py --workers 16 --documents 50 --hold-ms 20
+
+Each worker creates documents of a temporary document type, one transaction per document.
+After the insert the transaction stays open for --hold-ms to model the rest of the posting work
+(lines, moves). In gapless mode the counter row stays locked for that time, so workers queue up
+behind each other; in sequence mode they do not. Everything the benchmark creates is removed at the end.
+"""
+import argparse
+import asyncio
+import datetime
+import time
+import uuid
+
+from sqlalchemy import delete, insert, select, func
+
+from constants import DocumentNumberingModes, DocumentStatuses
+from db.dals import DocumentTypeDAL
+from db.engine import DatabaseSessionManager
+from db.models import Document, DocumentType
+from db.models.document_type import DocumentNumberCounter
+from settings import get_settings
+
+
+async def create_documents(manager: DatabaseSessionManager, type_id: uuid.UUID, documents: int, hold: float):
+    for _ in range(documents):
+        async with manager.session() as session:
+            async with session.begin():
+                await session.execute(insert(Document).values(
+                    status=DocumentStatuses.Registered,
+                    document_datetime=datetime.datetime.now(datetime.timezone.utc),
+                    commentary="bench_document_numbering",
+                    document_type_id=type_id,
+                ))
+                await asyncio.sleep(hold)
+
+
+async def run_mode(
+        manager: DatabaseSessionManager, type_id: uuid.UUID, mode: DocumentNumberingModes,
+        workers: int, documents: int, hold: float
+) -> float:
+    async with manager.session() as session:
+        async with session.begin():
+            await DocumentTypeDAL(session).set_numbering_mode(type_id, mode)
+            await session.execute(delete(Document).where(Document.document_type_id == type_id))
+            await session.execute(
+                delete(DocumentNumberCounter).where(DocumentNumberCounter.document_type_id == type_id)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create_documents(manager, type_id, documents, hold) for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    async with manager.session() as session:
+        numbers = await session.execute(
+            select(func.count(Document.id), func.count(func.distinct(Document.document_number)))
+            .where(Document.document_type_id == type_id)
+        )
+        total, distinct = numbers.one()
+    assert total == distinct == workers * documents, "document numbers are not unique"
+
+    rate = total / elapsed
+    print(f"{mode.value:>8}: {total} documents in {elapsed:.2f} s, {rate:.0f} documents/s")
+    return rate
+
+
+async def main(workers: int, documents: int, hold_ms: int):
+    manager = DatabaseSessionManager(
+        get_settings().database_url, {"echo": False, "pool_size": workers + 1, "max_overflow": 0}
+    )
+    type_id = uuid.uuid4()
+    async with manager.session() as session:
+        async with session.begin():
+            await session.execute(insert(DocumentType).values(
+                id=type_id, name=f"bench_{type_id.hex[:8]}", direction=0
+            ))
+    try:
+        rates = {}
+        for mode in (DocumentNumberingModes.gapless, DocumentNumberingModes.sequence):
+            rates[mode] = await run_mode(manager, type_id, mode, workers, documents, hold_ms / 1000)
+        speedup = rates[DocumentNumberingModes.sequence] / rates[DocumentNumberingModes.gapless]
+        print(f"sequence mode is {speedup:.1f}x faster with {workers} concurrent workers")
+    finally:
+        async with manager.session() as session:
+            async with session.begin():
+                # переводим тип обратно в gapless, чтобы удалить его последовательности
+                await DocumentTypeDAL(session).set_numbering_mode(type_id, DocumentNumberingModes.gapless)
+                await session.execute(delete(Document).where(Document.document_type_id == type_id))
+                await session.execute(
+                    delete(DocumentNumberCounter).where(DocumentNumberCounter.document_type_id == type_id)
+                )
+                await session.execute(delete(DocumentType).where(DocumentType.id == type_id))
+        await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of concurrent document numbering.")
+    parser.add_argument("--workers", type=int, default=16, help="number of concurrent connections")
+    parser.add_argument("--documents", type=int, default=50, help="documents created by each worker")
+    parser.add_argument("--hold-ms", type=int, default=20, help="time each transaction stays open after the insert")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.documents, args.hold_ms))
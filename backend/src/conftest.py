@@ -12,22 +12,27 @@ from httpx import AsyncClient, ASGITransport
 from sqlalchemy import inspect, text, delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_session, DatabaseSessionManager
+from api.services.jobs import JobRunner
+from api.services.live_updates import LiveUpdatesHub
+from api.services.stock_availability import stock_availability_index
+from db import get_session, get_sessionmanager, DatabaseSessionManager
+from db.engine import engine_kwargs
 from db.models import (
     Base,
     DocumentType,
     NomenclatureType,
     NomenclatureGroup,
     MeasureUnit,
-    Nomenclature, Recipe, BaseRecipe
+    Nomenclature, Recipe, BaseRecipe, User
 )
 from main import app as actual_app
 from settings import get_settings
+from security import create_access_token
 from constants import STANDARD_NOMENCLATURE_TYPES, STANDARD_NOMENCLATURE_GROUPS, STANDARD_MEASURE_UNITS, NOMENCLATURES
 
 settings = get_settings()
 
-sessionmanager = DatabaseSessionManager(settings.test_database_url, {"echo": settings.echo_sql})
+sessionmanager = DatabaseSessionManager(settings.test_database_url, engine_kwargs(settings))
 
 
 @pytest.fixture(autouse=True)
@@ -77,8 +82,10 @@ async def setup_database():
         await connection.execute(text("DROP VIEW IF EXISTS stock_balance CASCADE"))
         await connection.run_sync(Base.metadata.drop_all)
         await connection.execute(text("DROP EXTENSION IF EXISTS pgcrypto CASCADE"))
+        await connection.execute(text("DROP EXTENSION IF EXISTS pg_trgm CASCADE"))
         await connection.execute(text("DROP TRIGGER IF EXISTS set_document_number ON base_recipes CASCADE"))
         await connection.execute(text("DROP FUNCTION IF EXISTS public.increment_document_number() CASCADE"))
+        await connection.execute(text("DROP FUNCTION IF EXISTS public.apply_stock_moves_to_balances() CASCADE"))
 
         await connection.run_sync(run_migrations)
     yield
@@ -92,6 +99,8 @@ async def clean_database_per_module():
         for table in reversed(Base.metadata.sorted_tables):
             await session.execute(delete(table))
         await session.commit()
+        # удалённые строки остатков индекс доступности не замечает
+        stock_availability_index.clear()
 
 
         await session.execute(
@@ -125,12 +134,49 @@ async def db_session():
         yield session
 
 
+@pytest.fixture(scope="function")
+def open_session():
+    """Opens extra sessions for tests that run transactions concurrently."""
+    return sessionmanager.session
+
+
+@pytest.fixture(scope="function")
+async def live_updates_hub():
+    """Live updates hub listening to the test database."""
+    hub = LiveUpdatesHub(debounce_seconds=0.05, queue_size=10)
+    await hub.start(sessionmanager)
+    yield hub
+    await hub.stop()
+
+
+@pytest.fixture(scope="function")
+async def job_workers():
+    """Background job workers taking jobs from the test database."""
+    runner = JobRunner(workers=2, poll_interval_seconds=0.05, heartbeat_seconds=0.1, stale_seconds=60)
+    await runner.start(sessionmanager)
+    yield runner
+    await runner.stop()
+
+
 @pytest.fixture(scope="function", autouse=True)
 async def session_override(app, db_session):
     async def get_test_session():
         yield db_session
 
     app.dependency_overrides[get_session] = get_test_session
+    app.dependency_overrides[get_sessionmanager] = lambda: sessionmanager
+
+
+@pytest.fixture(scope="function")
+async def auth_headers():
+    """Authorization header of a freshly created active user."""
+    user_id = uuid.uuid4()
+    async with sessionmanager.session() as session:
+        await session.execute(
+            insert(User).values(id=user_id, name='Test', email=f'{user_id.hex}@example.com', hashed_password='-')
+        )
+        await session.commit()
+    return {'Authorization': f'Bearer {create_access_token({"sub": f"{user_id.hex}@example.com"})}'}
 
 
 @pytest.fixture(scope="function")
@@ -10,6 +10,14 @@ class DosageTypeEnum(Enum):
     absolute = 'absolute'
 
 
+class MaterialSelectionPolicy(Enum):
+    """How recipe generation chooses among interchangeable items of a rules block."""
+    first_available = 'first_available'
+    most_stocked = 'most_stocked'
+    fewest_materials = 'fewest_materials'
+    fifo = 'fifo'
+
+
 DocumentTypes: Final = [
     {'name': 'Base Recipe', 'direction': 0},
     {'name': 'Recipe', 'direction': 0},
@@ -28,8 +36,13 @@ class DocumentTypesEnum(str, Enum):
     BaseRecipeType = 'Base Recipe'
     RecipeType = 'Recipe'
     Receipt = 'Receipt'
+    ShipmentReturn = 'ShipmentReturn'
     Shipment = 'Shipment'
+    ReceiptReturn = 'ReceiptReturn'
+    NomenclatureIssue = 'NomenclatureIssue'
     ProductionReport = 'ProductionReport'
+    Complectation = 'Complectation'
+    InitialStockSetting = 'InitialStockSetting'
 
 
 
@@ -39,6 +52,29 @@ class DocumentStatuses(str, Enum):
     SetToDeletion = 'SetToDeletion'
 
 
+class JobStatuses(str, Enum):
+    Queued = 'queued'
+    Running = 'running'
+    Succeeded = 'succeeded'
+    Failed = 'failed'
+    Cancelled = 'cancelled'
+
+
+class ExportFormat(str, Enum):
+    csv = 'csv'
+    xlsx = 'xlsx'
+
+
+class ImportFormat(str, Enum):
+    csv = 'csv'
+    jsonl = 'jsonl'
+
+
+class DocumentNumberingModes(str, Enum):
+    gapless = 'gapless'  # счётчик в document_number_counters: без пропусков, вставки одного типа идут по очереди
+    sequence = 'sequence'  # последовательность на тип и год: без ожидания, возможны пропуски при откате
+
+
 NAME_MATCH_PATTERN: Final[re.Pattern[str]] = re.compile(r"^[A-Za-zА-Яа-яЁё][A-Za-zА-Яа-яЁё0-9 ,.\-_\"()]+$")
 MAX_NAME_LENGTH: Final = 100
 
@@ -112,7 +148,7 @@ NOMENCLATURES = [
         "id": uuid.uuid4(), "name": "Эмаль ПФ-115",
         "description": "",         "type_id": _TYPE_IDS["Продукция"],
         "group_id": _GROUP_IDS["Продукция ЛКМ"],         "measure_unit_id": _UNIT_IDS["Килограмм"],
-        "properties": {"color": ["белый"]},
+        "properties": {"color": "белый"},
     },
     {
         "id": uuid.uuid4(), "name": "Лак ПФ-060",
@@ -154,13 +190,13 @@ NOMENCLATURES = [
         "id": uuid.uuid4(), "name": "Лецитин соевый жидкий",
         "description": "",         "type_id": _TYPE_IDS["Сырье"],
         "group_id": _GROUP_IDS["Диспергаторы"],          "measure_unit_id": _UNIT_IDS["Килограмм"],
-        "properties": {},
+        "properties": {"percent_amount": 0.005},
     },
     {
         "id": uuid.uuid4(), "name": "Лецитин соевый «Ханицитин»",
         "description": "",         "type_id": _TYPE_IDS["Сырье"],
         "group_id": _GROUP_IDS["Диспергаторы"],          "measure_unit_id": _UNIT_IDS["Килограмм"],
-        "properties": {},
+        "properties": {"percent_amount": 0.005},
     },
     {
         "id": uuid.uuid4(), "name": "Уайт-спирит",
@@ -24,12 +24,13 @@ async def create_user():
             print(f"  [{loc}] {error['msg']}")
         return
 
+    hashed_password = await Hasher.get_password_hash_async(user_data.password)
     try:
         async with sessionmanager.session() as session:
             user = User(
                 name=user_data.name,
                 email=user_data.email,
-                hashed_password=Hasher.get_password_hash(user_data.password),
+                hashed_password=hashed_password,
             )
             session.add(user)
             await session.commit()
@@ -1,6 +1,7 @@
-from .engine import get_session, DatabaseSessionManager
+from .engine import get_session, get_sessionmanager, DatabaseSessionManager
 
 __all__ = (
     'get_session',
+    'get_sessionmanager',
     'DatabaseSessionManager',
 )
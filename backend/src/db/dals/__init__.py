@@ -1,8 +1,20 @@
 from .dals import BaseRecipeDAL, DocumentTypeDAL
+from .dashboard import DashboardDAL
+from .document import DocumentDAL
+from .job import JobDAL
+from .nomenclature_group import NomenclatureGroupDAL
+from .recipe import RecipeDAL
+from .stock import StockDAL
 from .user_dal import UserDAL
 
 __all__ = (
     'BaseRecipeDAL',
+    'DashboardDAL',
+    'DocumentDAL',
     'DocumentTypeDAL',
+    'JobDAL',
+    'NomenclatureGroupDAL',
+    'RecipeDAL',
+    'StockDAL',
     'UserDAL',
 )
@@ -0,0 +1,22 @@
+from typing import Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def bulk_insert(db_session: AsyncSession, table: Table, columns: Sequence[str], records: list[tuple]) -> None:
+    """
+    Writes records with COPY when the session runs on asyncpg, otherwise with a multi-row INSERT.
+    COPY goes through the session's own connection, so it is part of the current transaction
+    and fires the statement-level triggers once for all records.
+    """
+    if not records:
+        return
+    connection = await db_session.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            table.name, records=records, columns=list(columns), schema_name=table.schema
+        )
+    else:
+        await db_session.execute(insert(table), [dict(zip(columns, record)) for record in records])
@@ -1,5 +1,6 @@
 from typing import Any
-from sqlalchemy import and_, select, update, delete
+from sqlalchemy import and_, select, update, delete, func, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -7,7 +8,9 @@ import datetime
 import uuid
 
 from db.models import DocumentType, BaseRecipe
-from constants import DocumentTypesEnum, DocumentStatuses
+from db.models.document_type import DocumentNumberCounter
+from db.reference_cache import reference_cache
+from constants import DocumentTypesEnum, DocumentStatuses, DocumentNumberingModes
 
 
 class DocumentTypeDAL:
@@ -36,6 +39,41 @@ class DocumentTypeDAL:
         result_rows = result.fetchall()
         return [doc_type[0] for doc_type in result_rows]
 
+    async def set_numbering_mode(self, type_id: uuid.UUID, mode: DocumentNumberingModes) -> None:
+        """
+        Switches numbering mode of the document type.
+
+        Switching to gapless moves the numbers already issued by the type's sequences into its counters
+        and drops the sequences, so numbering continues without repeats in both directions.
+        The type's row is locked for update: the numbering trigger of documents, base recipes and recipes reads
+        the mode with FOR SHARE, so the switch waits for transactions that already took a number under the old mode,
+        and inserts of the type wait for the switch to commit. Other document types are not blocked.
+        """
+        await self.db_session.execute(select(DocumentType.id).where(DocumentType.id == type_id).with_for_update())
+        await self.db_session.execute(
+            update(DocumentType).where(DocumentType.id == type_id).values(numbering_mode=mode)
+        )
+        if mode != DocumentNumberingModes.gapless:
+            return
+
+        sequences = await self.db_session.execute(
+            text("SELECT relname FROM pg_class WHERE relkind = 'S' AND starts_with(relname, :prefix)"),
+            {"prefix": f"document_number_seq_{type_id.hex}_"}
+        )
+        for sequence_name in sequences.scalars().all():
+            issued = await self.db_session.scalar(
+                text(f'SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM "{sequence_name}"')
+            )
+            query = insert(DocumentNumberCounter).values(
+                document_type_id=type_id, year=int(sequence_name.rsplit("_", 1)[1]), counter=issued
+            )
+            query = query.on_conflict_do_update(
+                index_elements=[DocumentNumberCounter.document_type_id, DocumentNumberCounter.year],
+                set_={"counter": func.greatest(DocumentNumberCounter.counter, query.excluded.counter)}
+            )
+            await self.db_session.execute(query)
+            await self.db_session.execute(text(f'DROP SEQUENCE "{sequence_name}"'))
+
 
 class BaseRecipeDAL:
     """Data Access Layer for operating base recipes."""
@@ -44,10 +82,9 @@ class BaseRecipeDAL:
         self.db_session = db_session
 
     async def _get_document_type_id(self) -> uuid.UUID | None:
-        type_dal = DocumentTypeDAL(self.db_session)
-        type_id = await type_dal.get_document_type_by_name(DocumentTypesEnum.BaseRecipeType)
-        if type_id:
-            return type_id.id
+        doc_type = await reference_cache.document_type_by_name(self.db_session, DocumentTypesEnum.BaseRecipeType)
+        if doc_type:
+            return doc_type.id
 
     async def create_base_recipe(
         self,
@@ -90,18 +127,37 @@ class BaseRecipeDAL:
         if result_row is not None:
             return result_row[0]
 
-    async def get_all_base_recipes(self) -> list[BaseRecipe] | None:
-        query = select(BaseRecipe).order_by(BaseRecipe.document_datetime).order_by(BaseRecipe.document_number)
+    async def get_base_recipes_page(
+            self,
+            limit: int,
+            after: tuple[datetime.datetime, int, uuid.UUID] | None = None,
+            status: DocumentStatuses | None = None,
+            date_from: datetime.datetime | None = None,
+            date_to: datetime.datetime | None = None,
+    ) -> list[BaseRecipe]:
+        """
+        Returns up to `limit` base recipes ordered by (document_datetime, document_number, id),
+        starting after the `after` key. id only breaks ties, so the order is total.
+        """
+        key = (BaseRecipe.document_datetime, BaseRecipe.document_number, BaseRecipe.id)
+        query = select(BaseRecipe).order_by(*key).limit(limit)
+        if after is not None:
+            query = query.where(tuple_(*key) > tuple_(*after))
+        if status is not None:
+            query = query.where(BaseRecipe.status == status)
+        if date_from is not None:
+            query = query.where(BaseRecipe.document_datetime >= date_from)
+        if date_to is not None:
+            query = query.where(BaseRecipe.document_datetime < date_to)
         result = await self.db_session.execute(query)
-        result_rows = result.fetchall()
-        return [row[0] for row in result_rows]
+        return list(result.scalars().all())
 
 
     async def update_base_recipe(self, id: uuid.UUID, **kwargs) -> BaseRecipe | None:
         query = (
             update(BaseRecipe)
             .where(BaseRecipe.id == id)
-            .values(kwargs)
+            .values({**kwargs, 'version': BaseRecipe.version + 1})
             .returning(BaseRecipe)
         )
 
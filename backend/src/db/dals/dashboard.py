@@ -0,0 +1,76 @@
+import datetime
+import uuid
+from decimal import Decimal
+from typing import NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from constants import DocumentStatuses
+from db.models import Counterparty, Document, DocumentDailyStats, DocumentLine, Nomenclature
+
+
+class DayStats(NamedTuple):
+    documents: int
+    lines: int
+    qty: Decimal
+
+
+class LatestDocument(NamedTuple):
+    id: uuid.UUID
+    document_number: int
+    name: str | None
+    document_datetime: datetime.datetime
+    lines: int
+
+
+class DashboardDAL:
+    """Data Access Layer for dashboard aggregates."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def get_day_stats(self, day: datetime.date) -> dict[uuid.UUID, DayStats]:
+        """Returns posted documents of the day per document type, read from the daily rollup with one query."""
+        query = (
+            select(
+                DocumentDailyStats.document_type_id,
+                func.sum(DocumentDailyStats.documents),
+                func.sum(DocumentDailyStats.lines),
+                func.sum(DocumentDailyStats.qty),
+            )
+            .where(DocumentDailyStats.day == day)
+            .group_by(DocumentDailyStats.document_type_id)
+        )
+        result = await self.db_session.execute(query)
+        return {type_id: DayStats(int(documents), int(lines), qty) for type_id, documents, lines, qty in result}
+
+    async def get_totals(self) -> tuple[int, int]:
+        """Returns the number of nomenclatures and counterparties."""
+        query = select(
+            select(func.count()).select_from(Nomenclature).scalar_subquery(),
+            select(func.count()).select_from(Counterparty).scalar_subquery(),
+        )
+        nomenclatures, counterparties = (await self.db_session.execute(query)).one()
+        return nomenclatures, counterparties
+
+    async def get_latest_documents(self, document_type_id: uuid.UUID, limit: int) -> list[LatestDocument]:
+        """
+        Returns the latest posted documents of the type with their number of lines.
+        The order matches ix_documents_type_status_datetime, so only `limit` index entries are read.
+        """
+        lines = (
+            select(func.count())
+            .where(DocumentLine.document_id == Document.id)
+            .correlate(Document)
+            .scalar_subquery()
+        )
+        query = (
+            select(Document.id, Document.document_number, Document.name, Document.document_datetime, lines)
+            .where(Document.document_type_id == document_type_id)
+            .where(Document.status == DocumentStatuses.Posted)
+            .order_by(Document.document_datetime.desc())
+            .limit(limit)
+        )
+        result = await self.db_session.execute(query)
+        return [LatestDocument(*row) for row in result]
@@ -0,0 +1,107 @@
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Sequence
+
+from sqlalchemy import DateTime, Select, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dals.bulk import bulk_insert
+from db.models import Document, DocumentLine, DocumentType, MeasureUnit, Nomenclature, StockMove
+from constants import DocumentStatuses, DocumentTypesEnum
+
+
+def document_lines_export_query(
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+    document_type: DocumentTypesEnum | None = None,
+    status: DocumentStatuses | None = None,
+) -> Select:
+    """Document lines for export, one row per line with its document header, in document date order."""
+    query = (
+        select(
+            Document.id.label("document_id"),
+            Document.document_number,
+            Document.document_datetime,
+            DocumentType.name.label("document_type"),
+            Document.status,
+            Document.name.label("document_name"),
+            Nomenclature.sku,
+            Nomenclature.name.label("nomenclature"),
+            DocumentLine.qty,
+            MeasureUnit.short_name.label("measure_unit"),
+        )
+        .select_from(DocumentLine)
+        .join(Document, Document.id == DocumentLine.document_id)
+        .join(DocumentType, DocumentType.id == Document.document_type_id)
+        .join(Nomenclature, Nomenclature.id == DocumentLine.nomenclature_id)
+        .join(MeasureUnit, MeasureUnit.id == Nomenclature.measure_unit_id)
+        .order_by(Document.document_datetime, Document.id, Nomenclature.name)
+    )
+    if since is not None:
+        query = query.where(Document.document_datetime >= since)
+    if until is not None:
+        query = query.where(Document.document_datetime < until)
+    if document_type is not None:
+        query = query.where(DocumentType.name == document_type.value)
+    if status is not None:
+        query = query.where(Document.status == status.value)
+    return query
+
+
+class DocumentDAL:
+    """Data Access Layer for operating stock documents with their lines and moves."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def create_stock_document(
+        self,
+        document_type_id: uuid.UUID,
+        direction: int,
+        status: DocumentStatuses,
+        document_datetime: datetime.datetime,
+        commentary: str,
+        lines: Sequence[tuple[uuid.UUID, Decimal]],
+        name: str | None = None,
+    ) -> Document:
+        """
+        Creates a document with its lines. Posted documents also get stock moves with qty signed by direction.
+
+        The header goes through a regular INSERT, so the number trigger assigns its number;
+        lines are written in bulk on the same connection and transaction, moves with one INSERT ... SELECT
+        from those lines.
+        """
+        query = (
+            insert(Document)
+            .values(
+                status=status,
+                document_datetime=document_datetime,
+                commentary=commentary or "",
+                name=name,
+                document_type_id=document_type_id,
+            )
+            .returning(Document)
+        )
+        document = (await self.db_session.execute(query)).scalar_one()
+
+        line_records = [(uuid.uuid4(), document.id, nomenclature_id, qty) for nomenclature_id, qty in lines]
+        await bulk_insert(
+            self.db_session, DocumentLine.__table__, ("id", "document_id", "nomenclature_id", "qty"), line_records
+        )
+
+        if status == DocumentStatuses.Posted:
+            # движения строятся из только что записанных строк на стороне сервера: второй раз строки не передаются
+            moves = select(
+                func.gen_random_uuid(),
+                DocumentLine.id,
+                DocumentLine.nomenclature_id,
+                DocumentLine.qty * direction,
+                literal(document.document_datetime, DateTime(timezone=True)),
+            ).where(DocumentLine.document_id == document.id)
+            await self.db_session.execute(
+                insert(StockMove).from_select(
+                    ["id", "document_line_id", "nomenclature_id", "qty", "document_datetime"], moves
+                )
+            )
+        return document
@@ -0,0 +1,127 @@
+import datetime
+import uuid
+from typing import Any, Iterable
+
+from sqlalchemy import any_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from constants import JobStatuses
+from db.models import Job
+
+FINISHED_JOB_STATUSES = frozenset({JobStatuses.Succeeded, JobStatuses.Failed, JobStatuses.Cancelled})
+
+
+class JobDAL:
+    """Data Access Layer for the background job queue."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def create_job(self, kind: str, params: dict[str, Any]) -> Job:
+        job = Job(kind=kind, params=params, status=JobStatuses.Queued.value)
+        self.db_session.add(job)
+        await self.db_session.flush()
+        await self.db_session.refresh(job)
+        return job
+
+    async def get_job(self, job_id: uuid.UUID) -> Job | None:
+        return await self.db_session.get(Job, job_id)
+
+    async def claim_job(self, kinds: Iterable[str]) -> Job | None:
+        """
+        Marks the oldest queued job of the given kinds as running and returns it, None when the queue is empty.
+
+        Rows locked by concurrent claims are skipped rather than waited for, so every worker of every process
+        gets a different job without queueing behind the others.
+        """
+        queued = (
+            select(Job.id)
+            .where(Job.status == JobStatuses.Queued.value)
+            .where(Job.kind == any_(bindparam("kinds", list(kinds), type_=ARRAY(Job.kind.type))))
+            .order_by(Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(Job)
+            .where(Job.id == queued)
+            .values(status=JobStatuses.Running.value, started_at=func.now(), heartbeat_at=func.now())
+            .returning(Job)
+        )
+        return await self.db_session.scalar(query, execution_options={"synchronize_session": False})
+
+    async def report_progress(
+            self, job_id: uuid.UUID, processed: int, total: int | None, result: Any = None
+    ) -> bool:
+        """Stores progress (and the partial result, if given) of a running job, returns whether it was cancelled."""
+        values: dict[str, Any] = {"processed": processed, "heartbeat_at": func.now()}
+        if total is not None:
+            values["total"] = total
+        if result is not None:
+            values["result"] = result
+        cancel_requested = await self.db_session.scalar(
+            update(Job).where(Job.id == job_id).values(**values).returning(Job.cancel_requested)
+        )
+        return bool(cancel_requested)
+
+    async def heartbeat(self, job_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        """Marks running jobs as alive, returns those whose cancellation was requested."""
+        ids = list(job_ids)
+        if not ids:
+            return set()
+        result = await self.db_session.execute(
+            update(Job)
+            .where(Job.id == any_(bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True)))))
+            .where(Job.status == JobStatuses.Running.value)
+            .values(heartbeat_at=func.now())
+            .returning(Job.id, Job.cancel_requested)
+        )
+        return {job_id for job_id, cancel_requested in result if cancel_requested}
+
+    async def finish_job(
+            self, job_id: uuid.UUID, status: JobStatuses, result: Any = None, error: str | None = None
+    ) -> bool:
+        """
+        Stores the outcome of a running job, returns False if the job is no longer running,
+        e.g. it was already failed as stale: a finished job keeps its status, result and finish time.
+        """
+        values: dict[str, Any] = {"status": status.value, "finished_at": func.now(), "error": error}
+        if result is not None:
+            values["result"] = result
+        finished = await self.db_session.scalar(
+            update(Job)
+            .where(Job.id == job_id)
+            .where(Job.status == JobStatuses.Running.value)
+            .values(**values)
+            .returning(Job.id)
+        )
+        return finished is not None
+
+    async def cancel_job(self, job_id: uuid.UUID) -> Job | None:
+        """
+        Cancels a queued job at once and asks a running one to stop; the worker stops it at the next
+        progress report or heartbeat. Finished jobs are returned unchanged.
+        """
+        job = await self.db_session.scalar(select(Job).where(Job.id == job_id).with_for_update())
+        if job is None:
+            return None
+        if job.status == JobStatuses.Queued:
+            job.status = JobStatuses.Cancelled.value
+            job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        elif job.status == JobStatuses.Running:
+            job.cancel_requested = True
+        await self.db_session.flush()
+        return job
+
+    async def fail_stale_jobs(self, stale_seconds: float) -> list[uuid.UUID]:
+        """Fails running jobs whose worker has not sent a heartbeat for `stale_seconds`, e.g. after a crash."""
+        result = await self.db_session.scalars(
+            update(Job)
+            .where(Job.status == JobStatuses.Running.value)
+            .where(Job.heartbeat_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, stale_seconds))
+            .values(status=JobStatuses.Failed.value, finished_at=func.now(), error="worker stopped responding")
+            .returning(Job.id)
+        )
+        return list(result)
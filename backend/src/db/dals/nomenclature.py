@@ -1,17 +1,141 @@
-from typing import List, Optional, Dict, Any
+import json
+import uuid
+from datetime import date
+from typing import List, NamedTuple, Optional, Dict, Any, Iterable, Sequence
 from uuid import UUID
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import (
+    Date, Select, String, Text, any_, bindparam, cast, literal_column, select, update, delete, func, or_, tuple_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID as PG_UUID, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from db.models import Nomenclature
+from db.dals.nomenclature_group import group_filter
+from db.models import MeasureUnit, Nomenclature, NomenclatureGroup, NomenclatureType
+from settings import get_settings
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _contains_pattern(text: str) -> str:
+    return f"%{_escape_like(text)}%"
+
+
+def nomenclature_search_query(
+    text: str, *columns, group_id: Optional[UUID] = None, type_id: Optional[UUID] = None
+) -> Select:
+    """
+    Fuzzy search over name, sku and barcode ranked by trigram similarity, best match first.
+
+    Every condition is served by the GIN trigram indexes: `%>` matches names by word similarity
+    (tolerating typos), ILIKE catches exact substrings of names and of sku/barcode codes.
+    Names starting with `text` go first, which is what a user typing the beginning of a name expects.
+    Selects `columns` (the whole Nomenclature by default) plus a `score` column.
+    """
+    pattern = _contains_pattern(text)
+    is_prefix = Nomenclature.name.ilike(f"{_escape_like(text)}%", escape="\\")
+    score = func.greatest(
+        func.word_similarity(text, Nomenclature.name),
+        func.similarity(text, Nomenclature.sku),
+        func.similarity(text, Nomenclature.barcode),
+    ).label("score")
+    stmt = (
+        select(*(columns or (Nomenclature,)), score)
+        .where(or_(
+            Nomenclature.name.op("%>")(text),
+            Nomenclature.name.ilike(pattern, escape="\\"),
+            Nomenclature.sku.ilike(pattern, escape="\\"),
+            Nomenclature.barcode.ilike(pattern, escape="\\"),
+        ))
+        .order_by(is_prefix.desc(), score.desc(), Nomenclature.name, Nomenclature.id)
+    )
+    if group_id is not None:
+        stmt = stmt.where(Nomenclature.group_id == group_id)
+    if type_id is not None:
+        stmt = stmt.where(Nomenclature.type_id == type_id)
+    return stmt
+
+
+def nomenclature_export_query(
+    group_id: Optional[UUID] = None, type_id: Optional[UUID] = None, include_subgroups: bool = True
+) -> Select:
+    """Catalogue rows for export ordered by (name, id), with group, type and measure unit names joined in."""
+    stmt = (
+        select(
+            Nomenclature.id,
+            Nomenclature.name,
+            Nomenclature.sku,
+            Nomenclature.barcode,
+            NomenclatureGroup.name.label("group"),
+            NomenclatureType.name.label("type"),
+            MeasureUnit.short_name.label("measure_unit"),
+            Nomenclature.expiration_date,
+            Nomenclature.description,
+            Nomenclature.properties.cast(Text).label("properties"),
+        )
+        .join(NomenclatureGroup, NomenclatureGroup.id == Nomenclature.group_id)
+        .join(NomenclatureType, NomenclatureType.id == Nomenclature.type_id)
+        .join(MeasureUnit, MeasureUnit.id == Nomenclature.measure_unit_id)
+        .order_by(Nomenclature.name, Nomenclature.id)
+    )
+    if group_id is not None:
+        stmt = stmt.where(group_filter(Nomenclature.group_id, group_id, include_subgroups))
+    if type_id is not None:
+        stmt = stmt.where(Nomenclature.type_id == type_id)
+    return stmt
+
+
+class NomenclatureImportRow(NamedTuple):
+    name: str
+    sku: Optional[str]
+    barcode: Optional[str]
+    type_id: UUID
+    group_id: UUID
+    measure_unit_id: UUID
+    description: Optional[str]
+    expiration_date: Optional[date]
+    properties: Dict[str, Any]
+
+
+class UpsertCounts(NamedTuple):
+    inserted: int
+    updated: int
+
+
+# колонки строки импорта и типы массивов, в которых они передаются в unnest
+_IMPORT_COLUMNS = {
+    "id": PG_UUID(as_uuid=True),
+    "name": String,
+    "sku": String,
+    "barcode": Text,
+    "type_id": PG_UUID(as_uuid=True),
+    "group_id": PG_UUID(as_uuid=True),
+    "measure_unit_id": PG_UUID(as_uuid=True),
+    "description": Text,
+    "expiration_date": Date,
+    "properties": Text,
+}
 
 
 class NomenclatureDAL:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
-    async def get_all(self) -> List[Nomenclature]:
+    async def get_page(
+        self,
+        limit: int,
+        after: Optional[tuple[str, UUID]] = None,
+        group_id: Optional[UUID] = None,
+        type_id: Optional[UUID] = None,
+        include_subgroups: bool = False
+    ) -> List[Nomenclature]:
+        """
+        Returns up to `limit` nomenclatures ordered by (name, id), starting after the `after` key.
+        With `include_subgroups` the group filter covers the whole subtree of `group_id` in the same query.
+        """
+        key = (Nomenclature.name, Nomenclature.id)
         stmt = (
             select(Nomenclature)
             .options(
@@ -19,11 +143,55 @@ class NomenclatureDAL:
                 joinedload(Nomenclature.group),
                 joinedload(Nomenclature.measure_unit)
             )
-            .order_by(Nomenclature.name)
+            .order_by(*key)
+            .limit(limit)
         )
+        if after is not None:
+            stmt = stmt.where(tuple_(*key) > tuple_(*after))
+        if group_id is not None:
+            stmt = stmt.where(group_filter(Nomenclature.group_id, group_id, include_subgroups))
+        if type_id is not None:
+            stmt = stmt.where(Nomenclature.type_id == type_id)
         result = await self.db_session.execute(stmt)
         return list(result.scalars().unique())
 
+    async def _set_search_threshold(self) -> None:
+        threshold = str(get_settings().nomenclature_search_threshold)
+        await self.db_session.execute(select(
+            func.set_config("pg_trgm.similarity_threshold", threshold, True),
+            func.set_config("pg_trgm.word_similarity_threshold", threshold, True),
+        ))
+
+    async def search(
+        self,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        group_id: Optional[UUID] = None,
+        type_id: Optional[UUID] = None
+    ) -> List[tuple[Nomenclature, float]]:
+        """Returns nomenclatures matching `text` with their similarity score, best match first."""
+        await self._set_search_threshold()
+        stmt = (
+            nomenclature_search_query(text, group_id=group_id, type_id=type_id)
+            .options(
+                joinedload(Nomenclature.type),
+                joinedload(Nomenclature.group),
+                joinedload(Nomenclature.measure_unit)
+            )
+            .limit(limit)
+            .offset(offset)
+        )
+        result = await self.db_session.execute(stmt)
+        return [(nomenclature, score) for nomenclature, score in result.all()]
+
+    async def typeahead(self, text: str, limit: int) -> List[Any]:
+        """Lightweight variant of search for suggestions: id, name and sku only, no joined references."""
+        await self._set_search_threshold()
+        stmt = nomenclature_search_query(text, Nomenclature.id, Nomenclature.name, Nomenclature.sku).limit(limit)
+        result = await self.db_session.execute(stmt)
+        return list(result.all())
+
     async def get_by_id(self, nomenclature_id: UUID) -> Optional[Nomenclature]:
         stmt = (
             select(Nomenclature)
@@ -37,12 +205,42 @@ class NomenclatureDAL:
             )
         )
         result = await self.db_session.execute(stmt)
-        return result.scalar_one_or_none()
+        return result.unique().scalar_one_or_none()
     
+    async def get_missing_ids(self, nomenclature_ids: Iterable[UUID]) -> set[UUID]:
+        """Returns ids that do not exist, checking all of them with one query and one array parameter."""
+        ids = set(nomenclature_ids)
+        if not ids:
+            return set()
+        # сервер возвращает только отсутствующие id, а не все найденные строки
+        requested = func.unnest(
+            bindparam("ids", list(ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+        ).table_valued("id").render_derived()
+        query = select(requested.c.id).where(~select(Nomenclature.id).where(Nomenclature.id == requested.c.id).exists())
+        result = await self.db_session.execute(query)
+        return set(result.scalars().all())
+
+    async def get_properties(self, nomenclature_ids: Iterable[UUID]) -> Dict[UUID, Dict[str, Any]]:
+        """Returns properties of the given nomenclatures with one query and one array parameter."""
+        query = select(Nomenclature.id, Nomenclature.properties).where(
+            Nomenclature.id == any_(bindparam("ids", list(nomenclature_ids), type_=ARRAY(PG_UUID(as_uuid=True))))
+        )
+        result = await self.db_session.execute(query)
+        return {row.id: row.properties or {} for row in result}
+
+    async def get_expiration_dates(self, nomenclature_ids: Iterable[UUID]) -> Dict[UUID, date]:
+        """Returns expiration dates of the given nomenclatures; nomenclatures without one are omitted."""
+        query = select(Nomenclature.id, Nomenclature.expiration_date).where(
+            Nomenclature.id == any_(bindparam("ids", list(nomenclature_ids), type_=ARRAY(PG_UUID(as_uuid=True)))),
+            Nomenclature.expiration_date.is_not(None),
+        )
+        result = await self.db_session.execute(query)
+        return {row.id: row.expiration_date for row in result}
+
     async def get_by_name(self, name: str) -> List[Nomenclature]:
         stmt = (
             select(Nomenclature)
-            .where(func.lower(Nomenclature.name).contains(func.lower(name)))
+            .where(Nomenclature.name.ilike(_contains_pattern(name), escape="\\"))
             .options(
                 joinedload(Nomenclature.type),
                 joinedload(Nomenclature.group),
@@ -114,4 +312,72 @@ class NomenclatureDAL:
         
     async def delete(self, nomenclature_id: UUID) -> None:
         stmt = delete(Nomenclature).where(Nomenclature.id == nomenclature_id)
-        await self.db_session.execute(stmt) 
\ No newline at end of file
+        await self.db_session.execute(stmt) 
+
+    async def upsert_many(self, rows: Sequence[NomenclatureImportRow]) -> UpsertCounts:
+        """
+        Inserts the rows or updates the nomenclatures they match: by sku, for rows without sku by barcode,
+        for rows without both by (group, name). Every key is one INSERT ... SELECT FROM unnest(...) ON CONFLICT
+        statement with one array parameter per column, so a batch of any size costs at most three statements.
+
+        On update empty optional fields keep the stored values and properties are merged into the stored ones.
+        A row matching one nomenclature by its key and another one by a different unique column fails the whole
+        statement; the caller retries such batches row by row.
+        """
+        by_key: Dict[str, List[NomenclatureImportRow]] = {"sku": [], "barcode": [], "name": []}
+        for row in rows:
+            by_key["sku" if row.sku else "barcode" if row.barcode else "name"].append(row)
+
+        inserted = updated = 0
+        for key, key_rows in by_key.items():
+            if not key_rows:
+                continue
+            result = await self.db_session.execute(self._upsert_query(key, key_rows))
+            for was_inserted in result.scalars():
+                if was_inserted:
+                    inserted += 1
+                else:
+                    updated += 1
+        return UpsertCounts(inserted, updated)
+
+    @staticmethod
+    def _upsert_query(key: str, rows: Sequence[NomenclatureImportRow]):
+        values = {
+            "id": [uuid.uuid4() for _ in rows],
+            **{column: [getattr(row, column) for row in rows] for column in NomenclatureImportRow._fields},
+        }
+        values["description"] = [description or "" for description in values["description"]]
+        values["properties"] = [json.dumps(properties, ensure_ascii=False) for properties in values["properties"]]
+        source = (
+            func.unnest(*(
+                bindparam(column, values[column], type_=ARRAY(column_type))
+                for column, column_type in _IMPORT_COLUMNS.items()
+            ))
+            .table_valued(*_IMPORT_COLUMNS)
+            .render_derived(name="source")
+        )
+        query = insert(Nomenclature).from_select(
+            list(_IMPORT_COLUMNS),
+            select(*(
+                cast(source.c.properties, JSONB) if column == "properties" else source.c[column]
+                for column in _IMPORT_COLUMNS
+            )),
+        )
+        excluded = query.excluded
+        update_values = {
+            "name": excluded.name,
+            "type_id": excluded.type_id,
+            "group_id": excluded.group_id,
+            "measure_unit_id": excluded.measure_unit_id,
+            "sku": func.coalesce(excluded.sku, Nomenclature.sku),
+            "barcode": func.coalesce(excluded.barcode, Nomenclature.barcode),
+            "description": func.coalesce(func.nullif(excluded.description, ""), Nomenclature.description),
+            "expiration_date": func.coalesce(excluded.expiration_date, Nomenclature.expiration_date),
+            "properties": Nomenclature.properties.op("||")(excluded.properties),
+        }
+        if key == "name":
+            query = query.on_conflict_do_update(constraint="uq_nomenclature_group_name", set_=update_values)
+        else:
+            query = query.on_conflict_do_update(index_elements=[key], set_=update_values)
+        # xmax новой строки равен нулю, у обновлённой — номеру обновившей транзакции
+        return query.returning(literal_column("xmax = 0"))
@@ -0,0 +1,46 @@
+from typing import Iterable
+
+from sqlalchemy import CTE, ColumnElement, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import uuid
+
+from db.models import NomenclatureGroup
+
+
+def group_subtree_cte(group_id: uuid.UUID) -> CTE:
+    """
+    Recursive CTE with the ids of the group and all groups below it.
+    Each level is an index lookup by parent_id; UNION (not UNION ALL) stops on accidental parent cycles.
+    """
+    subtree = (
+        select(NomenclatureGroup.id)
+        .where(NomenclatureGroup.id == group_id)
+        .cte("group_subtree", recursive=True)
+    )
+    return subtree.union(
+        select(NomenclatureGroup.id).join(subtree, NomenclatureGroup.parent_id == subtree.c.id)
+    )
+
+
+def group_filter(group_id_column, group_id: uuid.UUID, include_subgroups: bool) -> ColumnElement[bool]:
+    """Condition on `group_id_column`: the group itself or, with `include_subgroups`, any group of its subtree."""
+    if include_subgroups:
+        return group_id_column.in_(select(group_subtree_cte(group_id).c.id))
+    return group_id_column == group_id
+
+
+class NomenclatureGroupDAL:
+    """Data Access Layer for operating nomenclature groups."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def get_names(self, group_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, str]:
+        ids = set(group_ids)
+        if not ids:
+            return {}
+        query = select(NomenclatureGroup.id, NomenclatureGroup.name).where(NomenclatureGroup.id.in_(ids))
+        result = await self.db_session.execute(query)
+        return {group_id: name for group_id, name in result.fetchall()}
+
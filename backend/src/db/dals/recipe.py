@@ -0,0 +1,90 @@
+import datetime
+import uuid
+from decimal import Decimal
+from typing import Collection, NamedTuple, Sequence
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dals.bulk import bulk_insert
+from db.models import Ingredient, Recipe, StockReservation
+from constants import DocumentStatuses
+
+
+class NewRecipe(NamedTuple):
+    base_recipe_id: uuid.UUID
+    nomenclature_id: uuid.UUID
+    batch_amount: Decimal
+    ingredients: Sequence[tuple[uuid.UUID, Decimal]]
+
+
+class RecipeDAL:
+    """Data Access Layer for operating recipes with their ingredients."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def create_recipes(
+        self,
+        document_type_id: uuid.UUID,
+        document_datetime: datetime.datetime,
+        recipes: Sequence[NewRecipe],
+        status: DocumentStatuses = DocumentStatuses.Registered,
+    ) -> list[Recipe]:
+        """
+        Creates recipes with their ingredients, returned in the order of `recipes`.
+
+        Headers go through one multi-row INSERT, so the number trigger assigns their numbers;
+        ids are generated here, which lets all ingredients and the stock reservations for them be written
+        with bulk inserts on the same connection and transaction.
+        """
+        if not recipes:
+            return []
+        ids = [uuid.uuid4() for _ in recipes]
+        query = (
+            insert(Recipe)
+            .values([
+                {
+                    "id": recipe_id,
+                    "status": status,
+                    "document_datetime": document_datetime,
+                    "commentary": "",
+                    "name": None,
+                    "document_type_id": document_type_id,
+                    "base_recipe_id": recipe.base_recipe_id,
+                    "nomenclature_id": recipe.nomenclature_id,
+                    "batch_amount": recipe.batch_amount,
+                }
+                for recipe_id, recipe in zip(ids, recipes)
+            ])
+            .returning(Recipe)
+        )
+        created = {recipe.id: recipe for recipe in (await self.db_session.execute(query)).scalars().all()}
+        ingredients = [
+            (recipe_id, nomenclature_id, amount)
+            for recipe_id, recipe in zip(ids, recipes)
+            for nomenclature_id, amount in recipe.ingredients
+        ]
+        columns = ("id", "recipe_id", "nomenclature_id")
+        await bulk_insert(
+            self.db_session, Ingredient.__table__, (*columns, "amount"),
+            [(uuid.uuid4(), *ingredient) for ingredient in ingredients],
+        )
+        await bulk_insert(
+            self.db_session, StockReservation.__table__, (*columns, "qty"),
+            [(uuid.uuid4(), *ingredient) for ingredient in ingredients],
+        )
+        return [created[recipe_id] for recipe_id in ids]
+
+    async def release_reservations(
+        self, recipe_id: uuid.UUID, nomenclature_ids: Collection[uuid.UUID] | None = None
+    ) -> int:
+        """
+        Deletes stock reservations of the recipe, only of the given nomenclatures if they are passed.
+        Returns how many were released.
+        """
+        query = delete(StockReservation).where(StockReservation.recipe_id == recipe_id)
+        if nomenclature_ids is not None:
+            query = query.where(StockReservation.nomenclature_id.in_(nomenclature_ids))
+        result = await self.db_session.execute(query)
+        return result.rowcount
@@ -0,0 +1,370 @@
+import datetime
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import (
+    BigInteger, Date, Select, Text, all_, any_, bindparam, cast, delete, false, func, literal, literal_column, or_,
+    select, text, true, union_all, update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import uuid
+
+from db.dals.nomenclature_group import group_filter
+from db.models import (
+    MeasureUnit, Nomenclature, NomenclatureGroup, StockMove, StockBalance, StockReservation, StockSnapshot,
+)
+
+
+class BalanceDrift(NamedTuple):
+    nomenclature_id: uuid.UUID
+    stored: Decimal
+    expected: Decimal
+
+
+class BalancesAt(NamedTuple):
+    snapshot_month: datetime.date | None
+    balances: dict[uuid.UUID, Decimal]
+
+
+class AvailabilityChange(NamedTuple):
+    nomenclature_id: uuid.UUID
+    group_id: uuid.UUID
+    balance: Decimal
+    # остаток за вычетом открытых резервов
+    available: Decimal
+
+    @property
+    def in_stock(self) -> bool:
+        return self.available > 0
+
+
+class AvailabilityChanges(NamedTuple):
+    # передаётся в следующий вызов get_availability_changes
+    watermark: int
+    changes: list[AvailabilityChange]
+
+
+def nomenclature_lock_key(nomenclature_id: uuid.UUID) -> int:
+    """Advisory lock key of a nomenclature: the first 8 bytes of its id as a signed bigint."""
+    return int.from_bytes(nomenclature_id.bytes[:8], "big", signed=True)
+
+
+def month_start(moment: datetime.datetime | datetime.date) -> datetime.date:
+    if isinstance(moment, datetime.datetime):
+        moment = moment.astimezone(datetime.timezone.utc)
+    return datetime.date(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+    """UTC datetimes [start, end) of the month, the same boundaries the snapshot trigger uses."""
+    start = datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+    end_month = add_months(month, 1)
+    end = datetime.datetime(end_month.year, end_month.month, 1, tzinfo=datetime.timezone.utc)
+    return start, end
+
+
+def stock_export_query(group_id: uuid.UUID | None = None, include_subgroups: bool = True) -> Select:
+    """
+    Stock ledger for export ordered by (name, id): balance, open reservations and available stock
+    of every nomenclature that has a stock_balances row.
+    """
+    reserved = (
+        select(func.coalesce(func.sum(StockReservation.qty), 0))
+        .where(StockReservation.nomenclature_id == StockBalance.nomenclature_id)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Nomenclature.id.label("nomenclature_id"),
+            Nomenclature.sku,
+            Nomenclature.name,
+            NomenclatureGroup.name.label("group"),
+            MeasureUnit.short_name.label("measure_unit"),
+            StockBalance.balance,
+            reserved.label("reserved"),
+            (StockBalance.balance - reserved).label("available"),
+        )
+        .select_from(StockBalance)
+        .join(Nomenclature, Nomenclature.id == StockBalance.nomenclature_id)
+        .join(NomenclatureGroup, NomenclatureGroup.id == Nomenclature.group_id)
+        .join(MeasureUnit, MeasureUnit.id == Nomenclature.measure_unit_id)
+        .order_by(Nomenclature.name, Nomenclature.id)
+    )
+    if group_id is not None:
+        query = query.where(group_filter(Nomenclature.group_id, group_id, include_subgroups))
+    return query
+
+
+class StockDAL:
+    """Data Access Layer for reading stock balances."""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def get_balances(self, nomenclature_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, Decimal]:
+        """Returns balances of all requested nomenclatures in one query. Nomenclatures without moves are omitted."""
+        ids = set(nomenclature_ids)
+        if not ids:
+            return {}
+        query = select(StockBalance.nomenclature_id, StockBalance.balance).where(StockBalance.nomenclature_id.in_(ids))
+        result = await self.db_session.execute(query)
+        return {nom_id: balance for nom_id, balance in result.fetchall()}
+
+    async def lock_nomenclatures(self, nomenclature_ids: Iterable[uuid.UUID]) -> None:
+        """
+        Takes transaction-level advisory locks on the given nomenclatures, one lock per nomenclature.
+
+        Writers that check availability and then reserve stock take these locks first, so they serialize only
+        when they share materials. Keys are taken in ascending order by everyone, which rules out deadlocks;
+        unnest keeps the array order, so the locks are acquired in that order within the single statement.
+        """
+        keys = sorted({nomenclature_lock_key(nomenclature_id) for nomenclature_id in nomenclature_ids})
+        if not keys:
+            return
+        lock_keys = func.unnest(bindparam("keys", keys, type_=ARRAY(BigInteger))).table_valued("key").render_derived()
+        await self.db_session.execute(select(func.pg_advisory_xact_lock(lock_keys.c.key)))
+
+    async def get_available(self, nomenclature_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, Decimal]:
+        """
+        Returns balance minus open reservations for all requested nomenclatures in one query.
+        Nomenclatures with neither moves nor reservations are omitted.
+        """
+        ids = list(set(nomenclature_ids))
+        if not ids:
+            return {}
+        ids_param = bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+        parts = union_all(
+            select(StockBalance.nomenclature_id, StockBalance.balance.label("qty"))
+            .where(StockBalance.nomenclature_id == any_(ids_param)),
+            select(StockReservation.nomenclature_id, (-StockReservation.qty).label("qty"))
+            .where(StockReservation.nomenclature_id == any_(ids_param)),
+        ).subquery()
+        query = select(parts.c.nomenclature_id, func.sum(parts.c.qty)).group_by(parts.c.nomenclature_id)
+        result = await self.db_session.execute(query)
+        return {nom_id: available for nom_id, available in result.fetchall()}
+
+    async def get_change_watermark(self) -> int:
+        """
+        Returns the watermark for get_availability_changes: the xmin of the current snapshot. Every transaction
+        that a later read cannot see has an id not below it.
+        """
+        return await self.db_session.scalar(
+            select(func.pg_snapshot_xmin(func.pg_current_snapshot()).cast(Text).cast(BigInteger))
+        )
+
+    async def get_availability_changes(self, since: int | None = None) -> AvailabilityChanges:
+        """
+        Returns balances and available stock (balance minus open reservations) of nomenclatures,
+        only for stock_balances rows changed since the `since` watermark of the previous call, all rows without it.
+
+        Triggers stamp a row with the id of the transaction that changes its balance or reservations.
+        The watermark is taken before the rows are read, so transactions the read could not see
+        are returned by the next call.
+        """
+        watermark = await self.get_change_watermark()
+        reserved = (
+            select(func.coalesce(func.sum(StockReservation.qty), 0))
+            .where(StockReservation.nomenclature_id == StockBalance.nomenclature_id)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                StockBalance.nomenclature_id, Nomenclature.group_id, StockBalance.balance, StockBalance.balance - reserved
+            )
+            .join(Nomenclature, Nomenclature.id == StockBalance.nomenclature_id)
+        )
+        if since is not None:
+            query = query.where(StockBalance.changed_xid >= since)
+        result = await self.db_session.execute(query)
+        return AvailabilityChanges(watermark, [AvailabilityChange(*row) for row in result.fetchall()])
+
+    async def get_balance_drift(self) -> list[BalanceDrift]:
+        """Compares stored balances with balances aggregated from the whole stock_moves history."""
+        expected = (
+            select(StockMove.nomenclature_id, func.sum(StockMove.qty).label("balance"))
+            .group_by(StockMove.nomenclature_id)
+            .subquery()
+        )
+        nomenclature_id = func.coalesce(StockBalance.nomenclature_id, expected.c.nomenclature_id)
+        stored_balance = func.coalesce(StockBalance.balance, 0)
+        expected_balance = func.coalesce(expected.c.balance, 0)
+        query = (
+            select(nomenclature_id, stored_balance, expected_balance)
+            .select_from(StockBalance)
+            .join(expected, expected.c.nomenclature_id == StockBalance.nomenclature_id, full=True)
+            .where(stored_balance != expected_balance)
+            .order_by(nomenclature_id)
+        )
+        result = await self.db_session.execute(query)
+        return [BalanceDrift(*row) for row in result.fetchall()]
+
+    async def rebuild_balances(self) -> list[BalanceDrift]:
+        """
+        Rebuilds stored balances from stock_moves and returns the drift that was fixed.
+
+        stock_moves is locked against writes until the end of the transaction, so the rebuild
+        cannot miss moves inserted concurrently.
+        """
+        await self.db_session.execute(text("LOCK TABLE stock_moves IN SHARE MODE"))
+        drift = await self.get_balance_drift()
+        if drift:
+            query = insert(StockBalance).values(
+                [{"nomenclature_id": d.nomenclature_id, "balance": d.expected} for d in drift]
+            )
+            query = query.on_conflict_do_update(
+                index_elements=[StockBalance.nomenclature_id],
+                set_={"balance": query.excluded.balance}
+            )
+            await self.db_session.execute(query)
+        return drift
+
+    async def get_balances_at(
+            self, at: datetime.datetime, nomenclature_ids: Iterable[uuid.UUID] | None = None
+    ) -> BalancesAt:
+        """
+        Returns balances at the given moment: for every nomenclature its latest valid monthly snapshot
+        closed before `at` plus its moves between the end of that month and `at`.
+        Without nomenclature_ids all nomenclatures with a non-zero balance are returned;
+        snapshot_month is the latest snapshot month used.
+        """
+        ids = set(nomenclature_ids) if nomenclature_ids is not None else None
+        if ids is not None and not ids:
+            return BalancesAt(None, {})
+
+        # оба подзапроса — поиск по индексам (nomenclature_id, month) и (nomenclature_id, document_datetime)
+        snapshot = (
+            select(StockSnapshot.month, StockSnapshot.balance)
+            .where(StockSnapshot.nomenclature_id == StockBalance.nomenclature_id)
+            .where(StockSnapshot.month < month_start(at))
+            .where(StockSnapshot.month < StockBalance.snapshot_valid_until)
+            .order_by(StockSnapshot.month.desc())
+            .limit(1)
+            .lateral("snapshot")
+        )
+        snapshot_end = func.timezone("UTC", snapshot.c.month + literal_column("interval '1 month'"))
+        moved = (
+            select(func.sum(StockMove.qty).label("qty"))
+            .where(StockMove.nomenclature_id == StockBalance.nomenclature_id)
+            .where(StockMove.document_datetime <= at)
+            .where(StockMove.document_datetime >= func.coalesce(snapshot_end, literal_column("'-infinity'")))
+            .lateral("moved")
+        )
+        balances = (
+            select(
+                StockBalance.nomenclature_id,
+                (func.coalesce(snapshot.c.balance, 0) + func.coalesce(moved.c.qty, 0)).label("balance"),
+                func.max(snapshot.c.month).over().label("snapshot_month"),
+            )
+            .outerjoin(snapshot, true())
+            .outerjoin(moved, true())
+        )
+        if ids is not None:
+            balances = balances.where(StockBalance.nomenclature_id.in_(ids))
+        balances = balances.subquery()
+
+        result = await self.db_session.execute(select(balances).where(balances.c.balance != 0))
+        rows = result.fetchall()
+        snapshot_month = rows[0].snapshot_month if rows else None
+        return BalancesAt(snapshot_month, {row.nomenclature_id: row.balance for row in rows})
+
+    async def build_snapshots(self, until: datetime.date) -> list[datetime.date]:
+        """
+        Builds the missing and invalidated snapshots of months that closed before `until`, returns their months.
+
+        Only nomenclatures whose snapshot_valid_until is earlier than the month of `until` are built, month by
+        month from their previous month's snapshot plus the moves of that month, with row upserts; months where
+        nothing was built (no stale nomenclatures) are not revisited. Postings are not blocked: the watermark of
+        a nomenclature moves forward only if no move changed its balance row since it was read (changed_xid),
+        otherwise the next run builds it again.
+        """
+        # два запуска задания по очереди, проведение документов не ждёт
+        await self.db_session.execute(select(func.pg_advisory_xact_lock(func.hashtext("stock_snapshots"))))
+
+        horizon = month_start(until)
+        first_move = (
+            select(func.min(StockMove.document_datetime))
+            .where(StockMove.nomenclature_id == StockBalance.nomenclature_id)
+            .scalar_subquery()
+        )
+        # без отметки (строка остатка создана не триггером движений) — строим с первого движения
+        valid_until = func.coalesce(
+            StockBalance.snapshot_valid_until, cast(func.date_trunc("month", func.timezone("UTC", first_move)), Date)
+        )
+        result = await self.db_session.execute(
+            select(StockBalance.nomenclature_id, valid_until, StockBalance.changed_xid).where(valid_until < horizon)
+        )
+        stale = result.fetchall()
+        if not stale:
+            return []
+
+        built = []
+        month = min(stale_from for _, stale_from, _ in stale)
+        while month < horizon:
+            start, end = month_bounds(month)
+            ids_param = bindparam(
+                "ids", [nom_id for nom_id, stale_from, _ in stale if stale_from <= month],
+                type_=ARRAY(PG_UUID(as_uuid=True))
+            )
+            carried = (
+                select(StockSnapshot.nomenclature_id, StockSnapshot.balance.label("qty"), false().label("moved"))
+                .where(StockSnapshot.month == add_months(month, -1))
+                .where(StockSnapshot.nomenclature_id == any_(ids_param))
+            )
+            moved = (
+                select(StockMove.nomenclature_id, StockMove.qty, true())
+                .where(StockMove.document_datetime >= start)
+                .where(StockMove.document_datetime < end)
+                .where(StockMove.nomenclature_id == any_(ids_param))
+            )
+            delta = union_all(carried, moved).subquery()
+            # нулевой остаток хранится, только если в месяце были движения: иначе отсутствие строки и есть ноль
+            closing = (
+                select(delta.c.nomenclature_id, literal(month, Date), func.sum(delta.c.qty))
+                .group_by(delta.c.nomenclature_id)
+                .having(or_(func.sum(delta.c.qty) != 0, func.bool_or(delta.c.moved)))
+            )
+            query = insert(StockSnapshot).from_select(["nomenclature_id", "month", "balance"], closing)
+            query = query.on_conflict_do_update(
+                index_elements=[StockSnapshot.nomenclature_id, StockSnapshot.month],
+                set_={"balance": query.excluded.balance},
+            ).returning(StockSnapshot.nomenclature_id)
+            written = (await self.db_session.execute(query)).scalars().all()
+            # строки, которые после пересчёта хранить не нужно
+            await self.db_session.execute(
+                delete(StockSnapshot)
+                .where(StockSnapshot.month == month)
+                .where(StockSnapshot.nomenclature_id == any_(ids_param))
+                .where(StockSnapshot.nomenclature_id != all_(
+                    bindparam("written", written, type_=ARRAY(PG_UUID(as_uuid=True)))
+                ))
+            )
+            built.append(month)
+            month = add_months(month, 1)
+
+        ids = sorted(nom_id for nom_id, _, _ in stale)
+        ids_param = bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+        # строки остатков блокируются в порядке nomenclature_id, как и при проведении движений
+        await self.db_session.execute(
+            select(StockBalance.nomenclature_id)
+            .where(StockBalance.nomenclature_id == any_(ids_param))
+            .order_by(StockBalance.nomenclature_id)
+            .with_for_update()
+        )
+        seen = func.unnest(
+            bindparam("seen_ids", [nom_id for nom_id, _, _ in stale], type_=ARRAY(PG_UUID(as_uuid=True))),
+            bindparam("seen_xids", [xid for _, _, xid in stale], type_=ARRAY(BigInteger)),
+        ).table_valued("nomenclature_id", "changed_xid").render_derived()
+        await self.db_session.execute(
+            update(StockBalance)
+            .where(StockBalance.nomenclature_id == seen.c.nomenclature_id)
+            .where(StockBalance.changed_xid == seen.c.changed_xid)
+            .values(snapshot_valid_until=horizon)
+        )
+        return built
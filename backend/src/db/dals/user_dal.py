@@ -7,6 +7,7 @@ from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import User
+from db.user_cache import mark_user_changed
 
 class UserDAL:
     """Data Access Layer for operating user info"""
@@ -38,4 +39,5 @@ class UserDAL:
         res = await self.db_session.execute(query)
         update_user = res.fetchone()
         if update_user is not None:
+            mark_user_changed(self.db_session.sync_session, user_id)
             return update_user[0]
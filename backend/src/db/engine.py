@@ -1,18 +1,67 @@
 import contextlib
+import time
 from typing import Any, AsyncGenerator, AsyncIterator
 
+import asyncpg
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
     create_async_engine,
     async_sessionmaker
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from settings import get_settings
+from settings import Settings, get_settings
 
 settings = get_settings()
 
 
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that also records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        wait = time.perf_counter() - started
+        self.checkouts += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        return connection
+
+    def recreate(self):
+        # пересоздание пула (например, после dispose) не должно терять уже накопленную статистику
+        pool = super().recreate()
+        pool.checkouts, pool.total_wait_seconds = self.checkouts, self.total_wait_seconds
+        pool.max_wait_seconds, pool.timeouts = self.max_wait_seconds, self.timeouts
+        return pool
+
+
+def engine_kwargs(settings: Settings) -> dict[str, Any]:
+    """Engine arguments for a long-running process: pool sizing, liveness checks and statement timeout."""
+    return {
+        "echo": settings.echo_sql,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}},
+    }
+
+
 class DatabaseSessionManager:
     def __init__(self, host: str, engine_kwargs: dict[str, Any]):
         self._engine = create_async_engine(host, **engine_kwargs)
@@ -26,6 +75,37 @@ class DatabaseSessionManager:
         self._engine = None
         self._sessionmaker = None
 
+    def pool_stats(self) -> dict[str, Any]:
+        """Live state of the connection pool; wait statistics are only collected by InstrumentedQueuePool."""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        pool = self._engine.pool
+        stats = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                avg_wait_ms=pool.total_wait_seconds / pool.checkouts * 1000 if pool.checkouts else 0.0,
+                max_wait_ms=pool.max_wait_seconds * 1000,
+            )
+        return stats
+
+    async def dedicated_connection(self) -> asyncpg.Connection:
+        """
+        Opens an asyncpg connection outside the pool, for LISTEN: it stays open for the life of the process
+        and must not take a pooled connection away from requests. The caller closes it.
+        """
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        url = self._engine.url.set(drivername="postgresql")
+        return await asyncpg.connect(url.render_as_string(hide_password=False))
+
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
         if self._engine is None:
@@ -53,8 +133,13 @@ class DatabaseSessionManager:
             await session.close()
 
 
-sessionmanager = DatabaseSessionManager(settings.database_url, {"echo": settings.echo_sql})
+sessionmanager = DatabaseSessionManager(settings.database_url, engine_kwargs(settings))
 
 async def get_session():
     async with sessionmanager.session() as session:
         yield session
+
+
+def get_sessionmanager() -> DatabaseSessionManager:
+    """For handlers that open sessions of their own: streaming responses outliving the request, batched imports."""
+    return sessionmanager
@@ -1,15 +1,28 @@
 from .base_model import Base
 from .base_recipe import BaseRecipe
 from .document_type import DocumentType
-from .ext import pgcrypto_extension, increment_document_number, set_document_number_trigger_base_recipes, set_document_number_trigger_documents, stock_balance_view, get_stock_balance_function
+from .ext import (
+    pgcrypto_extension, pg_trgm_extension, increment_document_number, set_document_number_trigger_base_recipes,
+    set_document_number_trigger_documents, set_document_number_trigger_recipes, stock_balance_view,
+    get_stock_balance_function, apply_stock_moves_to_balances, stock_moves_insert_balance_trigger, stock_moves_update_balance_trigger,
+    stock_moves_delete_balance_trigger, touch_stock_balances_on_reservations, stock_reservations_insert_trigger,
+    stock_reservations_delete_trigger, apply_documents_to_daily_stats, documents_insert_daily_stats_trigger,
+    documents_update_daily_stats_trigger, remove_document_from_daily_stats, documents_delete_daily_stats_trigger,
+    apply_stock_moves_to_daily_stats, stock_moves_insert_daily_stats_trigger, stock_moves_update_daily_stats_trigger,
+    stock_moves_delete_daily_stats_trigger, notify_live_updates, stock_balances_live_updates_trigger,
+    document_daily_stats_live_updates_trigger,
+)
 from .ingredient import Ingredient
+from .job import Job
 from .measure_unit import MeasureUnit
 from .nomenclature import Nomenclature
 from .nomenclature_group import NomenclatureGroup
 from .nomenclature_type import NomenclatureType
 from .recipe import Recipe
 from .recipe_generation_settings import RecipeGenerationSettings
-from .stock import Document, DocumentLine, StockMove
+from .stock import (
+    Document, DocumentDailyStats, DocumentLine, StockMove, StockBalance, StockReservation, StockSnapshot,
+)
 from .user import User
 from .counterparty import Counterparty
 
@@ -20,12 +33,34 @@ __all__ = (
     'DocumentType',
     'Recipe',
     'Ingredient',
+    'Job',
     'pgcrypto_extension',
+    'pg_trgm_extension',
     'increment_document_number',
     'set_document_number_trigger_documents',
     'set_document_number_trigger_base_recipes',
+    'set_document_number_trigger_recipes',
     'stock_balance_view',
     'get_stock_balance_function',
+    'apply_stock_moves_to_balances',
+    'stock_moves_insert_balance_trigger',
+    'stock_moves_update_balance_trigger',
+    'stock_moves_delete_balance_trigger',
+    'touch_stock_balances_on_reservations',
+    'stock_reservations_insert_trigger',
+    'stock_reservations_delete_trigger',
+    'apply_documents_to_daily_stats',
+    'documents_insert_daily_stats_trigger',
+    'documents_update_daily_stats_trigger',
+    'remove_document_from_daily_stats',
+    'documents_delete_daily_stats_trigger',
+    'apply_stock_moves_to_daily_stats',
+    'stock_moves_insert_daily_stats_trigger',
+    'stock_moves_update_daily_stats_trigger',
+    'stock_moves_delete_daily_stats_trigger',
+    'notify_live_updates',
+    'stock_balances_live_updates_trigger',
+    'document_daily_stats_live_updates_trigger',
     'MeasureUnit',
     'Nomenclature',
     'NomenclatureGroup',
@@ -34,7 +69,11 @@ __all__ = (
     'RecipeGenerationSettings',
     'Document',
     'DocumentLine',
+    'DocumentDailyStats',
     'StockMove',
+    'StockBalance',
+    'StockReservation',
+    'StockSnapshot',
     'User',
     'Counterparty',
 )
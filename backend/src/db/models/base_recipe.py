@@ -1,7 +1,7 @@
-from sqlalchemy import Column, ForeignKey, Table, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Index, Table, UniqueConstraint
 from sqlalchemy.orm import Mapped, relationship, declared_attr
 
-from .type_annotaions import rules
+from .type_annotaions import rules, version
 from .base_model import Base
 from .mixins import AbstractDocumentMixin
 
@@ -22,8 +22,11 @@ class BaseRecipe(AbstractDocumentMixin, Base):
     __tablename__ = "base_recipes"
     __table_args__ = (
         UniqueConstraint("name", "document_number", name="_unique_base_recipe_name_number_uc"),
+        # ключ постраничного списка базовых рецептов
+        Index("ix_base_recipes_datetime_number_id", "document_datetime", "document_number", "id"),
     )
     rules: Mapped[rules]
+    version: Mapped[version]
 
     @declared_attr
     def recipes(cls) -> Mapped[list["Recipe"]]:
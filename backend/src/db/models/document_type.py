@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Mapped
 from sqlalchemy.schema import UniqueConstraint
 
-from .type_annotaions import type_name, uuid_pk, document_type_counter_fk, year, counter
+from .type_annotaions import type_name, uuid_pk, document_type_counter_fk, year, counter, numbering_mode
 from .base_model import Base
 
 
@@ -12,6 +12,7 @@ class DocumentType(Base):
     id: Mapped[uuid_pk]
     name: Mapped[type_name]
     direction: Mapped[int]
+    numbering_mode: Mapped[numbering_mode]
 
 
 class DocumentNumberCounter(Base):
@@ -8,6 +8,11 @@ pgcrypto_extension = PGExtension(
     signature="pgcrypto",
 )
 
+pg_trgm_extension = PGExtension(
+    schema="public",
+    signature="pg_trgm",
+)
+
 increment_document_number = PGFunction(
     schema="public",
     signature="increment_document_number()",
@@ -16,14 +21,37 @@ increment_document_number = PGFunction(
     $$
     DECLARE
         current_year INTEGER := EXTRACT(YEAR FROM NEW.document_datetime);
+        type_numbering_mode TEXT;
+        sequence_name TEXT;
         new_counter INTEGER;
     BEGIN
-        -- вставляем новую строку в счётчик (стартуя с 1) или увеличиваем существующий
-        INSERT INTO document_number_counters (id, document_type_id, year, counter)
-        VALUES (gen_random_uuid(), NEW.document_type_id, current_year, 1)
-        ON CONFLICT (document_type_id, year)
-        DO UPDATE SET counter = document_number_counters.counter + 1
-        RETURNING counter INTO new_counter;
+        -- строка типа блокируется на чтение до конца транзакции: переключение режима (FOR UPDATE) ждёт
+        -- документы, уже получившие номер по старому режиму, а новые документы ждут переключения
+        SELECT numbering_mode INTO type_numbering_mode FROM document_types WHERE id = NEW.document_type_id FOR SHARE;
+
+        IF type_numbering_mode = 'sequence' THEN
+            -- номер берётся из последовательности типа и года — без блокировки до конца транзакции,
+            -- но с пропусками номеров при откате; последовательность создаётся при первом документе года
+            sequence_name := format('document_number_seq_%s_%s', replace(NEW.document_type_id::TEXT, '-', ''), current_year);
+            IF to_regclass(sequence_name) IS NULL THEN
+                PERFORM pg_advisory_xact_lock(hashtext(sequence_name));
+                EXECUTE format(
+                    'CREATE SEQUENCE IF NOT EXISTS %I START WITH %s',
+                    sequence_name,
+                    COALESCE((SELECT counter FROM document_number_counters
+                               WHERE document_type_id = NEW.document_type_id AND year = current_year), 0) + 1
+                );
+            END IF;
+            new_counter := nextval(sequence_name);
+        ELSE
+            -- вставляем новую строку в счётчик (стартуя с 1) или увеличиваем существующий;
+            -- строка счётчика заблокирована до конца транзакции, зато номера идут без пропусков
+            INSERT INTO document_number_counters (id, document_type_id, year, counter)
+            VALUES (gen_random_uuid(), NEW.document_type_id, current_year, 1)
+            ON CONFLICT (document_type_id, year)
+            DO UPDATE SET counter = document_number_counters.counter + 1
+            RETURNING counter INTO new_counter;
+        END IF;
 
         -- проставляем в новый документ номер и шаблонное имя
         NEW.document_number := new_counter;
@@ -64,14 +92,24 @@ set_document_number_trigger_documents = PGTrigger(
     """
 )
 
+set_document_number_trigger_recipes = PGTrigger(
+    schema="public",
+    signature="set_document_number_recipes",
+    on_entity="recipes",
+    definition="""
+    BEFORE INSERT ON recipes
+    FOR EACH ROW
+    EXECUTE FUNCTION increment_document_number();
+    """
+)
+
 stock_balance_view = PGView(
     schema="public",
     signature="stock_balance",
     definition="""
-    SELECT m.nomenclature_id, n.type_id AS item_type_id, SUM(m.qty) AS balance
-    FROM stock_moves m
-    JOIN nomenclatures n ON n.id = m.nomenclature_id
-    GROUP BY m.nomenclature_id, n.type_id;
+    SELECT b.nomenclature_id, n.type_id AS item_type_id, b.balance
+    FROM stock_balances b
+    JOIN nomenclatures n ON n.id = b.nomenclature_id;
     """
 )
 
@@ -80,9 +118,415 @@ get_stock_balance_function = PGFunction(
     signature="get_stock_balance(p_nomenclature_id uuid)",
     definition="""
     RETURNS numeric AS $$
-    SELECT COALESCE(SUM(qty), 0)
-      FROM stock_moves
-     WHERE nomenclature_id = p_nomenclature_id;
+    SELECT COALESCE(
+        (SELECT balance FROM stock_balances WHERE nomenclature_id = p_nomenclature_id),
+        0
+    );
     $$ LANGUAGE SQL STABLE;
     """
 )
+
+apply_stock_moves_to_balances = PGFunction(
+    schema="public",
+    signature="apply_stock_moves_to_balances()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- агрегируем изменения всего оператора по номенклатуре и применяем одной вставкой;
+        -- сортировка по nomenclature_id даёт одинаковый порядок блокировок строк остатков
+        -- движения задним числом делают неактуальными месячные снимки своей номенклатуры начиная с их месяца:
+        -- snapshot_valid_until сдвигается назад в той же строке остатка, снимки других номенклатур не трогаются
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO stock_balances (nomenclature_id, balance, snapshot_valid_until)
+            SELECT nomenclature_id, SUM(qty), date_trunc('month', MIN(document_datetime) AT TIME ZONE 'UTC')::date
+              FROM new_moves
+             GROUP BY nomenclature_id
+             ORDER BY nomenclature_id
+            ON CONFLICT (nomenclature_id)
+            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance,
+                          snapshot_valid_until = LEAST(stock_balances.snapshot_valid_until,
+                                                       EXCLUDED.snapshot_valid_until),
+                          changed_xid = pg_current_xact_id()::text::bigint;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO stock_balances (nomenclature_id, balance, snapshot_valid_until)
+            SELECT nomenclature_id, -SUM(qty), date_trunc('month', MIN(document_datetime) AT TIME ZONE 'UTC')::date
+              FROM old_moves
+             GROUP BY nomenclature_id
+             ORDER BY nomenclature_id
+            ON CONFLICT (nomenclature_id)
+            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance,
+                          snapshot_valid_until = LEAST(stock_balances.snapshot_valid_until,
+                                                       EXCLUDED.snapshot_valid_until),
+                          changed_xid = pg_current_xact_id()::text::bigint;
+        ELSE
+            INSERT INTO stock_balances (nomenclature_id, balance, snapshot_valid_until)
+            SELECT nomenclature_id, SUM(qty), date_trunc('month', MIN(document_datetime) AT TIME ZONE 'UTC')::date
+              FROM (
+                    SELECT nomenclature_id, qty, document_datetime FROM new_moves
+                    UNION ALL
+                    SELECT nomenclature_id, -qty, document_datetime FROM old_moves
+                   ) AS delta
+             GROUP BY nomenclature_id
+             ORDER BY nomenclature_id
+            ON CONFLICT (nomenclature_id)
+            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance,
+                          snapshot_valid_until = LEAST(stock_balances.snapshot_valid_until,
+                                                       EXCLUDED.snapshot_valid_until),
+                          changed_xid = pg_current_xact_id()::text::bigint;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+stock_moves_insert_balance_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_insert",
+    on_entity="stock_moves",
+    definition="""
+    AFTER INSERT ON stock_moves
+    REFERENCING NEW TABLE AS new_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_balances();
+    """
+)
+
+stock_moves_update_balance_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_update",
+    on_entity="stock_moves",
+    definition="""
+    AFTER UPDATE ON stock_moves
+    REFERENCING OLD TABLE AS old_moves NEW TABLE AS new_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_balances();
+    """
+)
+
+stock_moves_delete_balance_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_delete",
+    on_entity="stock_moves",
+    definition="""
+    AFTER DELETE ON stock_moves
+    REFERENCING OLD TABLE AS old_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_balances();
+    """
+)
+
+
+touch_stock_balances_on_reservations = PGFunction(
+    schema="public",
+    signature="touch_stock_balances_on_reservations()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- резервы меняют доступный остаток — отмечаем строки остатков, чтобы индекс доступности их перечитал;
+        -- строки блокируются в порядке nomenclature_id, как и при проведении движений
+        IF TG_OP = 'INSERT' THEN
+            PERFORM 1
+               FROM stock_balances
+              WHERE nomenclature_id IN (SELECT nomenclature_id FROM new_reservations)
+              ORDER BY nomenclature_id
+                FOR UPDATE;
+            UPDATE stock_balances
+               SET changed_xid = pg_current_xact_id()::text::bigint
+             WHERE nomenclature_id IN (SELECT nomenclature_id FROM new_reservations);
+        ELSE
+            PERFORM 1
+               FROM stock_balances
+              WHERE nomenclature_id IN (SELECT nomenclature_id FROM old_reservations)
+              ORDER BY nomenclature_id
+                FOR UPDATE;
+            UPDATE stock_balances
+               SET changed_xid = pg_current_xact_id()::text::bigint
+             WHERE nomenclature_id IN (SELECT nomenclature_id FROM old_reservations);
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+stock_reservations_insert_trigger = PGTrigger(
+    schema="public",
+    signature="touch_stock_balances_on_reservation_insert",
+    on_entity="stock_reservations",
+    definition="""
+    AFTER INSERT ON stock_reservations
+    REFERENCING NEW TABLE AS new_reservations
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_stock_balances_on_reservations();
+    """
+)
+
+stock_reservations_delete_trigger = PGTrigger(
+    schema="public",
+    signature="touch_stock_balances_on_reservation_delete",
+    on_entity="stock_reservations",
+    definition="""
+    AFTER DELETE ON stock_reservations
+    REFERENCING OLD TABLE AS old_reservations
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_stock_balances_on_reservations();
+    """
+)
+
+
+apply_documents_to_daily_stats = PGFunction(
+    schema="public",
+    signature="apply_documents_to_daily_stats()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- новый проведённый документ ещё без движений, их добавит триггер stock_moves;
+        -- при изменении документ вычитается из сводки со старыми значениями и добавляется с новыми
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT (document_datetime AT TIME ZONE 'UTC')::date, document_type_id, pg_backend_pid() % 16,
+                   COUNT(*), 0, 0
+              FROM new_documents
+             WHERE status = 'Posted'
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        ELSE
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT day, document_type_id, pg_backend_pid() % 16, SUM(sign), SUM(sign * lines), SUM(sign * qty)
+              FROM (
+                    SELECT d.document_datetime, d.document_type_id, d.id, 1 AS sign FROM new_documents d
+                     WHERE d.status = 'Posted'
+                    UNION ALL
+                    SELECT d.document_datetime, d.document_type_id, d.id, -1 FROM old_documents d
+                     WHERE d.status = 'Posted'
+                   ) AS changed
+             CROSS JOIN LATERAL (
+                    SELECT (changed.document_datetime AT TIME ZONE 'UTC')::date AS day,
+                           COUNT(m.id) AS lines, COALESCE(SUM(ABS(m.qty)), 0) AS qty
+                      FROM document_lines l
+                      JOIN stock_moves m ON m.document_line_id = l.id
+                     WHERE l.document_id = changed.id
+                   ) AS moves
+             GROUP BY day, document_type_id
+            HAVING SUM(sign) <> 0 OR SUM(sign * lines) <> 0 OR SUM(sign * qty) <> 0
+             ORDER BY day, document_type_id
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+documents_insert_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="apply_documents_insert_daily_stats",
+    on_entity="documents",
+    definition="""
+    AFTER INSERT ON documents
+    REFERENCING NEW TABLE AS new_documents
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_documents_to_daily_stats();
+    """
+)
+
+documents_update_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="apply_documents_update_daily_stats",
+    on_entity="documents",
+    definition="""
+    AFTER UPDATE ON documents
+    REFERENCING OLD TABLE AS old_documents NEW TABLE AS new_documents
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_documents_to_daily_stats();
+    """
+)
+
+remove_document_from_daily_stats = PGFunction(
+    schema="public",
+    signature="remove_document_from_daily_stats()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- до удаления, пока строки и движения документа на месте, а каскадное удаление движений
+        -- уже не найдёт документ, и триггер stock_moves не вычтет их второй раз
+        IF OLD.status = 'Posted' THEN
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT (OLD.document_datetime AT TIME ZONE 'UTC')::date, OLD.document_type_id, pg_backend_pid() % 16,
+                   -1, -COUNT(m.id), -COALESCE(SUM(ABS(m.qty)), 0)
+              FROM document_lines l
+              JOIN stock_moves m ON m.document_line_id = l.id
+             WHERE l.document_id = OLD.id
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        END IF;
+
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+documents_delete_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="remove_document_from_daily_stats",
+    on_entity="documents",
+    definition="""
+    BEFORE DELETE ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION remove_document_from_daily_stats();
+    """
+)
+
+apply_stock_moves_to_daily_stats = PGFunction(
+    schema="public",
+    signature="apply_stock_moves_to_daily_stats()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- учитываются только движения проведённых документов; тип и день берутся из документа
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT (d.document_datetime AT TIME ZONE 'UTC')::date, d.document_type_id, pg_backend_pid() % 16,
+                   0, COUNT(*), SUM(ABS(m.qty))
+              FROM new_moves m
+              JOIN document_lines l ON l.id = m.document_line_id
+              JOIN documents d ON d.id = l.document_id
+             WHERE d.status = 'Posted'
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT (d.document_datetime AT TIME ZONE 'UTC')::date, d.document_type_id, pg_backend_pid() % 16,
+                   0, -COUNT(*), -SUM(ABS(m.qty))
+              FROM old_moves m
+              JOIN document_lines l ON l.id = m.document_line_id
+              JOIN documents d ON d.id = l.document_id
+             WHERE d.status = 'Posted'
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        ELSE
+            INSERT INTO document_daily_stats (day, document_type_id, shard, documents, lines, qty)
+            SELECT (d.document_datetime AT TIME ZONE 'UTC')::date, d.document_type_id, pg_backend_pid() % 16,
+                   0, SUM(delta.sign), SUM(delta.sign * ABS(delta.qty))
+              FROM (
+                    SELECT document_line_id, qty, 1 AS sign FROM new_moves
+                    UNION ALL
+                    SELECT document_line_id, qty, -1 FROM old_moves
+                   ) AS delta
+              JOIN document_lines l ON l.id = delta.document_line_id
+              JOIN documents d ON d.id = l.document_id
+             WHERE d.status = 'Posted'
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            ON CONFLICT (day, document_type_id, shard)
+            DO UPDATE SET documents = document_daily_stats.documents + EXCLUDED.documents,
+                          lines = document_daily_stats.lines + EXCLUDED.lines,
+                          qty = document_daily_stats.qty + EXCLUDED.qty;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+stock_moves_insert_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_insert_daily_stats",
+    on_entity="stock_moves",
+    definition="""
+    AFTER INSERT ON stock_moves
+    REFERENCING NEW TABLE AS new_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_daily_stats();
+    """
+)
+
+stock_moves_update_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_update_daily_stats",
+    on_entity="stock_moves",
+    definition="""
+    AFTER UPDATE ON stock_moves
+    REFERENCING OLD TABLE AS old_moves NEW TABLE AS new_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_daily_stats();
+    """
+)
+
+stock_moves_delete_daily_stats_trigger = PGTrigger(
+    schema="public",
+    signature="apply_stock_moves_delete_daily_stats",
+    on_entity="stock_moves",
+    definition="""
+    AFTER DELETE ON stock_moves
+    REFERENCING OLD TABLE AS old_moves
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_stock_moves_to_daily_stats();
+    """
+)
+
+
+notify_live_updates = PGFunction(
+    schema="public",
+    signature="notify_live_updates()",
+    definition="""
+    RETURNS trigger AS
+    $$
+    BEGIN
+        -- уведомление уходит слушателям при коммите; одинаковые уведомления транзакции PostgreSQL схлопывает
+        PERFORM pg_notify('live_updates', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+stock_balances_live_updates_trigger = PGTrigger(
+    schema="public",
+    signature="notify_stock_balances_live_updates",
+    on_entity="stock_balances",
+    definition="""
+    AFTER INSERT OR UPDATE OR DELETE ON stock_balances
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_live_updates();
+    """
+)
+
+document_daily_stats_live_updates_trigger = PGTrigger(
+    schema="public",
+    signature="notify_document_daily_stats_live_updates",
+    on_entity="document_daily_stats",
+    definition="""
+    AFTER INSERT OR UPDATE OR DELETE ON document_daily_stats
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_live_updates();
+    """
+)
@@ -0,0 +1,40 @@
+import datetime
+import uuid
+from typing import Any
+
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_model import Base
+from .type_annotaions import created_at, uuid_pk
+
+
+class Job(Base):
+    """
+    Фоновое задание. Таблица и есть очередь: воркеры забирают самое старое задание в статусе queued
+    через FOR UPDATE SKIP LOCKED, поэтому несколько воркеров и процессов не ждут друг друга и не берут одно задание.
+    """
+
+    __tablename__ = "jobs"
+
+    id: Mapped[uuid_pk]
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    params: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default=text("'queued'"))
+    # прогресс в единицах задания (строки, рецепты и т. п.); total неизвестен, пока задание его не сообщит
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    total: Mapped[int | None] = mapped_column(Integer)
+    result: Mapped[Any | None] = mapped_column(JSONB)
+    error: Mapped[str | None] = mapped_column(Text)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))
+    created_at: Mapped[created_at]
+    started_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+    # воркер обновляет, пока выполняет задание; давно не обновлявшееся running-задание осталось от упавшего процесса
+    heartbeat_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_jobs_queued_created_at", "created_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_running_heartbeat_at", "heartbeat_at", postgresql_where=text("status = 'running'")),
+    )
@@ -1,6 +1,6 @@
 import uuid
 from datetime import date
-from sqlalchemy import String, Text, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import String, Text, Date, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship, declared_attr
 from .base_model import Base
@@ -20,6 +20,15 @@ class Nomenclature(Base):
     __tablename__ = "nomenclatures"
     __table_args__ = (
         UniqueConstraint("group_id", "name", name="uq_nomenclature_group_name"),
+        # ключ постраничного списка номенклатуры
+        Index("ix_nomenclatures_name_id", "name", "id"),
+        # триграммные индексы нечёткого поиска (расширение pg_trgm)
+        Index("ix_nomenclatures_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_nomenclatures_sku_trgm", "sku", postgresql_using="gin", postgresql_ops={"sku": "gin_trgm_ops"}),
+        Index(
+            "ix_nomenclatures_barcode_trgm", "barcode",
+            postgresql_using="gin", postgresql_ops={"barcode": "gin_trgm_ops"}
+        ),
     )
 
     id: Mapped[uuid_pk]
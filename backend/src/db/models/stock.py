@@ -1,14 +1,18 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 from sqlalchemy import (
+    BigInteger,
     Date,
     DateTime,
     Enum as SAEnum,
     ForeignKey,
+    Index,
+    Integer,
     JSON,
     Numeric,
+    SmallInteger,
     String,
     Text,
     UniqueConstraint,
@@ -26,6 +30,9 @@ class Document(AbstractDocumentMixin, Base):
     """Заголовок любого склада‑документа."""
 
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_type_status_datetime", "document_type_id", "status", "document_datetime"),
+    )
 
     lines: Mapped[list["DocumentLine"]] = relationship(back_populates="document", cascade="all, delete-orphan")
 
@@ -61,5 +68,109 @@ class StockMove(Base):
     qty: Mapped[Decimal] = mapped_column(Numeric(18, 4))
     document_datetime: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
+    __table_args__ = (
+        Index(
+            "ix_stock_moves_nomenclature_id_document_datetime",
+            "nomenclature_id", "document_datetime",
+            postgresql_include=["qty"],
+        ),
+        Index("ix_stock_moves_document_datetime", "document_datetime"),
+    )
+
     def __repr__(self) -> str:
         return f"<Move {self.nomenclature_id} {self.qty}>"
+
+
+class StockBalance(Base):
+    """Текущий остаток номенклатуры. Поддерживается триггерами на stock_moves."""
+
+    __tablename__ = "stock_balances"
+
+    nomenclature_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("nomenclatures.id", ondelete="CASCADE"), primary_key=True
+    )
+    balance: Mapped[Decimal] = mapped_column(Numeric(18, 4), nullable=False, server_default=text("0"))
+    # id транзакции, последней изменившей остаток или резервы номенклатуры: по нему индекс доступности
+    # перечитывает только изменившиеся строки (см. StockDAL.get_availability_changes)
+    changed_xid: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint")
+    )
+    # снимки остатков номенклатуры действительны для месяцев до этого (см. StockSnapshot);
+    # триггер движений сдвигает его назад на месяц проведённого задним числом движения
+    snapshot_valid_until: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+    __table_args__ = (Index("ix_stock_balances_changed_xid", "changed_xid"),)
+
+    def __repr__(self) -> str:
+        return f"<Balance {self.nomenclature_id} {self.balance}>"
+
+
+class StockReservation(Base):
+    """
+    Количество номенклатуры, зарезервированное под рецепт.
+    Пока резерв существует, оно вычитается из доступного остатка; удаляется вместе с рецептом.
+    """
+
+    __tablename__ = "stock_reservations"
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    recipe_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
+    nomenclature_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("nomenclatures.id"), nullable=False)
+    qty: Mapped[Decimal] = mapped_column(Numeric(18, 4), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=text("now()")
+    )
+
+    __table_args__ = (
+        UniqueConstraint("recipe_id", "nomenclature_id", name="uq_stock_reservation_recipe_nom"),
+        Index("ix_stock_reservations_nomenclature_id", "nomenclature_id", postgresql_include=["qty"]),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Reservation {self.nomenclature_id} {self.qty}>"
+
+
+class StockSnapshot(Base):
+    """
+    Остаток номенклатуры на конец месяца (границы месяцев в UTC).
+    Строка хранится, если остаток ненулевой или в месяце были движения; нет строки за построенный месяц —
+    остаток нулевой. Действительны только строки месяцев до StockBalance.snapshot_valid_until номенклатуры.
+    """
+
+    __tablename__ = "stock_snapshots"
+
+    nomenclature_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("nomenclatures.id", ondelete="CASCADE"), primary_key=True
+    )
+    month: Mapped[date] = mapped_column(Date, primary_key=True)  # первое число месяца
+    balance: Mapped[Decimal] = mapped_column(Numeric(18, 4), nullable=False)
+
+    __table_args__ = (Index("ix_stock_snapshots_month", "month"),)
+
+    def __repr__(self) -> str:
+        return f"<Snapshot {self.nomenclature_id} {self.month} {self.balance}>"
+
+
+class DocumentDailyStats(Base):
+    """
+    Сводка проведённых документов по дням (UTC) и типам: число документов, число их движений и количество.
+    Поддерживается триггерами на documents и stock_moves.
+
+    Каждое соединение пишет приращения в свою долю (shard = pg_backend_pid() % 16), чтобы одновременное проведение
+    документов одного типа за один день не ждало блокировку одной строки; значения дня — сумма по долям.
+    """
+
+    __tablename__ = "document_daily_stats"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    document_type_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("document_types.id", ondelete="CASCADE"), primary_key=True
+    )
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    documents: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    lines: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    # сумма количеств без знака: направление задаёт тип документа
+    qty: Mapped[Decimal] = mapped_column(Numeric(18, 4), nullable=False, server_default=text("0"))
+
+    def __repr__(self) -> str:
+        return f"<DailyStats {self.day} {self.document_type_id} {self.documents}>"
@@ -40,6 +40,9 @@ document_type_counter_fk = Annotated[
 
 # DocumentType
 type_name = Annotated[str, mapped_column(String(MAX_NAME_LENGTH), nullable=False, unique=True)]
+numbering_mode = Annotated[str, mapped_column(String(20), nullable=False, server_default=text("'gapless'"))]
 
 # BaseRecipe
 rules = Annotated[dict[str, any], mapped_column(JSONB, nullable=False)]
+# растёт при каждом изменении базового рецепта, входит в ключ кеша скомпилированных правил
+version = Annotated[int, mapped_column(Integer, nullable=False, server_default=text("1"))]
@@ -0,0 +1,243 @@
+"""
+Process-wide cache of reference tables that change rarely but are read on every request:
+document types, measure units, nomenclature types and groups, recipe generation settings.
+
+Each table is loaded whole with one query and kept as immutable records for `reference_cache_ttl_seconds`.
+Writes made through a session (ORM flushes as well as insert/update/delete statements) invalidate
+the touched tables after commit; writes from other processes and raw SQL are picked up when the TTL expires.
+The cache only knows what existed when it was loaded, so it must not be the reason to reject an id:
+callers that find an id missing ask again with `refresh=True`, which reloads the table.
+"""
+import asyncio
+import dataclasses
+import uuid
+from collections.abc import Iterator, Mapping
+from types import MappingProxyType
+from typing import Any, Callable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, ORMExecuteState
+
+from cache import TTLCache
+from db.models import DocumentType, MeasureUnit, NomenclatureGroup, NomenclatureType, RecipeGenerationSettings
+from settings import get_settings
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DocumentTypeRecord:
+    id: uuid.UUID
+    name: str
+    direction: int
+    numbering_mode: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class MeasureUnitRecord:
+    id: uuid.UUID
+    name: str
+    short_name: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class NomenclatureTypeRecord:
+    id: uuid.UUID
+    name: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class NomenclatureGroupRecord:
+    id: uuid.UUID
+    name: str
+    parent_id: uuid.UUID | None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RecipeGenerationSettingsRecord:
+    id: int
+    film_formers_group_id: uuid.UUID | None
+    pigments_group_id: uuid.UUID | None
+    fillers_group_id: uuid.UUID | None
+
+
+_CHANGED_TABLES_KEY = "reference_cache_changed_tables"
+
+_RECORDS = {
+    DocumentType.__tablename__: (DocumentType, DocumentTypeRecord),
+    MeasureUnit.__tablename__: (MeasureUnit, MeasureUnitRecord),
+    NomenclatureType.__tablename__: (NomenclatureType, NomenclatureTypeRecord),
+    NomenclatureGroup.__tablename__: (NomenclatureGroup, NomenclatureGroupRecord),
+    RecipeGenerationSettings.__tablename__: (RecipeGenerationSettings, RecipeGenerationSettingsRecord),
+}
+
+
+def _to_record(record_class: type, row: Any) -> Any:
+    return record_class(**{field.name: getattr(row, field.name) for field in dataclasses.fields(record_class)})
+
+
+def _by_id(records: list) -> Mapping[uuid.UUID, Any]:
+    return MappingProxyType({record.id: record for record in records})
+
+
+class NomenclatureGroupTree(Mapping[uuid.UUID, NomenclatureGroupRecord]):
+    """
+    Immutable nomenclature group hierarchy: groups by id plus children, ancestors and descendants of each group,
+    precomputed once so that tree questions are answered without queries or recursive walks.
+    """
+
+    def __init__(self, groups: list[NomenclatureGroupRecord]):
+        self._groups = {group.id: group for group in groups}
+        children: dict[uuid.UUID | None, list[uuid.UUID]] = {}
+        for group in sorted(groups, key=lambda g: g.name):
+            # группа с несуществующим родителем считается корневой
+            parent_id = group.parent_id if group.parent_id in self._groups else None
+            children.setdefault(parent_id, []).append(group.id)
+        self._children = {parent_id: tuple(ids) for parent_id, ids in children.items()}
+
+        self._ancestors: dict[uuid.UUID, tuple[uuid.UUID, ...]] = {}
+        self._descendants: dict[uuid.UUID, frozenset[uuid.UUID]] = {}
+        # обход в глубину от корней: предки известны по пути, потомки собираются на выходе из поддерева
+        stack: list[tuple[uuid.UUID, tuple[uuid.UUID, ...], bool]] = [
+            (root_id, (), False) for root_id in reversed(self._children.get(None, ()))
+        ]
+        while stack:
+            group_id, path, exiting = stack.pop()
+            if exiting:
+                self._descendants[group_id] = frozenset().union(
+                    *((child_id, *self._descendants[child_id]) for child_id in self._children.get(group_id, ()))
+                )
+                continue
+            self._ancestors[group_id] = path
+            stack.append((group_id, path, True))
+            stack.extend((child_id, (*path, group_id), False) for child_id in reversed(self._children.get(group_id, ())))
+
+    def __getitem__(self, group_id: uuid.UUID) -> NomenclatureGroupRecord:
+        return self._groups[group_id]
+
+    def __iter__(self) -> Iterator[uuid.UUID]:
+        return iter(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    @property
+    def roots(self) -> tuple[uuid.UUID, ...]:
+        return self._children.get(None, ())
+
+    def children(self, group_id: uuid.UUID) -> tuple[uuid.UUID, ...]:
+        return self._children.get(group_id, ())
+
+    def ancestors(self, group_id: uuid.UUID) -> tuple[uuid.UUID, ...]:
+        """Ancestors from the root down to the parent; groups caught in a parent cycle have none."""
+        return self._ancestors.get(group_id, ())
+
+    def descendants(self, group_id: uuid.UUID, include_self: bool = False) -> frozenset[uuid.UUID]:
+        descendants = self._descendants.get(group_id, frozenset())
+        return descendants | {group_id} if include_self else descendants
+
+    def is_within(self, group_id: uuid.UUID, ancestor_id: uuid.UUID) -> bool:
+        """True when the group is `ancestor_id` itself or lies anywhere below it."""
+        return group_id == ancestor_id or ancestor_id in self.ancestors(group_id)
+
+
+class ReferenceDataCache:
+    """Cache of whole reference tables keyed by table name."""
+
+    def __init__(self, ttl: float):
+        self._tables: TTLCache[str, Any] = TTLCache(ttl=ttl, maxsize=len(_RECORDS))
+        self._locks = {table: asyncio.Lock() for table in _RECORDS}
+
+    @staticmethod
+    async def _load(table: str, session: AsyncSession, build: Callable[[list], Any]) -> Any:
+        model, record_class = _RECORDS[table]
+        rows = (await session.execute(select(model))).scalars().all()
+        return build([_to_record(record_class, row) for row in rows])
+
+    async def _get(self, table: str, session: AsyncSession, build: Callable[[list], Any], refresh: bool) -> Any:
+        if table in session.sync_session.info.get(_CHANGED_TABLES_KEY, ()):
+            # сессия уже меняла таблицу в текущей транзакции: читаем мимо кеша, чтобы увидеть свои изменения
+            return await self._load(table, session, build)
+        cached = None if refresh else self._tables.get(table)
+        if cached is not None:
+            return cached
+        # один запрос на таблицу даже при одновременных промахах
+        async with self._locks[table]:
+            cached = None if refresh else self._tables.get(table)
+            if cached is None:
+                cached = await self._load(table, session, build)
+                self._tables.set(table, cached)
+            return cached
+
+    def invalidate(self, *tables: str) -> None:
+        """Drops the given tables (all tables when called without arguments)."""
+        for table in tables or _RECORDS:
+            self._tables.pop(table)
+
+    async def document_types(
+            self, session: AsyncSession, refresh: bool = False
+    ) -> Mapping[uuid.UUID, DocumentTypeRecord]:
+        return await self._get(DocumentType.__tablename__, session, _by_id, refresh)
+
+    async def document_type_by_name(self, session: AsyncSession, name: str) -> DocumentTypeRecord | None:
+        """Finds the document type by name; a name missing from the cache is looked up again in a reloaded table."""
+        for refresh in (False, True):
+            found = next((r for r in (await self.document_types(session, refresh)).values() if r.name == name), None)
+            if found is not None:
+                return found
+        return None
+
+    async def measure_units(
+            self, session: AsyncSession, refresh: bool = False
+    ) -> Mapping[uuid.UUID, MeasureUnitRecord]:
+        return await self._get(MeasureUnit.__tablename__, session, _by_id, refresh)
+
+    async def nomenclature_types(
+            self, session: AsyncSession, refresh: bool = False
+    ) -> Mapping[uuid.UUID, NomenclatureTypeRecord]:
+        return await self._get(NomenclatureType.__tablename__, session, _by_id, refresh)
+
+    async def nomenclature_groups(self, session: AsyncSession, refresh: bool = False) -> NomenclatureGroupTree:
+        return await self._get(NomenclatureGroup.__tablename__, session, NomenclatureGroupTree, refresh)
+
+    async def recipe_generation_settings(self, session: AsyncSession) -> RecipeGenerationSettingsRecord | None:
+        # настройки хранятся строкой с id = 1; кешируется кортеж строк, поэтому отсутствие настроек тоже кешируется
+        settings_rows = await self._get(RecipeGenerationSettings.__tablename__, session, tuple, False)
+        return next((row for row in settings_rows if row.id == 1), None)
+
+
+reference_cache = ReferenceDataCache(ttl=get_settings().reference_cache_ttl_seconds)
+
+
+def _mark_changed(session: Session, tables: set[str]) -> None:
+    if tables:
+        session.info.setdefault(_CHANGED_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session: Session, flush_context) -> None:
+    changed = {
+        instance.__tablename__
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if getattr(instance, "__tablename__", None) in _RECORDS
+    }
+    _mark_changed(session, changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tables(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name in _RECORDS:
+            _mark_changed(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_TABLES_KEY, None)
+    if changed:
+        reference_cache.invalidate(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session: Session) -> None:
+    session.info.pop(_CHANGED_TABLES_KEY, None)
@@ -0,0 +1,80 @@
+"""
+Process-wide cache of authenticated users keyed by token subject (the user's email).
+
+Lets `get_current_user_from_token` skip the users lookup on every request: entries live for
+`user_cache_ttl_seconds` and at most `user_cache_maxsize` users are kept, least recently used evicted first.
+Entries are immutable snapshots, not ORM objects, so concurrent requests sharing one cannot change it for each other
+and nothing is lazily loaded from a closed session.
+
+`UserDAL.update_user` marks the user as changed and the entry is dropped once the transaction commits,
+so a changed or deactivated user is reloaded by the next request of this process. Other processes keep their
+entries until the TTL expires, which is why it is short: a deactivation takes effect everywhere within
+`user_cache_ttl_seconds`.
+"""
+import dataclasses
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from db.models import User
+from settings import get_settings
+
+_CHANGED_USERS_KEY = "user_cache_changed_users"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AuthenticatedUser:
+    """What requests get to know about the user behind the token; the password hash is never cached."""
+    id: uuid.UUID
+    name: str
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(id=user.id, name=user.name, email=user.email, is_active=bool(user.is_active))
+
+
+class UserCache:
+    """Active users keyed by token subject."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._users: TTLCache[str, AuthenticatedUser] = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def get(self, subject: str) -> AuthenticatedUser | None:
+        return self._users.get(subject)
+
+    def set(self, subject: str, user: AuthenticatedUser) -> None:
+        self._users.set(subject, user)
+
+    def invalidate(self, *user_ids: uuid.UUID) -> None:
+        """Drops entries of the given users whatever subject they are cached under."""
+        ids = set(user_ids)
+        for subject, user in self._users.items():
+            if user.id in ids:
+                self._users.pop(subject)
+
+    def clear(self) -> None:
+        self._users.clear()
+
+
+user_cache = UserCache(ttl=get_settings().user_cache_ttl_seconds, maxsize=get_settings().user_cache_maxsize)
+
+
+def mark_user_changed(session: Session, user_id: uuid.UUID) -> None:
+    """Schedules the user's cache entry to be dropped when the session's transaction commits."""
+    session.info.setdefault(_CHANGED_USERS_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_USERS_KEY, None)
+    if changed:
+        user_cache.invalidate(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS_KEY, None)
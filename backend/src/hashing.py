@@ -1,7 +1,17 @@
+import asyncio
+import dataclasses
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
 from passlib.context import CryptContext
 
+from settings import get_settings
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
 
 class Hasher:
     @staticmethod
@@ -11,3 +21,57 @@ class Hasher:
     @staticmethod
     def get_password_hash(password: str) -> str:
         return pwd_context.hash(password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Same as verify_password, but runs in the hashing pool instead of blocking the event loop."""
+        return await hashing_pool.run(Hasher.verify_password, plain_password, hashed_password)
+
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        return await hashing_pool.run(Hasher.get_password_hash, password)
+
+
+@dataclasses.dataclass
+class HashingPoolStats:
+    completed: int = 0
+    waiting: int = 0
+    running: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class HashingPool:
+    """
+    Runs bcrypt in a bounded thread pool (bcrypt releases the GIL, so threads hash in parallel).
+
+    At most `concurrency` calls run at once; the rest wait on a semaphore inside the event loop,
+    and the time they spend there is collected as queue wait.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="password-hashing")
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = HashingPoolStats()
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        queued_at = time.perf_counter()
+        self.stats.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats.waiting -= 1
+        try:
+            wait = time.perf_counter() - queued_at
+            self.stats.total_wait_seconds += wait
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+            self.stats.running += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.stats.running -= 1
+            self.stats.completed += 1
+            self._semaphore.release()
+
+
+hashing_pool = HashingPool(concurrency=get_settings().password_hashing_concurrency)
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from api.services.nomenclature_import import IMPORT_READERS, ImportFileError, NomenclatureImporter
+from constants import ImportFormat
+from db.engine import sessionmanager
+
+
+async def import_nomenclatures(path: Path, import_format: ImportFormat, dry_run: bool) -> bool:
+    with path.open(encoding="utf-8-sig", newline="") as lines:
+        try:
+            report = await NomenclatureImporter(sessionmanager).run(IMPORT_READERS[import_format](lines), dry_run)
+        except ImportFileError as e:
+            print(f"Файл не загружен: {e}")
+            return False
+
+    print(f"Строк в файле: {report.total}")
+    if dry_run:
+        print(f"Прошли проверку: {report.total - len(report.errors)}")
+    else:
+        print(f"Добавлено: {report.inserted}, обновлено: {report.updated}")
+    if report.errors:
+        print(f"\nС ошибками: {len(report.errors)}")
+        for error in report.errors:
+            print(f"  строка {error.line}: {error.message}")
+    if dry_run:
+        print("\nЗапуск без --dry-run запишет проверенные строки.")
+    return not report.errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка номенклатуры из CSV или JSONL.")
+    parser.add_argument("path", type=Path, help="файл для загрузки")
+    parser.add_argument(
+        "--format", choices=[import_format.value for import_format in ImportFormat],
+        help="csv или jsonl; по умолчанию — по расширению файла",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="только проверить строки, ничего не записывая")
+    args = parser.parse_args()
+    try:
+        import_format = ImportFormat(args.format or args.path.suffix.lstrip(".").lower())
+    except ValueError:
+        parser.error("не удалось определить формат по расширению, укажите --format")
+    sys.exit(0 if asyncio.run(import_nomenclatures(args.path, import_format, args.dry_run)) else 1)
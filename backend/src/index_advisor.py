@@ -0,0 +1,242 @@
+"""
+Runs EXPLAIN for the application's hot queries and flags sequential scans on large tables.
+
+Usage:
+    python index_advisor.py                  # explain against the data already in the database
+    python index_advisor.py --seed 5000      # seed 5000 synthetic documents first (rolled back at the end)
+    python index_advisor.py --seed 5000 --analyze
+
+Exit code is 1 when at least one query scans a hot table sequentially, so the script can be used as a CI gate.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+import uuid
+from dataclasses import dataclass, field
+
+from sqlalchemy import select, func, text, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from constants import DocumentTypesEnum, DocumentStatuses
+from db.dals.nomenclature import nomenclature_search_query
+from db.engine import sessionmanager
+from db.models import Document, DocumentLine, DocumentType, Nomenclature, StockBalance, StockMove
+
+HOT_TABLES = {"documents", "document_lines", "stock_moves", "stock_balances", "nomenclatures"}
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw):
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    sql = compiler.process(element.statement, **kw)
+    # EXPLAIN returns a single JSON plan column, not the columns of the explained statement
+    compiler._result_columns = []
+    return f"EXPLAIN ({options}) {sql}"
+
+
+@dataclass
+class KnownQuery:
+    name: str
+    statement: Executable
+    allowed_seq_scans: set[str] = field(default_factory=set)
+
+
+@dataclass
+class Sample:
+    nomenclature_ids: list[uuid.UUID]
+    document_id: uuid.UUID | None
+    receipt_type_id: uuid.UUID | None
+    nomenclature_name: str
+    at: datetime.datetime
+
+
+def known_queries(sample: Sample) -> list[KnownQuery]:
+    nomenclature_id = sample.nomenclature_ids[0] if sample.nomenclature_ids else uuid.uuid4()
+    day_start = sample.at.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = day_start.replace(day=1)
+    return [
+        KnownQuery(
+            "stock balances of recipe materials",
+            select(StockBalance.nomenclature_id, StockBalance.balance)
+            .where(StockBalance.nomenclature_id.in_(sample.nomenclature_ids or [nomenclature_id])),
+        ),
+        KnownQuery(
+            "nomenclature balance at date from moves",
+            select(func.coalesce(func.sum(StockMove.qty), 0))
+            .where(StockMove.nomenclature_id == nomenclature_id)
+            .where(StockMove.document_datetime <= sample.at),
+        ),
+        KnownQuery(
+            "moves of one month by nomenclature",
+            select(StockMove.nomenclature_id, func.sum(StockMove.qty))
+            .where(StockMove.document_datetime >= month_start)
+            .where(StockMove.document_datetime < sample.at)
+            .group_by(StockMove.nomenclature_id),
+        ),
+        KnownQuery(
+            "posted documents of type for a day",
+            select(func.count(Document.id))
+            .where(Document.document_type_id == sample.receipt_type_id)
+            .where(Document.status == DocumentStatuses.Posted)
+            .where(Document.document_datetime >= day_start)
+            .where(Document.document_datetime < day_start + datetime.timedelta(days=1)),
+        ),
+        KnownQuery(
+            "latest posted documents of type",
+            select(Document.id, Document.document_datetime)
+            .where(Document.document_type_id == sample.receipt_type_id)
+            .where(Document.status == DocumentStatuses.Posted)
+            .order_by(desc(Document.document_datetime))
+            .limit(3),
+        ),
+        KnownQuery(
+            "lines of a document",
+            select(DocumentLine.nomenclature_id, DocumentLine.qty)
+            .where(DocumentLine.document_id == (sample.document_id or uuid.uuid4())),
+        ),
+        KnownQuery(
+            "nomenclature typeahead",
+            nomenclature_search_query(sample.nomenclature_name[:6], Nomenclature.id, Nomenclature.name).limit(10),
+        ),
+    ]
+
+
+def find_seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+async def seed(session: AsyncSession, documents: int, lines_per_document: int, nomenclatures: int) -> None:
+    marker = f"index_advisor_{uuid.uuid4().hex[:8]}"
+    ids = {"mu": uuid.uuid4(), "nt": uuid.uuid4(), "ng": uuid.uuid4()}
+    params = {
+        **ids, "marker": marker, "short_name": marker[-8:],
+        "n": nomenclatures, "d": documents, "l": min(lines_per_document, nomenclatures),
+    }
+    statements = [
+        "INSERT INTO measure_units (id, name, short_name) VALUES (:mu, :marker, :short_name)",
+        "INSERT INTO nomenclature_types (id, name) VALUES (:nt, :marker)",
+        "INSERT INTO nomenclature_groups (id, name, parent_id) VALUES (:ng, :marker, NULL)",
+        """
+        INSERT INTO nomenclatures (id, name, description, measure_unit_id, type_id, group_id, properties)
+        SELECT gen_random_uuid(), substr(md5(:marker || i), 1, 12), '', :mu, :nt, :ng, '{}'::jsonb
+          FROM generate_series(1, :n) AS i
+        """,
+        """
+        INSERT INTO documents (id, document_number, status, document_datetime, name, commentary, document_type_id)
+        SELECT gen_random_uuid(), 0,
+               CASE WHEN i % 10 = 0 THEN 'Registered' ELSE 'Posted' END,
+               now() - make_interval(hours => i),
+               NULL, :marker,
+               (SELECT id FROM document_types WHERE name = CASE WHEN i % 3 = 0 THEN 'Shipment' ELSE 'Receipt' END)
+          FROM generate_series(1, :d) AS i
+        """,
+        """
+        WITH noms AS (
+            SELECT id, row_number() OVER (ORDER BY id) - 1 AS k FROM nomenclatures WHERE group_id = :ng
+        ), docs AS (
+            SELECT id, row_number() OVER (ORDER BY id) - 1 AS k FROM documents WHERE commentary = :marker
+        )
+        INSERT INTO document_lines (id, document_id, nomenclature_id, qty)
+        SELECT gen_random_uuid(), docs.id, noms.id, round((random() * 100)::numeric, 4) + 1
+          FROM docs
+         CROSS JOIN generate_series(0, :l - 1) AS j
+          JOIN noms ON noms.k = (docs.k * :l + j) % :n
+        """,
+        """
+        INSERT INTO stock_moves (id, document_line_id, nomenclature_id, qty, document_datetime)
+        SELECT gen_random_uuid(), l.id, l.nomenclature_id, l.qty * t.direction, d.document_datetime
+          FROM document_lines l
+          JOIN documents d ON d.id = l.document_id
+          JOIN document_types t ON t.id = d.document_type_id
+         WHERE d.commentary = :marker AND d.status = 'Posted'
+        """,
+    ]
+    # сидирование больших объёмов дольше statement_timeout API-процесса
+    await session.execute(text("SET LOCAL statement_timeout = 0"))
+    for statement in statements:
+        await session.execute(text(statement), params)
+    # свежие строки лежат в pending list GIN-индексов, который в рабочей базе сбрасывает autovacuum
+    await session.execute(text(
+        "SELECT gin_clean_pending_list(indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_am am ON am.oid = c.relam WHERE am.amname = 'gin' AND i.indrelid = 'nomenclatures'::regclass"
+    ))
+    for table in sorted(HOT_TABLES):
+        await session.execute(text(f"ANALYZE {table}"))
+
+
+async def pick_sample(session: AsyncSession) -> Sample:
+    nomenclature_ids = (await session.execute(
+        select(StockMove.nomenclature_id).group_by(StockMove.nomenclature_id).limit(20)
+    )).scalars().all()
+    document_id = (await session.execute(select(Document.id).limit(1))).scalar()
+    receipt_type_id = (await session.execute(
+        select(DocumentType.id).where(DocumentType.name == DocumentTypesEnum.Receipt)
+    )).scalar()
+    nomenclature_name = (await session.execute(
+        select(Nomenclature.name).order_by(Nomenclature.name).limit(1)
+    )).scalar()
+    return Sample(
+        nomenclature_ids=list(nomenclature_ids),
+        document_id=document_id,
+        receipt_type_id=receipt_type_id,
+        nomenclature_name=nomenclature_name or "nomenclature",
+        at=datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+async def run(seed_documents: int, lines_per_document: int, nomenclatures: int, analyze: bool) -> int:
+    flagged = 0
+    async with sessionmanager.session() as session:
+        await session.begin()
+        try:
+            if seed_documents:
+                await seed(session, seed_documents, lines_per_document, nomenclatures)
+            sample = await pick_sample(session)
+            for query in known_queries(sample):
+                result = await session.execute(Explain(query.statement, analyze=analyze))
+                plan_json = result.scalar()
+                plan = (json.loads(plan_json) if isinstance(plan_json, str) else plan_json)[0]
+                seq_scans = [
+                    table for table in find_seq_scans(plan["Plan"])
+                    if table in HOT_TABLES and table not in query.allowed_seq_scans
+                ]
+                status = "SEQ SCAN" if seq_scans else "ok"
+                timing = f", {plan['Execution Time']:.2f} ms" if analyze else ""
+                print(f"[{status:>8}] {query.name} (cost {plan['Plan']['Total Cost']:.1f}{timing})")
+                for table in seq_scans:
+                    print(f"           sequential scan on {table}")
+                flagged += bool(seq_scans)
+        finally:
+            await session.rollback()
+    await sessionmanager.close()
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN the application's known queries and flag seq scans.")
+    parser.add_argument("--seed", type=int, default=0, help="number of synthetic documents to seed (rolled back)")
+    parser.add_argument("--lines", type=int, default=10, help="lines per seeded document")
+    parser.add_argument("--nomenclatures", type=int, default=1000, help="number of seeded nomenclatures")
+    parser.add_argument("--analyze", action="store_true", help="run EXPLAIN ANALYZE instead of EXPLAIN")
+    args = parser.parse_args()
+    flagged_queries = asyncio.run(run(args.seed, args.lines, args.nomenclatures, args.analyze))
+    if flagged_queries:
+        print(f"\n{flagged_queries} query(ies) use sequential scans on hot tables.")
+    sys.exit(1 if flagged_queries else 0)
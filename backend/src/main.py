@@ -1,22 +1,52 @@
+import contextlib
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, FastAPI
 
 from api.handlers.actions.auth import get_current_user_from_token
+from api.services.jobs import job_runner
+from api.services.live_updates import live_updates
+from db.engine import sessionmanager
 from db.models import User
 from settings import Settings, get_settings
-app = FastAPI(title=get_settings().app_name, version="0.1")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # одно LISTEN-соединение на процесс для живых обновлений (/events)
+    await live_updates.start(sessionmanager)
+    # воркеры фоновых заданий (/jobs) этого процесса
+    await job_runner.start(sessionmanager)
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        await live_updates.stop()
+
+
+app = FastAPI(title=get_settings().app_name, version="0.1", lifespan=lifespan)
 api_router = APIRouter(
     prefix="/api/v1",
     # dependencies = [Depends(get_current_user_from_token)],
 )
 
-from api.handlers import base_recipe_router, document_type_router, recipe_router, login_router, dashboard_router, nomenclature_router
+from api.handlers import (
+    base_recipe_router, document_type_router, recipe_router, login_router, dashboard_router, nomenclature_router,
+    stock_router, document_router, metrics_router, nomenclature_group_router, events_router,
+    job_router, export_router,
+)
 api_router.include_router(base_recipe_router)
 api_router.include_router(document_type_router)
 api_router.include_router(recipe_router)
 api_router.include_router(dashboard_router)
+api_router.include_router(events_router)
+api_router.include_router(job_router)
+api_router.include_router(export_router)
 api_router.include_router(nomenclature_router)
+api_router.include_router(nomenclature_group_router)
+api_router.include_router(stock_router)
+api_router.include_router(document_router)
+api_router.include_router(metrics_router)
 app.include_router(login_router, prefix="/api/v1")
 
 
@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import datetime
+
+from sqlalchemy import text
+
+from db.engine import sessionmanager
+from db.dals import StockDAL
+
+
+async def make_stock_snapshots(until: datetime.date):
+    async with sessionmanager.session() as session:
+        async with session.begin():
+            # пакетная операция по всей истории движений: statement_timeout API-процесса к ней не относится
+            await session.execute(text("SET LOCAL statement_timeout = 0"))
+            built = await StockDAL(session).build_snapshots(until=until)
+
+    if not built:
+        print("Все закрытые месяцы уже имеют снимки остатков.")
+        return
+    print(f"Построено снимков: {len(built)}")
+    for month in built:
+        print(f"  {month:%Y-%m}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Построение месячных снимков остатков stock_snapshots.")
+    parser.add_argument(
+        "--until", type=datetime.date.fromisoformat, default=datetime.datetime.now(datetime.timezone.utc).date(),
+        help="строить снимки месяцев, закрытых до этой даты (YYYY-MM-DD), по умолчанию — сегодня"
+    )
+    args = parser.parse_args()
+    asyncio.run(make_stock_snapshots(args.until))
@@ -11,16 +11,47 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-from db.models import Base, pgcrypto_extension, increment_document_number, set_document_number_trigger_documents, set_document_number_trigger_base_recipes, stock_balance_view, get_stock_balance_function
+from db.models import (
+    Base, pgcrypto_extension, pg_trgm_extension, increment_document_number, set_document_number_trigger_documents,
+    set_document_number_trigger_base_recipes, set_document_number_trigger_recipes, stock_balance_view,
+    get_stock_balance_function, apply_stock_moves_to_balances, stock_moves_insert_balance_trigger,
+    stock_moves_update_balance_trigger, stock_moves_delete_balance_trigger, touch_stock_balances_on_reservations,
+    stock_reservations_insert_trigger, stock_reservations_delete_trigger, apply_documents_to_daily_stats,
+    documents_insert_daily_stats_trigger, documents_update_daily_stats_trigger, remove_document_from_daily_stats,
+    documents_delete_daily_stats_trigger, apply_stock_moves_to_daily_stats, stock_moves_insert_daily_stats_trigger,
+    stock_moves_update_daily_stats_trigger, stock_moves_delete_daily_stats_trigger, notify_live_updates,
+    stock_balances_live_updates_trigger, document_daily_stats_live_updates_trigger,
+)
 target_metadata = Base.metadata
 
 register_entities([
     pgcrypto_extension,
+    pg_trgm_extension,
     increment_document_number,
     set_document_number_trigger_base_recipes,
     set_document_number_trigger_documents,
+    set_document_number_trigger_recipes,
     stock_balance_view,
     get_stock_balance_function,
+    apply_stock_moves_to_balances,
+    stock_moves_insert_balance_trigger,
+    stock_moves_update_balance_trigger,
+    stock_moves_delete_balance_trigger,
+    touch_stock_balances_on_reservations,
+    stock_reservations_insert_trigger,
+    stock_reservations_delete_trigger,
+    apply_documents_to_daily_stats,
+    documents_insert_daily_stats_trigger,
+    documents_update_daily_stats_trigger,
+    remove_document_from_daily_stats,
+    documents_delete_daily_stats_trigger,
+    apply_stock_moves_to_daily_stats,
+    stock_moves_insert_daily_stats_trigger,
+    stock_moves_update_daily_stats_trigger,
+    stock_moves_delete_daily_stats_trigger,
+    notify_live_updates,
+    stock_balances_live_updates_trigger,
+    document_daily_stats_live_updates_trigger,
 ])
 
 def run_migrations_offline() -> None:
@@ -0,0 +1,148 @@
+"""stock balances table
+
+Revision ID: 2ac65411a7b3
+Revises: 14bc1f624a47
+Create Date: 2025-05-12 09:41:17.204513
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from alembic_utils.pg_function import PGFunction
+from sqlalchemy import text as sql_text
+from alembic_utils.pg_trigger import PGTrigger
+from alembic_utils.pg_view import PGView
+
+# revision identifiers, used by Alembic.
+revision: str = '2ac65411a7b3'
+down_revision: Union[str, None] = '14bc1f624a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+APPLY_STOCK_MOVES_TO_BALANCES = (
+    "RETURNS trigger AS\n    $$\n    BEGIN\n"
+    "        -- агрегируем изменения всего оператора по номенклатуре и применяем одной вставкой;\n"
+    "        -- сортировка по nomenclature_id даёт одинаковый порядок блокировок строк остатков\n"
+    "        IF TG_OP = 'INSERT' THEN\n"
+    "            INSERT INTO stock_balances (nomenclature_id, balance)\n"
+    "            SELECT nomenclature_id, SUM(qty)\n              FROM new_moves\n"
+    "             GROUP BY nomenclature_id\n             ORDER BY nomenclature_id\n"
+    "            ON CONFLICT (nomenclature_id)\n"
+    "            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance;\n"
+    "        ELSIF TG_OP = 'DELETE' THEN\n"
+    "            INSERT INTO stock_balances (nomenclature_id, balance)\n"
+    "            SELECT nomenclature_id, -SUM(qty)\n              FROM old_moves\n"
+    "             GROUP BY nomenclature_id\n             ORDER BY nomenclature_id\n"
+    "            ON CONFLICT (nomenclature_id)\n"
+    "            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance;\n"
+    "        ELSE\n"
+    "            INSERT INTO stock_balances (nomenclature_id, balance)\n"
+    "            SELECT nomenclature_id, SUM(qty)\n"
+    "              FROM (\n                    SELECT nomenclature_id, qty FROM new_moves\n"
+    "                    UNION ALL\n                    SELECT nomenclature_id, -qty FROM old_moves\n"
+    "                   ) AS delta\n"
+    "             GROUP BY nomenclature_id\n             ORDER BY nomenclature_id\n"
+    "            ON CONFLICT (nomenclature_id)\n"
+    "            DO UPDATE SET balance = stock_balances.balance + EXCLUDED.balance;\n"
+    "        END IF;\n\n        RETURN NULL;\n    END;\n    $$ LANGUAGE plpgsql"
+)
+
+
+def _balance_triggers() -> list[PGTrigger]:
+    return [
+        PGTrigger(
+            schema="public",
+            signature="apply_stock_moves_insert",
+            on_entity="public.stock_moves",
+            is_constraint=False,
+            definition='AFTER INSERT ON stock_moves\n    REFERENCING NEW TABLE AS new_moves\n    FOR EACH STATEMENT\n    EXECUTE FUNCTION apply_stock_moves_to_balances()'
+        ),
+        PGTrigger(
+            schema="public",
+            signature="apply_stock_moves_update",
+            on_entity="public.stock_moves",
+            is_constraint=False,
+            definition='AFTER UPDATE ON stock_moves\n    REFERENCING OLD TABLE AS old_moves NEW TABLE AS new_moves\n    FOR EACH STATEMENT\n    EXECUTE FUNCTION apply_stock_moves_to_balances()'
+        ),
+        PGTrigger(
+            schema="public",
+            signature="apply_stock_moves_delete",
+            on_entity="public.stock_moves",
+            is_constraint=False,
+            definition='AFTER DELETE ON stock_moves\n    REFERENCING OLD TABLE AS old_moves\n    FOR EACH STATEMENT\n    EXECUTE FUNCTION apply_stock_moves_to_balances()'
+        ),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('stock_balances',
+    sa.Column('nomenclature_id', sa.UUID(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=18, scale=4), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['nomenclature_id'], ['nomenclatures.id'], name=op.f('fk_stock_balances_nomenclature_id_nomenclatures'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('nomenclature_id', name=op.f('pk_stock_balances'))
+    )
+    op.execute(sql_text(
+        "INSERT INTO stock_balances (nomenclature_id, balance) "
+        "SELECT nomenclature_id, SUM(qty) FROM stock_moves GROUP BY nomenclature_id"
+    ))
+
+    public_apply_stock_moves_to_balances = PGFunction(
+        schema="public",
+        signature="apply_stock_moves_to_balances()",
+        definition=APPLY_STOCK_MOVES_TO_BALANCES
+    )
+    op.create_entity(public_apply_stock_moves_to_balances)
+
+    for trigger in _balance_triggers():
+        op.create_entity(trigger)
+
+    public_stock_balance = PGView(
+        schema="public",
+        signature="stock_balance",
+        definition='SELECT b.nomenclature_id, n.type_id AS item_type_id, b.balance\n    FROM stock_balances b\n    JOIN nomenclatures n ON n.id = b.nomenclature_id'
+    )
+    op.replace_entity(public_stock_balance)
+
+    public_get_stock_balance = PGFunction(
+        schema="public",
+        signature="get_stock_balance(p_nomenclature_id uuid)",
+        definition='RETURNS numeric AS $$\n    SELECT COALESCE(\n        (SELECT balance FROM stock_balances WHERE nomenclature_id = p_nomenclature_id),\n        0\n    );\n    $$ LANGUAGE SQL STABLE'
+    )
+    op.replace_entity(public_get_stock_balance)
+
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    public_get_stock_balance = PGFunction(
+        schema="public",
+        signature="get_stock_balance(p_nomenclature_id uuid)",
+        definition='RETURNS numeric AS $$\n    SELECT COALESCE(SUM(qty), 0)\n      FROM stock_moves\n     WHERE nomenclature_id = p_nomenclature_id;\n    $$ LANGUAGE SQL STABLE'
+    )
+    op.replace_entity(public_get_stock_balance)
+
+    public_stock_balance = PGView(
+        schema="public",
+        signature="stock_balance",
+        definition='SELECT m.nomenclature_id, n.type_id AS item_type_id, SUM(m.qty) AS balance\n    FROM stock_moves m\n    JOIN nomenclatures n ON n.id = m.nomenclature_id\n    GROUP BY m.nomenclature_id, n.type_id'
+    )
+    op.replace_entity(public_stock_balance)
+
+    for trigger in reversed(_balance_triggers()):
+        op.drop_entity(trigger)
+
+    public_apply_stock_moves_to_balances = PGFunction(
+        schema="public",
+        signature="apply_stock_moves_to_balances()",
+        definition=APPLY_STOCK_MOVES_TO_BALANCES
+    )
+    op.drop_entity(public_apply_stock_moves_to_balances)
+
+    op.drop_table('stock_balances')
+    # ### end Alembic commands ###
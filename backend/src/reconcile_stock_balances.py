@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from db.engine import sessionmanager
+from db.dals import StockDAL
+
+
+async def reconcile_stock_balances(dry_run: bool):
+    async with sessionmanager.session() as session:
+        async with session.begin():
+            # пакетная операция по всей истории движений: statement_timeout API-процесса к ней не относится
+            await session.execute(text("SET LOCAL statement_timeout = 0"))
+            stock_dal = StockDAL(session)
+            if dry_run:
+                drift = await stock_dal.get_balance_drift()
+            else:
+                drift = await stock_dal.rebuild_balances()
+
+    if not drift:
+        print("Остатки совпадают с движениями, расхождений нет.")
+        return
+
+    print(f"Найдено расхождений: {len(drift)}")
+    for row in drift:
+        print(f"  {row.nomenclature_id}: сохранено {row.stored}, по движениям {row.expected}")
+    if dry_run:
+        print("\nЗапуск без --dry-run пересчитает таблицу stock_balances.")
+    else:
+        print("\nТаблица stock_balances пересчитана.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка stock_balances с историей stock_moves.")
+    parser.add_argument("--dry-run", action="store_true", help="только показать расхождения")
+    args = parser.parse_args()
+    asyncio.run(reconcile_stock_balances(args.dry_run))
@@ -5,9 +5,46 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     """Class that retrieves settings from dotenv file."""
     app_name: str = 'Paints ERP'
-    echo_sql: bool = True
+    echo_sql: bool = False
     test: bool = False
     access_token_expire_minutes: int
+    reference_cache_ttl_seconds: float = 300
+    # кеш пользователей сбрасывается при изменении только в своём процессе: в остальных отключение учётной записи
+    # вступает в силу не позже чем через этот интервал
+    user_cache_ttl_seconds: float = 10
+    user_cache_maxsize: int = 1024
+    password_hashing_concurrency: int = 4
+    compiled_rules_cache_ttl_seconds: float = 600
+    compiled_rules_cache_maxsize: int = 256
+    # индекс доступности обновляется по изменившимся остаткам, а целиком перестраивается не реже этого интервала
+    stock_availability_full_rebuild_seconds: float = 600
+    # пул соединений одного процесса: db_pool_size + db_max_overflow на воркер должны укладываться в max_connections
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    db_pool_timeout_seconds: float = 10
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 30000
+    # живые обновления (/events): изменения за это время отправляются одним пересчётом
+    live_updates_debounce_seconds: float = 0.5
+    live_updates_queue_size: int = 100
+    live_updates_keepalive_seconds: float = 15
+    # потерянное LISTEN-соединение переоткрывается с паузой, удваивающейся после каждой неудачи до максимума
+    live_updates_reconnect_seconds: float = 1
+    live_updates_reconnect_max_seconds: float = 30
+    # фоновые задания (/jobs): воркеры процесса берут соединения из того же пула, что и запросы
+    jobs_workers: int = 2
+    # другие процессы узнают о новом задании опросом очереди, свой процесс будит воркеры сразу
+    jobs_poll_interval_seconds: float = 1
+    jobs_heartbeat_seconds: float = 5
+    # running-задание без heartbeat дольше этого считается оставшимся от упавшего процесса
+    jobs_stale_seconds: float = 60
+    # строк выгрузки (/export) на одну выборку из серверного курсора: память выгрузки не зависит от её размера
+    export_batch_size: int = 1000
+    # строк массового импорта номенклатуры на одну транзакцию
+    nomenclature_import_batch_size: int = 1000
+    # порог триграммного сходства нечёткого поиска номенклатуры (0..1, меньше — терпимее к опечаткам)
+    nomenclature_search_threshold: float = 0.4
 
     model_config = SettingsConfigDict(env_file=('.env', '../.env', ), extra='allow')
 
@@ -0,0 +1,84 @@
+import asyncio
+import dataclasses
+import uuid
+
+import pytest
+from sqlalchemy import insert, update
+
+from db.dals import UserDAL
+from db.models import User
+from db.user_cache import user_cache
+from hashing import Hasher
+from security import create_access_token
+
+PASSWORD = 'secret'
+
+
+@pytest.fixture
+async def user(db_session):
+    user_id = uuid.uuid4()
+    values = dict(
+        id=user_id, name='Auth', email=f'{user_id.hex}@example.com',
+        hashed_password=await Hasher.get_password_hash_async(PASSWORD),
+    )
+    async with db_session.begin():
+        await db_session.execute(insert(User).values(values))
+    return User(**values)
+
+
+class TestAuthHandlers:
+    async def test_user_cached_until_updated(self, client, db_session, user):
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": user.email})}'}
+        user_cache.clear()
+
+        response = await client.get('/api/v1/ping', headers=headers)
+        assert response.status_code == 200
+        cached = user_cache.get(user.email)
+        assert cached.id == user.id
+        # в кеше — неизменяемый снимок без хеша пароля, общий для параллельных запросов
+        assert not hasattr(cached, 'hashed_password')
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            cached.is_active = False
+
+        response = await client.get('/api/v1/ping', headers=headers)
+        assert response.status_code == 200
+
+        async with db_session.begin():
+            await UserDAL(db_session).update_user(user.id, is_active=False)
+        assert user_cache.get(user.email) is None
+
+        response = await client.get('/api/v1/ping', headers=headers)
+        assert response.status_code == 401
+
+    async def test_user_deactivated_elsewhere_expires_with_ttl(self, client, open_session, user, monkeypatch):
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": user.email})}'}
+        monkeypatch.setattr(user_cache._users, 'ttl', 0.1)
+        user_cache.clear()
+        response = await client.get('/api/v1/ping', headers=headers)
+        assert response.status_code == 200
+
+        # другой процесс отключил пользователя: наш кеш об этом не знает и держит запись до конца TTL
+        async with open_session() as session:
+            await session.execute(update(User).where(User.id == user.id).values(is_active=False))
+            await session.commit()
+        assert (await client.get('/api/v1/ping', headers=headers)).status_code == 200
+        await asyncio.sleep(0.15)
+        assert (await client.get('/api/v1/ping', headers=headers)).status_code == 401
+
+    async def test_invalid_token(self, client):
+        response = await client.get('/api/v1/ping', headers={'Authorization': 'Bearer not-a-token'})
+        assert response.status_code == 401
+
+    async def test_login_hashes_in_pool(self, client, user):
+        completed = (await client.get('/api/v1/metrics/password-hashing')).json()['completed']
+
+        response = await client.post('/api/v1/login', data={'username': user.email, 'password': PASSWORD})
+        assert response.status_code == 200
+        assert response.json()['access_token']
+
+        response = await client.post('/api/v1/login', data={'username': user.email, 'password': 'wrong'})
+        assert response.status_code == 401
+
+        metrics = (await client.get('/api/v1/metrics/password-hashing')).json()
+        assert metrics['completed'] == completed + 2
+        assert metrics['waiting'] == metrics['running'] == 0
@@ -2,16 +2,22 @@ from copy import deepcopy
 
 from constants import RULES_EXAMPLE
 
+import datetime
 import uuid
 import json
+from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
+from sqlalchemy import insert, select, text
+
+from api.services.compiled_rules import compile_rules, compiled_rules_cache
+from db.models import BaseRecipe, DocumentType
 
 
 class TestBaseRecipeHandlers:
     async def test_get_all_recipes_none(self, client: AsyncClient):
         response = await client.get("/api/v1/document/base-recipes/")
         assert response.status_code == 200
-        assert response.json() == []
+        assert response.json() == {'base_recipes': [], 'next_cursor': None}
 
     async def test_create_base_recipe_success_posted(self, client: AsyncClient):
         type_name = 'Base Recipe'
@@ -398,7 +404,7 @@ class TestBaseRecipeHandlers:
     async def test_get_all_recipes(self, client: AsyncClient):
         response = await client.get("/api/v1/document/base-recipes/")
         assert response.status_code == 200
-        assert len(response.json()) == 8
+        assert len(response.json()['base_recipes']) == 8
 
     async def test_update_base_recipe_not_exist(self, client: AsyncClient):
         rules = deepcopy(RULES_EXAMPLE)
@@ -595,7 +601,7 @@ class TestBaseRecipeHandlers:
         assert del_response.json()['name'] == "ГФ-021"
         assert del_response.json()['document_datetime'] == '2025-04-19T13:20:10Z'
 
-    async def test_create_base_recipe_validate_ids(self, client: AsyncClient):
+    async def test_create_base_recipe_validate_ids(self, client: AsyncClient, db_session):
         base_body = {
             "document_datetime": "2025-04-19 17:00:00",
             "commentary": "Тестовая проверка с несуществующим UUID",
@@ -639,15 +645,142 @@ class TestBaseRecipeHandlers:
         assert "nomenclature id(s) not found:" in response.text.lower()
 
         rules = deepcopy(RULES_EXAMPLE)
-        rules["pigment_part"][0]["materials"][0]["nomenclature_group_id"] = uuid.uuid4()
+        missing_group_id = uuid.uuid4()
+        rules["pigment_part"][0]["materials"][0]["nomenclature_group_id"] = missing_group_id
         body = {**base_body, "rules": rules}
         response = await client.post("/api/v1/document/base-recipe/", content=json.dumps(body, default=str))
         assert response.status_code == 422
-        assert response.json() == {'detail': 'There is no group "Пигменты" in pigment part.'}
+        assert response.json() == {'detail': f'NomenclatureGroup id(s) not found: {missing_group_id}\n'
+                                             'There is no group "Пигменты" in pigment part (color 1).'}
 
         rules = deepcopy(RULES_EXAMPLE)
-        rules["pigment_part"][1]["materials"][1]["nomenclature_group_id"] = uuid.uuid4()
+        rules["pigment_part"][1]["materials"][1]["nomenclature_group_id"] = missing_group_id
+        body = {**base_body, "rules": rules}
+        response = await client.post("/api/v1/document/base-recipe/", content=json.dumps(body, default=str))
+        assert response.status_code == 422
+        assert 'There is no group "Наполнители" in pigment part (color 2).' in response.json()['detail']
+
+        # подгруппа пигментов не заменяет саму группу: генерация её блок не читает
+        subgroup_id = uuid.uuid4()
+        async with db_session.begin():
+            await db_session.execute(text(
+                "INSERT INTO nomenclature_groups (id, name, parent_id) VALUES (:id, 'Органические пигменты', :parent_id)"
+            ), {'id': subgroup_id, 'parent_id': rules["pigment_part"][0]["materials"][0]["nomenclature_group_id"]})
+        rules = deepcopy(RULES_EXAMPLE)
+        rules["pigment_part"][0]["materials"][0]["nomenclature_group_id"] = subgroup_id
+        body = {**base_body, "rules": rules}
+        response = await client.post("/api/v1/document/base-recipe/", content=json.dumps(body, default=str))
+        assert response.status_code == 422
+        assert response.json() == {'detail': 'There is no group "Пигменты" in pigment part (color 1).'}
+
+        rules = deepcopy(RULES_EXAMPLE)
+        rules["film_former_part"]["materials"][0]["uuids"][0] = uuid.uuid4()
+        for colored in rules["pigment_part"]:
+            colored["materials"][0]["nomenclature_group_id"] = missing_group_id
+        body = {**base_body, "rules": rules}
+        response = await client.post("/api/v1/document/base-recipe/", content=json.dumps(body, default=str))
+        assert response.status_code == 422
+        errors = response.json()['detail'].split('\n')
+        assert errors[0].startswith('Nomenclature id(s) not found:')
+        assert len(errors) == 2 + len(rules["pigment_part"])
+
+        # группа создана мимо сессий приложения, как в другом процессе: кеш о ней не знает, проверка перечитывает дерево
+        new_group_id = uuid.uuid4()
+        async with db_session.begin():
+            await db_session.execute(
+                text("INSERT INTO nomenclature_groups (id, name) VALUES (:id, 'Добавки новые')"), {'id': new_group_id}
+            )
+        rules = deepcopy(RULES_EXAMPLE)
+        rules["additives_part"]["materials"][2]["nomenclature_group_id"] = new_group_id
         body = {**base_body, "rules": rules}
         response = await client.post("/api/v1/document/base-recipe/", content=json.dumps(body, default=str))
+        assert "NomenclatureGroup id(s) not found" not in response.text
+
+    async def test_get_all_recipes_paginated(self, client: AsyncClient, db_session):
+        async with db_session.begin():
+            type_id = (await db_session.execute(
+                select(DocumentType.id).where(DocumentType.name == 'Base Recipe')
+            )).scalar_one_or_none()
+            if type_id is None:
+                type_id = uuid.uuid4()
+                await db_session.execute(insert(DocumentType).values(id=type_id, name='Base Recipe', direction=0))
+            await db_session.execute(insert(BaseRecipe).values([
+                {
+                    'document_datetime': datetime.datetime(2031, 1, day, 10, tzinfo=datetime.timezone.utc),
+                    'name': f'Пагинация {day}',
+                    'status': 'Registered', 'commentary': '', 'rules': {}, 'document_type_id': type_id,
+                }
+                for day in range(1, 6)
+            ]))
+
+        params = {'limit': 2, 'date_from': '2031-01-01T00:00:00Z', 'date_to': '2031-02-01T00:00:00Z'}
+        names, cursor = [], None
+        while True:
+            response = await client.get("/api/v1/document/base-recipes/", params={**params, 'cursor': cursor or ''})
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page['base_recipes']) <= 2
+            names += [base_recipe['name'] for base_recipe in page['base_recipes']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert names == [f'Пагинация {day}' for day in range(1, 6)]
+
+        response = await client.get("/api/v1/document/base-recipes/", params={**params, 'status': 'Posted'})
+        assert response.json()['base_recipes'] == []
+
+        response = await client.get("/api/v1/document/base-recipes/", params={'cursor': 'not-a-cursor'})
+        assert response.status_code == 422
+
+        response = await client.get("/api/v1/document/base-recipes/", params={'limit': 501})
+        assert response.status_code == 422
+
+    async def test_update_base_recipe_recompiles_rules(self, client: AsyncClient, db_session):
+        base_recipe_id = uuid.uuid4()
+        async with db_session.begin():
+            type_id = (await db_session.execute(
+                select(DocumentType.id).where(DocumentType.name == 'Base Recipe')
+            )).scalar_one_or_none()
+            if type_id is None:
+                type_id = uuid.uuid4()
+                await db_session.execute(insert(DocumentType).values(id=type_id, name='Base Recipe', direction=0))
+            await db_session.execute(insert(BaseRecipe).values(
+                id=base_recipe_id, document_datetime=datetime.datetime(2025, 4, 19, tzinfo=datetime.timezone.utc),
+                name='ПФ-115', status='Posted', commentary='', rules=jsonable_encoder(RULES_EXAMPLE),
+                document_type_id=type_id,
+            ))
+
+        async with db_session.begin():
+            compiled = await compiled_rules_cache.get(db_session, base_recipe_id, 1)
+            assert await compiled_rules_cache.get(db_session, base_recipe_id, 1) is compiled
+        white = compiled.color('БЕЛЫЙ')
+        assert white.color == 'Белый'
+        assert set(RULES_EXAMPLE['film_former_part']['materials'][0]['uuids']) <= white.uuids
+
+        new_rules = deepcopy(RULES_EXAMPLE)
+        new_rules['pigment_part'][0]['color'] = 'Красно-коричневый'
+        response = await client.patch(
+            f"/api/v1/document/base-recipe/?base_recipe_id={base_recipe_id}",
+            content=json.dumps({'rules': new_rules}, default=str),
+        )
+        assert response.status_code == 200
+
+        async with db_session.begin():
+            version = (await db_session.execute(
+                select(BaseRecipe.version).where(BaseRecipe.id == base_recipe_id)
+            )).scalar_one()
+            recompiled = await compiled_rules_cache.get(db_session, base_recipe_id, version)
+        assert version == 2
+        assert recompiled is not compiled
+        assert recompiled.color('белый') is None
+        assert recompiled.color('красно-коричневый') is not None
+
+        new_rules['pigment_part'][1]['color'] = 'КРАСНО-коричневый'
+        response = await client.patch(
+            f"/api/v1/document/base-recipe/?base_recipe_id={base_recipe_id}",
+            content=json.dumps({'rules': new_rules}, default=str),
+        )
         assert response.status_code == 422
-        assert response.json() == {'detail': 'There is no group "Наполнители" in pigment part.'}
+        assert "Color 'КРАСНО-коричневый' is duplicated" in response.text
+        # правила, сохранённые до проверки без учёта регистра, компилируются с первым из совпадающих цветов
+        assert compile_rules(jsonable_encoder(new_rules)).color('красно-коричневый').color == 'Красно-коричневый'
@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+import json
+import uuid
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from constants import DocumentTypes, _NOM_IDS
+from db.models import Document, DocumentType
+
+LAK_ID = _NOM_IDS['Лак ПФ-060']
+CALCITE_ID = _NOM_IDS['Кальцид LinCarb-2xk']
+PAINT_ID = _NOM_IDS['Эмаль ПФ-115']
+
+
+@pytest.fixture
+async def document_types(db_session):
+    async with db_session.begin():
+        if not (await db_session.execute(select(DocumentType.id))).first():
+            await db_session.execute(insert(DocumentType).values([{'id': uuid.uuid4(), **dt} for dt in DocumentTypes]))
+
+
+async def post_document(
+        client, document_type: str, lines: list[tuple[uuid.UUID, str]], moment: datetime.datetime,
+        status: str = 'Posted',
+) -> dict:
+    response = await client.post('/api/v1/document/stock/', json={
+        'document_type': document_type,
+        'status': status,
+        'document_datetime': moment.isoformat(),
+        'lines': [{'nomenclature_id': str(nom_id), 'qty': qty} for nom_id, qty in lines],
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.usefixtures('document_types')
+class TestDashboardHandlers:
+    async def test_dashboard_from_daily_rollup(self, client, db_session):
+        now = datetime.datetime.now(datetime.timezone.utc).replace(hour=12)
+        old = await post_document(client, 'Receipt', [(LAK_ID, '1')], now - datetime.timedelta(days=40))
+        first = await post_document(client, 'Receipt', [(LAK_ID, '10'), (CALCITE_ID, '5')], now)
+        second = await post_document(client, 'Receipt', [(CALCITE_ID, '2.5')], now + datetime.timedelta(minutes=1))
+        await post_document(client, 'Receipt', [(LAK_ID, '100')], now, status='Registered')
+        shipment = await post_document(client, 'Shipment', [(LAK_ID, '3')], now)
+        await post_document(client, 'ProductionReport', [(PAINT_ID, '7')], now)
+
+        response = await client.get('/api/v1/dashboard', params={'day': now.date().isoformat(), 'latest': 2})
+        assert response.status_code == 200
+        result = response.json()
+        assert result['operations_today'] == 4
+        assert float(result['production_today']) == 7
+        assert result['total_nomenclatures'] > 0
+        by_type = {row['document_type']: row for row in result['by_document_type']}
+        assert set(by_type) == {'Receipt', 'Shipment', 'ProductionReport'}
+        assert (by_type['Receipt']['documents'], by_type['Receipt']['lines']) == (2, 3)
+        assert float(by_type['Receipt']['qty']) == 17.5
+        assert float(by_type['Shipment']['qty']) == 3
+        assert [d['id'] for d in result['latest_receipts']] == [second['id'], first['id']]
+        assert [d['number_of_nomenclatures'] for d in result['latest_receipts']] == [1, 2]
+        assert [d['id'] for d in result['latest_shipments']] == [shipment['id']]
+
+        response = await client.get('/api/v1/dashboard', params={'latest': 10})
+        assert [d['id'] for d in response.json()['latest_receipts']] == [second['id'], first['id'], old['id']]
+
+        # удаление проведённого документа вычитает его вместе с движениями
+        async with db_session.begin():
+            await db_session.execute(delete(Document).where(Document.id == uuid.UUID(first['id'])))
+        response = await client.get('/api/v1/dashboard', params={'day': now.date().isoformat()})
+        receipts = next(row for row in response.json()['by_document_type'] if row['document_type'] == 'Receipt')
+        assert (receipts['documents'], receipts['lines'], float(receipts['qty'])) == (1, 1, 2.5)
+
+    async def test_live_updates_pushed_on_posting(self, client, live_updates_hub):
+        queue = live_updates_hub.subscribe()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await post_document(client, 'Receipt', [(LAK_ID, '4')], now)
+
+        events = {}
+        while set(events) != {'stock', 'dashboard'}:
+            event = await asyncio.wait_for(queue.get(), timeout=5)
+            assert event.encode().startswith(f'event: {event.event}\ndata: '.encode())
+            events[event.event] = json.loads(event.data)
+        assert [change['nomenclature_id'] for change in events['stock']] == [str(LAK_ID)]
+        assert events['dashboard']['operations_today'] >= 1
+        assert live_updates_hub.dashboard is not None
+
+    async def test_live_updates_reconnect(self, client, db_session, live_updates_hub, monkeypatch):
+        queue = live_updates_hub.subscribe()
+        sessionmanager = live_updates_hub._sessionmanager
+        reconnect_allowed = asyncio.Event()
+        connect = sessionmanager.dedicated_connection
+
+        async def delayed_connect():
+            await reconnect_allowed.wait()
+            return await connect()
+
+        monkeypatch.setattr(sessionmanager, 'dedicated_connection', delayed_connect)
+        lost = live_updates_hub._connection
+        async with db_session.begin():
+            await db_session.execute(select(func.pg_terminate_backend(lost.get_server_pid())))
+        # уведомление о проведении уходит, пока слушать некому
+        await post_document(client, 'Receipt', [(CALCITE_ID, '3')], datetime.datetime.now(datetime.timezone.utc))
+        assert queue.empty()
+
+        reconnect_allowed.set()
+        events = {}
+        while set(events) != {'stock', 'dashboard'}:
+            event = await asyncio.wait_for(queue.get(), timeout=5)
+            events[event.event] = json.loads(event.data)
+        assert str(CALCITE_ID) in [change['nomenclature_id'] for change in events['stock']]
+        assert live_updates_hub._connection is not None and live_updates_hub._connection is not lost
+
+        # сводка прошлого дня не отдаётся новым подписчикам
+        assert live_updates_hub.dashboard is not None
+        live_updates_hub._dashboard_day -= datetime.timedelta(days=1)
+        assert live_updates_hub.dashboard is None
@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy import insert, select
+
+from constants import DocumentNumberingModes, DocumentStatuses, DocumentTypes, _NOM_IDS
+from db.dals import DocumentTypeDAL
+from db.models import BaseRecipe, DocumentType, Recipe
+
+LAK_ID = _NOM_IDS['Лак ПФ-060']
+CALCITE_ID = _NOM_IDS['Кальцид LinCarb-2xk']
+
+
+@pytest.fixture
+async def document_types(db_session):
+    async with db_session.begin():
+        if not (await db_session.execute(select(DocumentType.id))).first():
+            await db_session.execute(insert(DocumentType).values([{'id': uuid.uuid4(), **dt} for dt in DocumentTypes]))
+
+
+def document_body(document_type: str, lines: list[tuple[uuid.UUID, str]], status: str = 'Posted') -> dict:
+    return {
+        'document_type': document_type,
+        'status': status,
+        'document_datetime': '2025-05-14T10:00:00Z',
+        'lines': [{'nomenclature_id': str(nom_id), 'qty': qty} for nom_id, qty in lines],
+    }
+
+
+async def get_balance(client, nomenclature_id: uuid.UUID) -> float:
+    response = await client.get('/api/v1/stock/balance', params={'nomenclature_id': str(nomenclature_id)})
+    assert response.status_code == 200
+    return float(response.json()['balances'][0]['balance'])
+
+
+@pytest.mark.usefixtures('document_types')
+class TestDocumentHandlers:
+    async def test_post_receipt_and_shipment(self, client):
+        response = await client.post(
+            '/api/v1/document/stock/', json=document_body('Receipt', [(LAK_ID, '100.5'), (CALCITE_ID, '20')])
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result['document_number'] == 1
+        assert result['lines_count'] == 2
+        assert result['name']
+
+        response = await client.post('/api/v1/document/stock/', json=document_body('Shipment', [(LAK_ID, '30')]))
+        assert response.status_code == 200
+        assert response.json()['document_number'] == 1
+
+        assert await get_balance(client, LAK_ID) == 70.5
+        assert await get_balance(client, CALCITE_ID) == 20
+
+    async def test_registered_document_does_not_move_stock(self, client):
+        before = await get_balance(client, LAK_ID)
+        response = await client.post(
+            '/api/v1/document/stock/', json=document_body('Receipt', [(LAK_ID, '10')], status='Registered')
+        )
+        assert response.status_code == 200
+        assert await get_balance(client, LAK_ID) == before
+
+    async def test_all_invalid_lines_reported(self, client):
+        unknown = [uuid.uuid4(), uuid.uuid4()]
+        response = await client.post(
+            '/api/v1/document/stock/', json=document_body('Receipt', [(LAK_ID, '1')] + [(u, '1') for u in unknown])
+        )
+        assert response.status_code == 422
+        assert all(str(u) in response.json()['detail'] for u in unknown)
+
+        # ошибки типа документа и строк приходят вместе
+        response = await client.post(
+            '/api/v1/document/stock/', json=document_body('Base Recipe', [(unknown[0], '1')])
+        )
+        assert response.status_code == 422
+        assert response.json()['detail'].split('\n') == [
+            'Document type Base Recipe does not move stock.', f'Nomenclature id(s) not found: {unknown[0]}'
+        ]
+
+    async def test_repeated_nomenclature_lines_merged(self, client):
+        before = await get_balance(client, LAK_ID)
+        response = await client.post(
+            '/api/v1/document/stock/',
+            json=document_body('Receipt', [(LAK_ID, '1'), (CALCITE_ID, '5'), (LAK_ID, '2.5')]),
+        )
+        assert response.status_code == 200
+        assert response.json()['lines_count'] == 2
+        assert await get_balance(client, LAK_ID) == before + 3.5
+
+    async def test_invalid_document(self, client):
+        response = await client.post('/api/v1/document/stock/', json=document_body('Base Recipe', [(LAK_ID, '1')]))
+        assert response.status_code == 422
+
+        response = await client.post('/api/v1/document/stock/', json=document_body('Receipt', [(LAK_ID, '-1')]))
+        assert response.status_code == 422
+
+        response = await client.post('/api/v1/document/stock/', json=document_body('Receipt', []))
+        assert response.status_code == 422
+
+    async def test_sequence_numbering_continues_counter(self, client, db_session):
+        async def post_receipt() -> int:
+            response = await client.post('/api/v1/document/stock/', json=document_body('Receipt', [(LAK_ID, '1')]))
+            assert response.status_code == 200
+            return response.json()['document_number']
+
+        async with db_session.begin():
+            type_id = await db_session.scalar(select(DocumentType.id).where(DocumentType.name == 'Receipt'))
+
+        async def set_mode(mode: DocumentNumberingModes) -> None:
+            response = await client.patch(f'/api/v1/document-types/{type_id}', json={'numbering_mode': mode.value})
+            assert response.status_code == 200
+            assert response.json()['numbering_mode'] == mode.value
+
+        gapless_number = await post_receipt()
+
+        await set_mode(DocumentNumberingModes.sequence)
+        assert [await post_receipt(), await post_receipt()] == [gapless_number + 1, gapless_number + 2]
+
+        await set_mode(DocumentNumberingModes.gapless)
+        assert await post_receipt() == gapless_number + 3
+
+        response = await client.patch(f'/api/v1/document-types/{uuid.uuid4()}', json={'numbering_mode': 'gapless'})
+        assert response.status_code == 404
+        response = await client.patch(f'/api/v1/document-types/{type_id}', json={'numbering_mode': 'random'})
+        assert response.status_code == 422
+
+    async def test_numbering_mode_switch_serializes_recipe_inserts(self, db_session, open_session):
+        async with db_session.begin():
+            type_ids = dict((await db_session.execute(select(DocumentType.name, DocumentType.id))).all())
+            moment = datetime.datetime(2025, 5, 20, tzinfo=datetime.timezone.utc)
+            base_recipe_id = await db_session.scalar(insert(BaseRecipe).values(
+                status=DocumentStatuses.Registered, document_datetime=moment, rules={},
+                document_type_id=type_ids['Base Recipe'],
+            ).returning(BaseRecipe.id))
+        recipe_type_id = type_ids['Recipe']
+
+        async def insert_recipe(session) -> int:
+            return await session.scalar(insert(Recipe).values(
+                status=DocumentStatuses.Posted, document_datetime=moment, document_type_id=recipe_type_id,
+                base_recipe_id=base_recipe_id, nomenclature_id=LAK_ID, batch_amount=1,
+            ).returning(Recipe.document_number))
+
+        async def set_mode(session, mode: DocumentNumberingModes) -> None:
+            await DocumentTypeDAL(session).set_numbering_mode(recipe_type_id, mode)
+
+        async with db_session.begin():
+            await set_mode(db_session, DocumentNumberingModes.sequence)
+            first = await insert_recipe(db_session)
+
+        # рецепт получил номер из последовательности, но не закоммичен: переключение ждёт его коммита
+        async with open_session() as inserting, open_session() as switching:
+            await inserting.begin()
+            second = await insert_recipe(inserting)
+            await switching.begin()
+            switch = asyncio.create_task(set_mode(switching, DocumentNumberingModes.gapless))
+            await asyncio.sleep(0.3)
+            assert not switch.done()
+            await inserting.commit()
+            await asyncio.wait_for(switch, 5)
+
+            # режим переключается, но ещё не закоммичен: вставка ждёт и нумерует уже по счётчику
+            insert_task = asyncio.create_task(insert_recipe(inserting))
+            await asyncio.sleep(0.3)
+            assert not insert_task.done()
+            await switching.commit()
+            third = await asyncio.wait_for(insert_task, 5)
+            await inserting.commit()
+
+        async with db_session.begin():
+            fourth = await insert_recipe(db_session)
+        assert [first, second, third, fourth] == [first, first + 1, first + 2, first + 3]
@@ -1,4 +1,10 @@
 import json
+import uuid
+
+from sqlalchemy import insert
+
+from constants import DocumentTypes
+from db.models import DocumentType
 
 
 class TestDocumentTypeHandlers:
@@ -11,3 +17,12 @@ class TestDocumentTypeHandlers:
         response = await client.get('/api/v1/document-types/')
         assert response.status_code == 200
         assert response.json() == []
+
+    async def test_cached_document_types_invalidated_on_commit(self, client, db_session):
+        # предыдущие тесты уже закешировали пустой список
+        async with db_session.begin():
+            await db_session.execute(insert(DocumentType).values([{'id': uuid.uuid4(), **dt} for dt in DocumentTypes]))
+
+        response = await client.get('/api/v1/document-types/')
+        assert response.status_code == 200
+        assert sorted(dt['name'] for dt in response.json()) == sorted(dt['name'] for dt in DocumentTypes)
@@ -0,0 +1,99 @@
+import codecs
+import csv
+import datetime
+import io
+import uuid
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+from sqlalchemy import insert, select
+
+from constants import DocumentTypes, NOMENCLATURES, _NOM_IDS
+from db.models import DocumentType
+from settings import get_settings
+
+LAK_ID = _NOM_IDS['Лак ПФ-060']
+XLSX_NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+@pytest.fixture
+async def document_types(db_session):
+    async with db_session.begin():
+        if not (await db_session.execute(select(DocumentType.id))).first():
+            await db_session.execute(insert(DocumentType).values([{'id': uuid.uuid4(), **dt} for dt in DocumentTypes]))
+
+
+def read_csv(content: bytes) -> list[list[str]]:
+    assert content.startswith(codecs.BOM_UTF8)
+    return list(csv.reader(io.StringIO(content[len(codecs.BOM_UTF8):].decode())))
+
+
+def read_xlsx(content: bytes) -> list[list[str | None]]:
+    with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+        assert {'[Content_Types].xml', 'xl/workbook.xml', 'xl/styles.xml'} <= set(workbook.namelist())
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+    return [
+        [cell.findtext('x:v', namespaces=XLSX_NS) or cell.findtext('x:is/x:t', namespaces=XLSX_NS) for cell in row]
+        for row in sheet.iterfind('x:sheetData/x:row', XLSX_NS)
+    ]
+
+
+@pytest.mark.usefixtures('document_types')
+class TestExportHandlers:
+    async def test_export_nomenclatures_csv(self, client, auth_headers, monkeypatch):
+        response = await client.get('/api/v1/export/nomenclatures')
+        assert response.status_code == 401
+
+        # строки приходят из курсора по две: выгрузка собирается из многих выборок
+        monkeypatch.setattr(get_settings(), 'export_batch_size', 2)
+        response = await client.get('/api/v1/export/nomenclatures', params={'format': 'csv'}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/csv')
+        assert response.headers['content-disposition'].startswith('attachment; filename="nomenclatures-')
+
+        header, *rows = read_csv(response.content)
+        assert header == [
+            'id', 'name', 'sku', 'barcode', 'group', 'type', 'measure_unit', 'expiration_date', 'description',
+            'properties',
+        ]
+        assert len(rows) == len(NOMENCLATURES)
+        assert [row[1] for row in rows] == sorted(nomenclature['name'] for nomenclature in NOMENCLATURES)
+
+    async def test_export_stock_and_documents_xlsx(self, client, auth_headers):
+        moment = datetime.datetime(2025, 5, 12, 9, 30, tzinfo=datetime.timezone.utc)
+        response = await client.post('/api/v1/document/stock/', json={
+            'document_type': 'Receipt',
+            'status': 'Posted',
+            'document_datetime': moment.isoformat(),
+            'lines': [{'nomenclature_id': str(LAK_ID), 'qty': '12.5'}],
+        })
+        assert response.status_code == 200
+
+        response = await client.get(
+            '/api/v1/export/documents',
+            params={'format': 'xlsx', 'date_from': '2025-05-12', 'date_to': '2025-05-12', 'document_type': 'Receipt'},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        header, *rows = read_xlsx(response.content)
+        assert header[:4] == ['document_id', 'document_number', 'document_datetime', 'document_type']
+        [row] = rows
+        assert row[3] == 'Receipt'
+        assert row[7] == 'Лак ПФ-060'
+        assert row[8] == '12.5000'
+        # дата документа — число дней с 1899-12-30, как хранит даты Excel
+        assert float(row[2]) == pytest.approx(45789 + 9.5 / 24)
+
+        response = await client.get(
+            '/api/v1/export/documents', params={'format': 'xlsx', 'date_to': '2025-05-11'}, headers=auth_headers
+        )
+        assert len(read_xlsx(response.content)) == 1
+
+        response = await client.get('/api/v1/export/stock', params={'format': 'csv'}, headers=auth_headers)
+        header, *rows = read_csv(response.content)
+        assert header == [
+            'nomenclature_id', 'sku', 'name', 'group', 'measure_unit', 'balance', 'reserved', 'available',
+        ]
+        assert [row[5:] for row in rows if row[0] == str(LAK_ID)] == [['12.5000', '0', '12.5000']]
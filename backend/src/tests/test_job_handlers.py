@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import uuid
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import func, insert, select, update
+
+from api.services.jobs import JobContext, job_kind
+from constants import DocumentTypes, _NOM_IDS
+from db.models import DocumentType, Job, StockBalance
+
+LAK_ID = _NOM_IDS['Лак ПФ-060']
+
+
+class StepsJobParams(BaseModel):
+    steps: int
+
+
+@job_kind('test_steps', StepsJobParams)
+async def steps_job(context: JobContext, params: StepsJobParams) -> dict:
+    for step in range(params.steps):
+        await context.progress(step, params.steps)
+        await asyncio.sleep(0.02)
+    return {'steps': params.steps}
+
+
+@pytest.fixture
+async def document_types(db_session):
+    async with db_session.begin():
+        if not (await db_session.execute(select(DocumentType.id))).first():
+            await db_session.execute(insert(DocumentType).values([{'id': uuid.uuid4(), **dt} for dt in DocumentTypes]))
+
+
+async def wait_for_job(client, job_id: str, *statuses: str) -> dict:
+    for _ in range(200):
+        response = await client.get(f'/api/v1/jobs/{job_id}')
+        assert response.status_code == 200
+        job = response.json()
+        if job['status'] in statuses:
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f'job {job_id} is still {job["status"]}')
+
+
+@pytest.mark.usefixtures('document_types')
+class TestJobHandlers:
+    async def test_rebuild_stock_balances_job(self, client, open_session, job_workers):
+        response = await client.post('/api/v1/document/stock/', json={
+            'document_type': 'Receipt',
+            'status': 'Posted',
+            'document_datetime': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'lines': [{'nomenclature_id': str(LAK_ID), 'qty': '10'}],
+        })
+        assert response.status_code == 200
+        async with open_session() as session:
+            await session.execute(
+                update(StockBalance).where(StockBalance.nomenclature_id == LAK_ID).values(balance=StockBalance.balance + 3)
+            )
+            await session.commit()
+
+        response = await client.post('/api/v1/jobs', json={'kind': 'rebuild_stock_balances'})
+        assert response.status_code == 202
+        assert response.json()['status'] == 'queued'
+        job = await wait_for_job(client, response.json()['id'], 'succeeded', 'failed')
+        assert job['status'] == 'succeeded', job['error']
+        assert job['result'] == [{'nomenclature_id': str(LAK_ID), 'stored': '13.0000', 'expected': '10.0000'}]
+        assert job['started_at'] is not None and job['finished_at'] is not None
+
+        async with open_session() as session:
+            balance = await session.scalar(select(StockBalance.balance).where(StockBalance.nomenclature_id == LAK_ID))
+        assert balance == 10
+
+    async def test_create_and_cancel_queued_job(self, client):
+        response = await client.post('/api/v1/jobs', json={'kind': 'no_such_kind'})
+        assert response.status_code == 422
+        response = await client.post('/api/v1/jobs', json={'kind': 'generate_recipes', 'params': {'items': []}})
+        assert response.status_code == 422
+        response = await client.get(f'/api/v1/jobs/{uuid.uuid4()}')
+        assert response.status_code == 404
+
+        # воркеров нет, задание остаётся в очереди и отменяется сразу
+        response = await client.post('/api/v1/jobs', json={'kind': 'test_steps', 'params': {'steps': 1}})
+        assert response.status_code == 202
+        job_id = response.json()['id']
+        for _ in range(2):
+            response = await client.post(f'/api/v1/jobs/{job_id}/cancel')
+            assert response.status_code == 200
+            assert response.json()['status'] == 'cancelled'
+            assert response.json()['finished_at'] is not None
+
+    async def test_running_job_reports_progress_and_stops_on_cancel(self, client, job_workers):
+        response = await client.post('/api/v1/jobs', json={'kind': 'test_steps', 'params': {'steps': 1000}})
+        job_id = response.json()['id']
+        for _ in range(200):
+            job = (await client.get(f'/api/v1/jobs/{job_id}')).json()
+            if job['processed'] > 0:
+                break
+            await asyncio.sleep(0.05)
+        assert job['status'] == 'running'
+        assert job['total'] == 1000
+
+        response = await client.post(f'/api/v1/jobs/{job_id}/cancel')
+        assert response.status_code == 200
+        assert response.json()['cancel_requested'] is True
+        job = await wait_for_job(client, job_id, 'cancelled', 'succeeded', 'failed')
+        assert job['status'] == 'cancelled'
+        assert job['processed'] < 1000
+
+        response = await client.post('/api/v1/jobs', json={'kind': 'test_steps', 'params': {'steps': 2}})
+        job = await wait_for_job(client, response.json()['id'], 'succeeded', 'failed')
+        assert job['result'] == {'steps': 2}
+        assert (await client.post(f'/api/v1/jobs/{job["id"]}/cancel')).status_code == 409
+
+    async def test_stale_failure_is_not_overwritten(self, client, open_session, job_workers, caplog):
+        response = await client.post('/api/v1/jobs', json={'kind': 'test_steps', 'params': {'steps': 20}})
+        job_id = response.json()['id']
+        await wait_for_job(client, job_id, 'running')
+        # задание помечено упавшим, как fail_stale_jobs после долгой остановки цикла событий, а обработчик работает
+        async with open_session() as session:
+            await session.execute(
+                update(Job).where(Job.id == uuid.UUID(job_id))
+                .values(status='failed', finished_at=func.now(), error='worker stopped responding')
+            )
+            await session.commit()
+        for _ in range(200):
+            if f'job {job_id} is no longer running' in caplog.text:
+                break
+            await asyncio.sleep(0.05)
+        job = (await client.get(f'/api/v1/jobs/{job_id}')).json()
+        assert (job['status'], job['error'], job['result']) == ('failed', 'worker stopped responding', None)
@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from settings import get_settings
+
+
+class TestMetricsHandlers:
+    async def test_db_pool_metrics(self, client):
+        response = await client.get('/api/v1/metrics/db-pool')
+        assert response.status_code == 200
+        metrics = response.json()
+        assert metrics['size'] == get_settings().db_pool_size
+        assert metrics['max_overflow'] == get_settings().db_max_overflow
+        assert metrics['checked_out'] >= 0
+
+    async def test_statement_timeout_applied(self, db_session):
+        async with db_session.begin():
+            timeout_ms = (await db_session.execute(
+                text("SELECT extract(epoch FROM current_setting('statement_timeout')::interval) * 1000")
+            )).scalar_one()
+        assert timeout_ms == get_settings().db_statement_timeout_ms
+
+    async def test_password_hashing_metrics(self, client):
+        response = await client.get('/api/v1/metrics/password-hashing')
+        assert response.status_code == 200
+        assert response.json()['concurrency'] == get_settings().password_hashing_concurrency
@@ -0,0 +1,68 @@
+import uuid
+
+from sqlalchemy import insert, text
+
+from constants import NOMENCLATURES, ROOT_LKM_ID, STANDARD_NOMENCLATURE_GROUPS, _GROUP_IDS
+from db.models import NomenclatureGroup
+
+PIGMENTS_ID = _GROUP_IDS['Пигменты']
+
+
+class TestNomenclatureGroupHandlers:
+    async def test_get_tree(self, client, auth_headers):
+        response = await client.get('/api/v1/nomenclature-groups/tree', headers=auth_headers)
+        assert response.status_code == 200
+        roots = {node['name']: node for node in response.json()}
+        assert set(roots) == {g['name'] for g in STANDARD_NOMENCLATURE_GROUPS if g['parent_id'] is None}
+        assert {child['name'] for child in roots['Сырьё ПРОИЗВОДСТВО']['children']} == {
+            g['name'] for g in STANDARD_NOMENCLATURE_GROUPS if g['parent_id'] == ROOT_LKM_ID
+        }
+
+    async def test_subtree_follows_new_subgroup(self, client, db_session, auth_headers):
+        subgroup_id = uuid.uuid4()
+        async with db_session.begin():
+            await db_session.execute(
+                insert(NomenclatureGroup).values(id=subgroup_id, name='Органические пигменты', parent_id=PIGMENTS_ID)
+            )
+
+        response = await client.get(f'/api/v1/nomenclature-groups/{subgroup_id}/ancestors', headers=auth_headers)
+        assert response.status_code == 200
+        assert [g['id'] for g in response.json()] == [str(ROOT_LKM_ID), str(PIGMENTS_ID)]
+
+        response = await client.get(f'/api/v1/nomenclature-groups/{ROOT_LKM_ID}/descendants', headers=auth_headers)
+        assert response.status_code == 200
+        assert str(subgroup_id) in {g['id'] for g in response.json()}
+
+        response = await client.get(f'/api/v1/nomenclature-groups/{uuid.uuid4()}/descendants', headers=auth_headers)
+        assert response.status_code == 404
+
+    async def test_group_created_elsewhere_is_found_by_id(self, client, open_session, auth_headers):
+        response = await client.get('/api/v1/nomenclature-groups/tree', headers=auth_headers)
+        assert response.status_code == 200
+
+        # запись мимо сессий приложения, как из другого процесса: кеш дерева о ней не знает
+        subgroup_id = uuid.uuid4()
+        async with open_session() as session:
+            await session.execute(
+                text("INSERT INTO nomenclature_groups (id, name, parent_id) VALUES (:id, 'Алкидные', :parent_id)"),
+                {'id': subgroup_id, 'parent_id': _GROUP_IDS['Пленкообразователи']},
+            )
+            await session.commit()
+
+        response = await client.get(f'/api/v1/nomenclature-groups/{subgroup_id}/ancestors', headers=auth_headers)
+        assert response.status_code == 200
+        assert [g['id'] for g in response.json()] == [str(ROOT_LKM_ID), str(_GROUP_IDS['Пленкообразователи'])]
+
+    async def test_nomenclatures_of_subtree(self, client, auth_headers):
+        subtree = {g['id'] for g in STANDARD_NOMENCLATURE_GROUPS if g['parent_id'] == ROOT_LKM_ID} | {ROOT_LKM_ID}
+        response = await client.get(
+            '/api/v1/nomenclatures/',
+            params={'group_id': str(ROOT_LKM_ID), 'include_subgroups': True, 'limit': 500}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert {n['name'] for n in response.json()['nomenclatures']} == {
+            n['name'] for n in NOMENCLATURES if n['group_id'] in subtree
+        }
+
+        response = await client.get('/api/v1/nomenclatures/', params={'group_id': str(ROOT_LKM_ID)}, headers=auth_headers)
+        assert response.json()['nomenclatures'] == []
@@ -0,0 +1,104 @@
+import uuid
+
+from sqlalchemy import text
+
+from constants import NOMENCLATURES, _GROUP_IDS, _NOM_IDS
+
+
+class TestNomenclatureHandlers:
+    async def test_get_all_nomenclatures_paginated(self, client, auth_headers):
+        names, cursor = [], None
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            response = await client.get('/api/v1/nomenclatures/', params=params, headers=auth_headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page['nomenclatures']) <= 3
+            names += [nomenclature['name'] for nomenclature in page['nomenclatures']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert names == sorted(names)
+        assert sorted(names) == sorted(nomenclature['name'] for nomenclature in NOMENCLATURES)
+
+    async def test_get_all_nomenclatures_filtered(self, client, auth_headers):
+        group_id = _GROUP_IDS['Пленкообразователи']
+        response = await client.get('/api/v1/nomenclatures/', params={'group_id': str(group_id)}, headers=auth_headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert page['next_cursor'] is None
+        assert {nomenclature['name'] for nomenclature in page['nomenclatures']} == {
+            nomenclature['name'] for nomenclature in NOMENCLATURES if nomenclature['group_id'] == group_id
+        }
+
+    async def test_get_all_nomenclatures_invalid_page(self, client, auth_headers):
+        response = await client.get('/api/v1/nomenclatures/', params={'limit': 0}, headers=auth_headers)
+        assert response.status_code == 422
+        response = await client.get('/api/v1/nomenclatures/', params={'cursor': 'bm9wZQ'}, headers=auth_headers)
+        assert response.status_code == 422
+
+    async def test_fuzzy_search_tolerates_typos(self, client, auth_headers):
+        response = await client.get(
+            '/api/v1/nomenclatures/search/fuzzy', params={'q': 'калцид'}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert results[0]['nomenclature']['name'] == 'Кальцид LinCarb-2xk'
+        assert results == sorted(results, key=lambda result: -result['score'])
+
+        response = await client.get(
+            '/api/v1/nomenclatures/search/fuzzy',
+            params={'q': 'калцид', 'group_id': str(_GROUP_IDS['Пленкообразователи'])}, headers=auth_headers
+        )
+        assert response.json()['results'] == []
+
+    async def test_typeahead(self, client, auth_headers):
+        response = await client.get('/api/v1/nomenclatures/search/typeahead', params={'q': 'эмал'}, headers=auth_headers)
+        assert response.status_code == 200
+        suggestions = response.json()
+        assert suggestions[0]['name'] == 'Эмаль ПФ-115'
+        assert set(suggestions[0]) == {'id', 'name', 'sku'}
+
+        for q in ('э', 'эм'):
+            response = await client.get('/api/v1/nomenclatures/search/typeahead', params={'q': q}, headers=auth_headers)
+            assert response.status_code == 422
+        response = await client.get('/api/v1/nomenclatures/search/fuzzy', params={'q': 'эм'}, headers=auth_headers)
+        assert response.status_code == 422
+
+    async def test_search_by_name_is_case_insensitive(self, client, auth_headers):
+        response = await client.get('/api/v1/nomenclatures/search/by-name', params={'name': 'пф-060'}, headers=auth_headers)
+        assert response.status_code == 200
+        assert {n['name'] for n in response.json()['nomenclatures']} >= {'Лак ПФ-060'}
+
+        response = await client.get(
+            '/api/v1/nomenclatures/search/by-name', params={'name': '%%%'}, headers=auth_headers
+        )
+        assert response.json()['nomenclatures'] == []
+
+        # шаблон короче триграммы индекс не обслуживает
+        response = await client.get('/api/v1/nomenclatures/search/by-name', params={'name': 'пф'}, headers=auth_headers)
+        assert response.status_code == 422
+
+    async def test_update_with_reference_missing_from_cache(self, client, auth_headers, open_session):
+        url = f"/api/v1/nomenclatures/{_NOM_IDS['Лак ПФ-060']}"
+        body = {
+            key: str(value) for key, value in (await client.get(url, headers=auth_headers)).json().items()
+            if key in {'name', 'description', 'type_id', 'group_id', 'measure_unit_id'}
+        }
+        response = await client.put(url, json={**body, 'type_id': str(uuid.uuid4())}, headers=auth_headers)
+        assert response.status_code == 400
+        assert response.json()['detail'].startswith('Nomenclature type')
+
+        # запись мимо сессий приложения (другой процесс, сырой SQL) кеш справочников не сбрасывает
+        type_id = uuid.uuid4()
+        async with open_session() as session:
+            await session.execute(
+                text("INSERT INTO nomenclature_types (id, name) VALUES (:id, 'Краски')"), {'id': type_id}
+            )
+            await session.commit()
+
+        response = await client.put(url, json={**body, 'type_id': str(type_id)}, headers=auth_headers)
+        assert response.status_code == 200, response.json()
+        assert response.json()['type_id'] == str(type_id)
+        response = await client.put(url, json=body, headers=auth_headers)
+        assert response.status_code == 200
@@ -0,0 +1,117 @@
+import datetime
+import json
+import uuid
+
+from sqlalchemy import func, select, text
+
+from constants import NOMENCLATURES, _GROUP_IDS, _NOM_IDS, _TYPE_IDS, _UNIT_IDS
+from db.models import Nomenclature
+from settings import get_settings
+
+CSV = '\n'.join([
+    'name,sku,type,group,measure_unit,expiration_date,color',
+    'Грунт ГФ-021,G-021,Продукция,Продукция ЛКМ,кг,2026-01-31,серый',
+    'Лак ПФ-060,,сырье,Сырьё ПРОИЗВОДСТВО/Пленкообразователи,Килограмм,,',
+    'Растворитель Р-4,R-4,Химия,Растворители,л,,',
+    'Грунт ГФ-021 копия,G-021,Продукция,Продукция ЛКМ,кг,,',
+    'Лак ПФ-060 для белой эмали,NEW-1,Сырье,Пленкообразователи,кг,,',
+    'Уайт-спирит,WS-1,Сырье,Растворители,кг,31.12.2026,',
+])
+
+
+def upload(content: str, filename: str) -> dict:
+    return {'file': (filename, content.encode('utf-8-sig'))}
+
+
+class TestNomenclatureImportHandlers:
+    async def test_import_csv(self, client, auth_headers, open_session, monkeypatch):
+        response = await client.post('/api/v1/nomenclatures/import', files=upload(CSV, 'catalogue.csv'))
+        assert response.status_code == 401
+
+        response = await client.post(
+            '/api/v1/nomenclatures/import', params={'dry_run': True},
+            files=upload(CSV, 'catalogue.csv'), headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert response.json()['dry_run'] is True
+        assert (response.json()['inserted'], response.json()['failed']) == (0, 3)
+
+        # по две строки в пачке: строка с занятым в группе названием откатывается одна, остальные сохраняются
+        monkeypatch.setattr(get_settings(), 'nomenclature_import_batch_size', 2)
+        response = await client.post(
+            '/api/v1/nomenclatures/import', files=upload(CSV, 'catalogue.csv'), headers=auth_headers
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert (report['total'], report['inserted'], report['updated'], report['failed']) == (6, 1, 1, 4)
+        errors = {error['line']: error['message'] for error in report['errors']}
+        assert list(errors) == [4, 5, 6, 7]
+        assert errors[4] == "type 'Химия' does not exist"
+        assert errors[5] == "sku 'G-021' repeats line 2"
+        assert 'uq_nomenclature_group_name' in errors[6]
+        assert errors[7].startswith('expiration_date')
+
+        async with open_session() as session:
+            primer = await session.scalar(select(Nomenclature).where(Nomenclature.sku == 'G-021'))
+            lak = await session.get(Nomenclature, _NOM_IDS['Лак ПФ-060'])
+            count = await session.scalar(select(func.count()).select_from(Nomenclature))
+        assert primer.name == 'Грунт ГФ-021'
+        assert (primer.type_id, primer.group_id, primer.measure_unit_id) == (
+            _TYPE_IDS['Продукция'], _GROUP_IDS['Продукция ЛКМ'], _UNIT_IDS['Килограмм']
+        )
+        assert primer.expiration_date == datetime.date(2026, 1, 31)
+        assert primer.properties == {'color': 'серый'}
+        # пустые ячейки не затирают сохранённое, свойства дополняются
+        assert lak.properties == {'solids_content': 53, 'density': 1.2}
+        assert count == len(NOMENCLATURES) + 1
+
+    async def test_import_jsonl_updates_by_sku(self, client, auth_headers, open_session):
+        lines = [
+            {'name': 'Эмаль ХВ-124', 'sku': 'E-124', 'barcode': '4600000000124', 'type': 'Продукция',
+             'group': str(_GROUP_IDS['Продукция ЛКМ']), 'measure_unit': 'кг', 'properties': {'color': 'серая'}},
+            {'name': 'Эмаль ХВ-124 серая', 'sku': 'E-124', 'type': 'Продукция', 'group': 'Продукция ЛКМ',
+             'measure_unit': 'кг', 'properties': {'gloss': 'матовая'}, 'description': 'Для металла'},
+        ]
+        for line, expected in zip(lines, [(1, 0), (0, 1)]):
+            response = await client.post(
+                '/api/v1/nomenclatures/import', files=upload(json.dumps(line, ensure_ascii=False), 'items.jsonl'),
+                headers=auth_headers,
+            )
+            assert response.status_code == 200
+            assert (response.json()['inserted'], response.json()['updated']) == expected
+
+        async with open_session() as session:
+            enamel = await session.scalar(select(Nomenclature).where(Nomenclature.sku == 'E-124'))
+        assert (enamel.name, enamel.barcode, enamel.description) == (
+            'Эмаль ХВ-124 серая', '4600000000124', 'Для металла'
+        )
+        assert enamel.properties == {'color': 'серая', 'gloss': 'матовая'}
+
+        # группа создана мимо сессий приложения, как в другом процессе: кеш о ней не знает, импорт перечитывает его
+        async with open_session() as session:
+            await session.execute(
+                text("INSERT INTO nomenclature_groups (id, name) VALUES (:id, 'Грунтовки')"), {'id': uuid.uuid4()}
+            )
+            await session.commit()
+        line = {'name': 'Грунт ФЛ-03К', 'type': 'Продукция', 'group': 'Грунтовки', 'measure_unit': 'кг'}
+        response = await client.post(
+            '/api/v1/nomenclatures/import', files=upload(json.dumps(line, ensure_ascii=False), 'items.jsonl'),
+            headers=auth_headers,
+        )
+        assert (response.json()['inserted'], response.json()['errors']) == (1, [])
+
+        response = await client.post(
+            '/api/v1/nomenclatures/import', files=upload('{"name": "x"}\nnot json\n', 'items.txt'),
+            headers=auth_headers,
+        )
+        assert response.status_code == 422
+        response = await client.post(
+            '/api/v1/nomenclatures/import', params={'format': 'jsonl'},
+            files=upload('{"name": "x"}\nnot json\n', 'items.txt'), headers=auth_headers,
+        )
+        assert [error['line'] for error in response.json()['errors']] == [1, 2]
+        response = await client.post(
+            '/api/v1/nomenclatures/import', files=upload('name,sku\nx,1\n', 'items.csv'), headers=auth_headers
+        )
+        assert response.status_code == 422
+        assert response.json()['detail'] == 'CSV header lacks columns: type, group, measure_unit'
@@ -1,9 +1,48 @@
+import asyncio
 from copy import deepcopy
+from decimal import Decimal, ROUND_DOWN
 from fastapi.encoders import jsonable_encoder
+import datetime
 import uuid
 import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, event, func, insert, select, update
 
-from constants import RULES_EXAMPLE
+from constants import RULES_EXAMPLE, DocumentTypes, NOMENCLATURES, _GROUP_IDS, _NOM_IDS
+from api.handlers.actions import RecipeActions
+from db.dals import DocumentDAL, StockDAL
+from db.models import BaseRecipe, DocumentType, Ingredient, Nomenclature, Recipe, RecipeGenerationSettings
+
+
+@pytest.fixture
+async def posted_base_recipe(db_session):
+    """Posted base recipe from RULES_EXAMPLE, generation settings and every raw material in stock."""
+    base_recipe_id = uuid.uuid4()
+    async with db_session.begin():
+        existing = set((await db_session.execute(select(DocumentType.name))).scalars().all())
+        new_types = [{'id': uuid.uuid4(), **dt} for dt in DocumentTypes if dt['name'] not in existing]
+        if new_types:
+            await db_session.execute(insert(DocumentType).values(new_types))
+        types = {t.name: t for t in (await db_session.execute(select(DocumentType))).scalars().all()}
+
+        await db_session.execute(delete(RecipeGenerationSettings))
+        await db_session.execute(insert(RecipeGenerationSettings).values(
+            id=1,
+            film_formers_group_id=_GROUP_IDS['Пленкообразователи'],
+            pigments_group_id=_GROUP_IDS['Пигменты'],
+            fillers_group_id=_GROUP_IDS['Наполнители'],
+        ))
+        await db_session.execute(insert(BaseRecipe).values(
+            id=base_recipe_id, document_datetime=datetime.datetime(2025, 4, 19, tzinfo=datetime.timezone.utc),
+            name='ПФ-115', status='Posted', commentary='', rules=jsonable_encoder(RULES_EXAMPLE),
+            document_type_id=types['Base Recipe'].id,
+        ))
+        await DocumentDAL(db_session).create_stock_document(
+            document_type_id=types['Receipt'].id, direction=1, status='Posted',
+            document_datetime=datetime.datetime.now(datetime.timezone.utc), commentary='',
+            lines=[(nomenclature['id'], Decimal(1000)) for nomenclature in NOMENCLATURES[1:]],
+        )
+    return base_recipe_id
 
 class TestRecipeHandlers:
 
@@ -43,3 +82,191 @@ class TestRecipeHandlers:
         # result = response.json()
         # base_recipe_id = result['id']
 
+    async def test_generate_recipe(self, client, db_session, posted_base_recipe):
+        body = {
+            'base_recipe_id': posted_base_recipe,
+            'nomenclature_id': _NOM_IDS['Эмаль ПФ-115'],
+            'batch_size': '100',
+        }
+        response = await client.post('/api/v1/recipe/', json=jsonable_encoder(body))
+        assert response.status_code == 200
+        result = response.json()
+        amounts = {uuid.UUID(i['material_uuid']): Decimal(i['amount']) for i in result['ingredients']}
+
+        # сухой остаток 65: связующее 65 / 3 в лаке с 53 % сухого, пигменты и наполнители 1 : 3
+        assert amounts[_NOM_IDS['Лак ПФ-060 для белой эмали']] == Decimal('40.88')
+        assert amounts[_NOM_IDS['Диоксид титана пигментный TIOx-280']] == Decimal('10.83')
+        assert amounts[_NOM_IDS['Кальцид LinCarb-2xk']] == Decimal('32.50')
+        assert amounts[_NOM_IDS['Добавка Attdry 69']] == Decimal('0.10')
+        assert amounts[_NOM_IDS['МЕКО']] == Decimal('0.40')
+        assert sum(amounts.values()) == Decimal('100')
+
+        async with db_session.begin():
+            recipe = await db_session.get(Recipe, uuid.UUID(result['id']))
+            assert recipe.document_number > 0
+            assert recipe.batch_amount == Decimal('100')
+            stored = (await db_session.execute(
+                select(Ingredient.nomenclature_id, Ingredient.amount).where(Ingredient.recipe_id == recipe.id)
+            )).all()
+        assert dict(stored) == amounts
+
+        response = await client.post('/api/v1/recipe/', json=jsonable_encoder(body))
+        assert response.json()['ingredients'] == result['ingredients']
+
+    async def test_generate_recipe_without_color(self, client, db_session, posted_base_recipe):
+        body = {
+            'base_recipe_id': posted_base_recipe,
+            'nomenclature_id': _NOM_IDS['Лак ПФ-060'],
+            'batch_size': '100',
+        }
+        response = await client.post('/api/v1/recipe/', json=jsonable_encoder(body))
+        assert response.status_code == 422
+        assert response.json()['detail'] == 'nomenclature must have color property'
+
+    async def test_generate_recipes_batch(self, client, db_session, posted_base_recipe):
+        paint = {'base_recipe_id': posted_base_recipe, 'nomenclature_id': _NOM_IDS['Эмаль ПФ-115']}
+        items = [
+            {**paint, 'batch_size': '100'},
+            {**paint, 'nomenclature_id': uuid.uuid4(), 'batch_size': '100'},
+            {**paint, 'nomenclature_id': _NOM_IDS['Лак ПФ-060'], 'batch_size': '100'},
+            {**paint, 'batch_size': '250.50'},
+        ]
+        response = await client.post('/api/v1/recipe/batch', json=jsonable_encoder({'items': items}))
+
+        statements = []
+        record = statements.append
+        event.listen(db_session.sync_session, 'do_orm_execute', record)
+        try:
+            # кеши прогреты первой пачкой
+            await client.post('/api/v1/recipe/batch', json=jsonable_encoder({'items': items}))
+            small_batch_statements = len(statements)
+            statements.clear()
+            await client.post('/api/v1/recipe/batch', json=jsonable_encoder({'items': items * 10}))
+        finally:
+            event.remove(db_session.sync_session, 'do_orm_execute', record)
+        # число запросов не зависит от размера пачки
+        assert len(statements) == small_batch_statements
+
+        assert response.status_code == 200
+        results = response.json()
+        assert [r['status_code'] for r in results] == [200, 404, 422, 200]
+        assert results[1]['detail'] == 'nomenclature not found'
+        assert results[2]['detail'] == 'nomenclature must have color property'
+        assert results[0]['recipe']['ingredients'] == (
+            await client.post('/api/v1/recipe/', json=jsonable_encoder(items[0]))
+        ).json()['ingredients']
+        assert sum(Decimal(i['amount']) for i in results[3]['recipe']['ingredients']) == Decimal('250.50')
+
+        async with db_session.begin():
+            saved = await db_session.scalar(select(func.count()).select_from(Recipe).where(
+                Recipe.id.in_([uuid.UUID(results[0]['recipe']['id']), uuid.UUID(results[3]['recipe']['id'])])
+            ))
+        assert saved == 2
+
+        response = await client.post('/api/v1/recipe/batch', json={'items': []})
+        assert response.status_code == 422
+
+    async def test_concurrent_generation_does_not_overcommit(self, client, db_session, posted_base_recipe, open_session):
+        paint = {'base_recipe_id': posted_base_recipe, 'nomenclature_id': _NOM_IDS['Эмаль ПФ-115']}
+        probe = (await client.post('/api/v1/recipe/', json=jsonable_encoder({**paint, 'batch_size': '100'}))).json()
+        per_100 = {uuid.UUID(i['material_uuid']): Decimal(i['amount']) for i in probe['ingredients']}
+        async with db_session.begin():
+            available = await StockDAL(db_session).get_available(per_100)
+        # два замеса помещаются в остаток за вычетом резервов, третий — уже нет
+        fits = min(available[nom_id] / amount for nom_id, amount in per_100.items()) * 100
+        batch_size = (fits / Decimal('2.5')).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+
+        async def generate() -> int:
+            async with open_session() as session:
+                try:
+                    await RecipeActions.generate_recipe(
+                        posted_base_recipe, _NOM_IDS['Эмаль ПФ-115'], batch_size, session
+                    )
+                except HTTPException as exc:
+                    return exc.status_code
+                return 200
+
+        assert sorted(await asyncio.gather(*(generate() for _ in range(4)))) == [200, 200, 409, 409]
+        async with db_session.begin():
+            left = await StockDAL(db_session).get_available(per_100)
+        assert all(qty >= 0 for qty in left.values())
+
+        response = await client.delete(f"/api/v1/recipe/{probe['id']}/reservations")
+        assert response.json()['released'] == len(per_100)
+        async with db_session.begin():
+            released = await StockDAL(db_session).get_available(per_100)
+        assert all(released[nom_id] == left[nom_id] + amount for nom_id, amount in per_100.items())
+
+    async def test_posting_for_recipe_settles_reservations(self, client, db_session, posted_base_recipe):
+        body = {'base_recipe_id': posted_base_recipe, 'nomenclature_id': _NOM_IDS['Эмаль ПФ-115'], 'batch_size': '100'}
+        async with db_session.begin():
+            before = await StockDAL(db_session).get_available(list(_NOM_IDS.values()))
+        recipe = (await client.post('/api/v1/recipe/', json=jsonable_encoder(body))).json()
+        amounts = {uuid.UUID(i['material_uuid']): Decimal(i['amount']) for i in recipe['ingredients']}
+        issued, still_reserved = list(amounts)[:2], list(amounts)[2:]
+
+        def document(document_type: str, lines: dict[uuid.UUID, Decimal]) -> dict:
+            return jsonable_encoder({
+                'document_type': document_type, 'document_datetime': '2025-05-14T10:00:00Z', 'recipe_id': recipe['id'],
+                'lines': [{'nomenclature_id': nom_id, 'qty': qty} for nom_id, qty in lines.items()],
+            })
+
+        # выдача в производство списывает остаток и гасит резерв выданного: доступное уменьшается один раз
+        issue = document('NomenclatureIssue', {nom_id: amounts[nom_id] for nom_id in issued})
+        response = await client.post('/api/v1/document/stock/', json=issue)
+        assert response.status_code == 200
+        async with db_session.begin():
+            available = await StockDAL(db_session).get_available(amounts)
+        assert all(available[nom_id] == before[nom_id] - amounts[nom_id] for nom_id in amounts)
+        response = await client.delete(f"/api/v1/recipe/{recipe['id']}/reservations")
+        assert response.json()['released'] == len(still_reserved)
+
+        # отчёт о выпуске закрывает замес: резерв снимается целиком, продукция приходует
+        recipe = (await client.post('/api/v1/recipe/', json=jsonable_encoder(body))).json()
+        response = await client.post(
+            '/api/v1/document/stock/', json=document('ProductionReport', {_NOM_IDS['Эмаль ПФ-115']: Decimal(100)})
+        )
+        assert response.status_code == 200
+        response = await client.delete(f"/api/v1/recipe/{recipe['id']}/reservations")
+        assert response.json()['released'] == 0
+
+        response = await client.post(
+            '/api/v1/document/stock/', json={**document('NomenclatureIssue', amounts), 'recipe_id': str(uuid.uuid4())}
+        )
+        assert response.status_code == 422
+
+    async def test_generate_recipe_selection_policies(self, client, db_session, posted_base_recipe):
+        white_varnish, varnish = _NOM_IDS['Лак ПФ-060 для белой эмали'], _NOM_IDS['Лак ПФ-060']
+        today = datetime.date.today()
+        async with db_session.begin():
+            receipt_type_id = await db_session.scalar(select(DocumentType.id).where(DocumentType.name == 'Receipt'))
+            await DocumentDAL(db_session).create_stock_document(
+                document_type_id=receipt_type_id, direction=1, status='Posted',
+                document_datetime=datetime.datetime.now(datetime.timezone.utc), commentary='',
+                lines=[(varnish, Decimal(5000))],
+            )
+            for nomenclature_id, days in ((white_varnish, 30), (varnish, 365)):
+                await db_session.execute(
+                    update(Nomenclature).where(Nomenclature.id == nomenclature_id)
+                    .values(expiration_date=today + datetime.timedelta(days=days))
+                )
+
+        async def film_former(policy: str | None) -> set[uuid.UUID]:
+            body = {'base_recipe_id': posted_base_recipe, 'nomenclature_id': _NOM_IDS['Эмаль ПФ-115'], 'batch_size': '100'}
+            if policy is not None:
+                body['policy'] = policy
+            response = await client.post('/api/v1/recipe/', json=jsonable_encoder(body))
+            assert response.status_code == 200
+            return {uuid.UUID(i['material_uuid']) for i in response.json()['ingredients']} & {white_varnish, varnish}
+
+        try:
+            # по умолчанию — первый лак из правил, у которого есть остаток
+            assert await film_former(None) == {white_varnish}
+            assert await film_former('most_stocked') == {varnish}
+            assert await film_former('fifo') == {white_varnish}
+            assert await film_former('fewest_materials') == {white_varnish}
+        finally:
+            async with db_session.begin():
+                await db_session.execute(
+                    update(Nomenclature).where(Nomenclature.id.in_([white_varnish, varnish])).values(expiration_date=None)
+                )
@@ -0,0 +1,244 @@
+import asyncio
+import datetime
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import delete, event, insert, select, text, update
+
+import reconcile_stock_balances
+from api.schemas.rules_schemas import MaterialDict
+from api.services.stock_availability import StockAvailabilityResolver
+from constants import ROOT_LKM_ID, _GROUP_IDS, _NOM_IDS
+from db.dals import StockDAL
+from db.models import Document, DocumentLine, DocumentType, StockBalance, StockMove
+
+NOMENCLATURE_ID = _NOM_IDS['Лак ПФ-060']
+OTHER_NOMENCLATURE_ID = _NOM_IDS['Кальцид LinCarb-2xk']
+THIRD_NOMENCLATURE_ID = _NOM_IDS['Эмаль ПФ-115']
+
+
+def utc(year: int, month: int, day: int) -> datetime.datetime:
+    return datetime.datetime(year, month, day, 12, tzinfo=datetime.timezone.utc)
+
+
+async def post_move(session, nomenclature_id: uuid.UUID, qty: int, moment: datetime.datetime) -> None:
+    type_id = await session.scalar(select(DocumentType.id).where(DocumentType.name == 'Receipt'))
+    if type_id is None:
+        type_id = uuid.uuid4()
+        await session.execute(insert(DocumentType).values(id=type_id, name='Receipt', direction=1))
+    document = Document(status='Posted', document_datetime=moment, document_type_id=type_id, name=None, commentary='')
+    session.add(document)
+    await session.flush()
+    line = DocumentLine(document_id=document.id, nomenclature_id=nomenclature_id, qty=qty)
+    session.add(line)
+    await session.flush()
+    session.add(StockMove(document_line_id=line.id, nomenclature_id=nomenclature_id, qty=qty, document_datetime=moment))
+    await session.commit()
+
+
+async def build_snapshots(session, until: datetime.date) -> list[datetime.date]:
+    async with session.begin():
+        return await StockDAL(session).build_snapshots(until=until)
+
+
+class TestStockHandlers:
+    async def test_balance_without_moves(self, client):
+        response = await client.get(
+            '/api/v1/stock/balance', params={'at': '2024-12-31T00:00:00Z', 'nomenclature_id': str(NOMENCLATURE_ID)}
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result['snapshot_month'] is None
+        assert result['balances'] == [{'nomenclature_id': str(NOMENCLATURE_ID), 'balance': '0'}]
+
+    async def test_balance_from_snapshots(self, client, db_session):
+        await post_move(db_session, NOMENCLATURE_ID, 10, utc(2025, 1, 10))
+        await post_move(db_session, NOMENCLATURE_ID, 5, utc(2025, 2, 5))
+        await post_move(db_session, NOMENCLATURE_ID, -3, utc(2025, 2, 20))
+        await post_move(db_session, OTHER_NOMENCLATURE_ID, 7, utc(2025, 2, 21))
+        await post_move(db_session, NOMENCLATURE_ID, 1, utc(2025, 3, 3))
+
+        built = await build_snapshots(db_session, datetime.date(2025, 4, 1))
+        assert built == [datetime.date(2025, 1, 1), datetime.date(2025, 2, 1), datetime.date(2025, 3, 1)]
+        assert await build_snapshots(db_session, datetime.date(2025, 4, 1)) == []
+
+        response = await client.get(
+            '/api/v1/stock/balance', params={'at': '2025-02-10T00:00:00Z', 'nomenclature_id': str(NOMENCLATURE_ID)}
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result['snapshot_month'] == '2025-01-01'
+        assert [float(b['balance']) for b in result['balances']] == [15]
+
+        response = await client.get('/api/v1/stock/balance', params={'at': '2025-03-31T00:00:00Z'})
+        assert response.status_code == 200
+        result = response.json()
+        assert result['snapshot_month'] == '2025-02-01'
+        balances = {b['nomenclature_id']: float(b['balance']) for b in result['balances']}
+        assert balances == {str(NOMENCLATURE_ID): 13, str(OTHER_NOMENCLATURE_ID): 7}
+
+    async def test_backdated_move_invalidates_snapshots(self, client, db_session):
+        await post_move(db_session, NOMENCLATURE_ID, 100, utc(2025, 1, 15))
+
+        response = await client.get(
+            '/api/v1/stock/balance', params={'at': '2025-03-10T00:00:00Z', 'nomenclature_id': str(NOMENCLATURE_ID)}
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result['snapshot_month'] is None
+        assert [float(b['balance']) for b in result['balances']] == [113]
+
+        built = await build_snapshots(db_session, datetime.date(2025, 4, 1))
+        assert built[0] == datetime.date(2025, 1, 1)
+
+        response = await client.get(
+            '/api/v1/stock/balance', params={'at': '2025-04-01T00:00:00Z', 'nomenclature_id': str(NOMENCLATURE_ID)}
+        )
+        result = response.json()
+        assert result['snapshot_month'] == '2025-03-01'
+        assert [float(b['balance']) for b in result['balances']] == [113]
+
+    async def test_backdated_move_invalidates_only_its_nomenclature(self, client, db_session, open_session):
+        async def balance_at(nomenclature_id: uuid.UUID, at: str) -> tuple[str | None, float]:
+            response = await client.get(
+                '/api/v1/stock/balance', params={'at': at, 'nomenclature_id': str(nomenclature_id)}
+            )
+            result = response.json()
+            return result['snapshot_month'], float(result['balances'][0]['balance'])
+
+        await post_move(db_session, OTHER_NOMENCLATURE_ID, 2, utc(2025, 2, 1))
+        assert await balance_at(OTHER_NOMENCLATURE_ID, '2025-04-01T00:00:00Z') == (None, 9)
+        assert await balance_at(NOMENCLATURE_ID, '2025-04-01T00:00:00Z') == ('2025-03-01', 113)
+
+        async with open_session() as session:
+            async with session.begin():
+                # пересчитывается только номенклатура с движением задним числом
+                built = await StockDAL(session).build_snapshots(until=datetime.date(2025, 4, 1))
+                assert built == [datetime.date(2025, 2, 1), datetime.date(2025, 3, 1)]
+                # таблица снимков не заблокирована: проведение по другой номенклатуре не ждёт конца построения
+                async with open_session() as other_session:
+                    await asyncio.wait_for(post_move(other_session, THIRD_NOMENCLATURE_ID, 1, utc(2025, 3, 20)), 5)
+
+        assert await balance_at(OTHER_NOMENCLATURE_ID, '2025-04-01T00:00:00Z') == ('2025-03-01', 9)
+        assert await balance_at(THIRD_NOMENCLATURE_ID, '2025-04-01T00:00:00Z') == (None, 1)
+        assert await build_snapshots(db_session, datetime.date(2025, 4, 1)) == [datetime.date(2025, 3, 1)]
+        assert await balance_at(THIRD_NOMENCLATURE_ID, '2025-04-01T00:00:00Z') == ('2025-03-01', 1)
+        assert await build_snapshots(db_session, datetime.date(2025, 4, 1)) == []
+
+    async def test_available_by_group_follows_moves(self, client, db_session):
+        async def available(group_id: uuid.UUID, **params) -> list[str]:
+            response = await client.get('/api/v1/stock/available', params={'group_id': str(group_id), **params})
+            assert response.status_code == 200
+            return response.json()['nomenclature_ids']
+
+        film_formers = _GROUP_IDS['Пленкообразователи']
+        assert await available(film_formers) == [str(NOMENCLATURE_ID)]
+        assert await available(ROOT_LKM_ID) == sorted([str(NOMENCLATURE_ID), str(OTHER_NOMENCLATURE_ID)])
+        assert await available(ROOT_LKM_ID, include_subgroups='false') == []
+
+        await post_move(db_session, NOMENCLATURE_ID, -113, utc(2025, 4, 2))
+        assert await available(film_formers) == []
+        await post_move(db_session, NOMENCLATURE_ID, 1, utc(2025, 4, 3))
+        assert await available(film_formers) == [str(NOMENCLATURE_ID)]
+
+        response = await client.get('/api/v1/stock/available', params={'group_id': str(uuid.uuid4())})
+        assert response.status_code == 404
+
+    async def test_availability_resolver_loads_in_one_query(self, db_session):
+        present, zero, missing = _NOM_IDS['Диоксид титана пигментный TIOx-280'], _NOM_IDS['МЕКО'], uuid.uuid4()
+        await post_move(db_session, present, 4, utc(2025, 4, 5))
+        await post_move(db_session, zero, 2, utc(2025, 4, 5))
+        await post_move(db_session, zero, -2, utc(2025, 4, 6))
+        materials = [MaterialDict(uuids=[missing, present], ratios=[1, 1]), MaterialDict(uuids=[zero], ratios=[1])]
+
+        statements = []
+        record = statements.append
+        event.listen(db_session.sync_session, 'do_orm_execute', record)
+        try:
+            async with db_session.begin():
+                resolver = StockAvailabilityResolver(db_session)
+                resolver.add(materials)
+                resolver.add_ids([present, zero])
+                await resolver.load()
+                load_statements = len(statements)
+                await resolver.load(lock=True)
+        finally:
+            event.remove(db_session.sync_session, 'do_orm_execute', record)
+        # остатки всех кандидатов одним запросом, с блокировкой — ещё один запрос на все блокировки
+        assert (load_statements, len(statements)) == (1, 3)
+
+        assert [resolver.balance(nom_id) for nom_id in (present, zero, missing)] == [4, 0, 0]
+        assert resolver.available(materials) == [present]
+        resolver.consume([(present, Decimal(3)), (missing, Decimal(1))])
+        assert [resolver.balance(nom_id) for nom_id in (present, missing)] == [1, -1]
+        assert resolver.available(materials) == [present]
+
+    async def test_balance_triggers_follow_move_updates_and_deletes(self, db_session):
+        additive, thickener, lecithin = (
+            _NOM_IDS['Добавка Attdry 69'], _NOM_IDS['Pangel B20'], _NOM_IDS['Лецитин соевый жидкий']
+        )
+
+        async def balances_and_drift() -> tuple[dict[uuid.UUID, float], list]:
+            async with db_session.begin():
+                rows = await db_session.execute(
+                    select(StockBalance.nomenclature_id, StockBalance.balance)
+                    .where(StockBalance.nomenclature_id.in_([additive, thickener, lecithin]))
+                )
+                # остатки сверяются с SUM(stock_moves.qty) по всем номенклатурам
+                drift = await StockDAL(db_session).get_balance_drift()
+            return {nom_id: float(balance) for nom_id, balance in rows}, drift
+
+        await post_move(db_session, additive, 10, utc(2025, 4, 10))
+        await post_move(db_session, additive, 5, utc(2025, 4, 11))
+        await post_move(db_session, thickener, 3, utc(2025, 4, 12))
+        await post_move(db_session, lecithin, 4, utc(2025, 4, 12))
+
+        # один оператор меняет несколько движений, другой переносит движение на другую номенклатуру
+        async with db_session.begin():
+            await db_session.execute(
+                update(StockMove).where(StockMove.nomenclature_id == additive).values(qty=StockMove.qty * 2)
+            )
+            await db_session.execute(
+                update(StockMove).where(StockMove.nomenclature_id == thickener).values(nomenclature_id=additive)
+            )
+        assert await balances_and_drift() == ({additive: 33, thickener: 0, lecithin: 4}, [])
+
+        async with db_session.begin():
+            await db_session.execute(
+                delete(StockMove).where(StockMove.nomenclature_id == additive, StockMove.qty == 20)
+            )
+        assert await balances_and_drift() == ({additive: 13, thickener: 0, lecithin: 4}, [])
+
+        # удаление документа каскадом удаляет строки и их движения
+        async with db_session.begin():
+            document_ids = select(DocumentLine.document_id).where(DocumentLine.nomenclature_id == lecithin)
+            await db_session.execute(delete(Document).where(Document.id.in_(document_ids)))
+        assert await balances_and_drift() == ({additive: 13, thickener: 0, lecithin: 0}, [])
+
+    async def test_reconcile_reports_and_fixes_drift(self, db_session, open_session, monkeypatch, capsys):
+        additive, lecithin = _NOM_IDS['Добавка Attdry 69'], _NOM_IDS['Лецитин соевый жидкий']
+        await post_move(db_session, lecithin, 4, utc(2025, 4, 13))
+        # остатки испорчены мимо триггеров: у одной номенклатуры неверное число, у другой нет строки
+        async with db_session.begin():
+            await db_session.execute(
+                text("UPDATE stock_balances SET balance = balance + 7 WHERE nomenclature_id = :id"), {'id': additive}
+            )
+            await db_session.execute(text("DELETE FROM stock_balances WHERE nomenclature_id = :id"), {'id': lecithin})
+        monkeypatch.setattr(reconcile_stock_balances, 'sessionmanager', open_session.__self__)
+
+        await reconcile_stock_balances.reconcile_stock_balances(dry_run=True)
+        report = capsys.readouterr().out
+        assert 'Найдено расхождений: 2' in report
+        assert f'{additive}: сохранено 20.0000, по движениям 13.0000' in report
+        assert f'{lecithin}: сохранено 0, по движениям 4.0000' in report
+        async with db_session.begin():
+            assert len(await StockDAL(db_session).get_balance_drift()) == 2
+
+        await reconcile_stock_balances.reconcile_stock_balances(dry_run=False)
+        assert 'Таблица stock_balances пересчитана.' in capsys.readouterr().out
+        async with db_session.begin():
+            assert await StockDAL(db_session).get_balance_drift() == []
+            assert await StockDAL(db_session).get_balances([additive, lecithin]) == {additive: 13, lecithin: 4}
+
+        await reconcile_stock_balances.reconcile_stock_balances(dry_run=True)
+        assert 'расхождений нет' in capsys.readouterr().out